@@ -41,6 +41,8 @@ def set_properties(project):
     project.get_property('filter_resources_glob').extend([
         '**/SSHclient/*'])
 
+    project.set_property('distutils_console_scripts', ['sshclient = SSHclient.cli:main'])
+
     project.build_depends_on_requirements('requirements-build.txt')
 
     project.depends_on_requirements('requirements.txt')
@@ -31,6 +31,11 @@ setup(
     ],
     url='https://github.intel.com/hubchenkoSSHclient',
     description='A Python client wrapper for paramiko',
+    entry_points={
+        'console_scripts': [
+            'sshclient = SSHclient.cli:main'
+        ]
+    },
     install_requires=requires,
     dependency_links=links
 )
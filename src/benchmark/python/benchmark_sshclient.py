@@ -0,0 +1,369 @@
+""" benchmark SSHclient against in process fake ssh servers on loopback
+
+    PYTHONPATH=src/main/python python src/benchmark/python/benchmark_sshclient.py --output benchmark.json --baseline previous.json
+
+    results are written as json, when a baseline from a previous run is given every metric is printed
+    with its change against the baseline so regressions are visible between releases
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import tempfile
+from time import time
+
+import paramiko
+
+from SSHclient import SSHclient
+from SSHclient import LatencyCollector
+from SSHclient import add_listener
+from SSHclient import remove_listener
+from SSHclient import execute_fleet
+from SSHclient import ConcurrencyGovernor
+from SSHclient import ResultCache
+from SSHclient.instrument import get_percentile
+from SSHclient.profiles import PROFILES
+from fake_server import FakeSSHServer
+from fake_server import LatencyProxy
+from fake_server import USERNAME
+from fake_server import PASSWORD
+
+import logging
+logger = logging.getLogger(__name__)
+
+SHELL_PROMPT = 'fakehost# $'
+MEGABYTE = 1024 * 1024
+
+
+def get_statistics(samples):
+    """ return count, min, mean, max and percentiles in seconds of samples
+    """
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'min': samples[0],
+        'mean': sum(samples) / len(samples),
+        'p50': get_percentile(samples, 50),
+        'p95': get_percentile(samples, 95),
+        'p99': get_percentile(samples, 99),
+        'max': samples[-1]
+    }
+
+
+def get_samples(function, iterations):
+    """ return seconds taken by each of iterations calls of function
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time()
+        function()
+        samples.append(time() - start)
+    return samples
+
+
+def get_rate(function, count):
+    """ return count divided by the seconds taken by function
+    """
+    start = time()
+    function()
+    return count / (time() - start)
+
+
+def get_cpu_time():
+    """ return user and system cpu seconds used by this process - client and fake servers
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+def get_peak_memory():
+    """ return peak resident memory of this process in megabytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure_in_process(function, *args):
+    """ return cpu seconds and peak memory growth in megabytes of function run in a forked process
+
+        the fake servers keep running in this process so only the client is measured
+    """
+    queue = multiprocessing.Queue()
+
+    def target():
+        setup = function(*args)
+        memory, cpu = get_peak_memory(), get_cpu_time()
+        setup()
+        queue.put({'cpu_seconds': get_cpu_time() - cpu, 'peak_memory_megabytes': get_peak_memory() - memory})
+
+    process = multiprocessing.Process(target=target)
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def get_client(server, profile=None, cache=None):
+    return SSHclient(server.address, USERNAME, PASSWORD, port=server.port, profile=profile, cache=cache)
+
+
+def benchmark_connect(server, iterations):
+    """ return connect latency, its latency per phase and connect latency with private key authentication
+    """
+    collector = LatencyCollector()
+    add_listener(collector)
+    try:
+        samples = get_samples(lambda: get_client(server).close(), iterations)
+
+    finally:
+        remove_listener(collector)
+
+    directory = tempfile.mkdtemp()
+    try:
+        key_filename = os.path.join(directory, 'id_rsa')
+        paramiko.RSAKey.generate(2048).write_private_key_file(key_filename, password=PASSWORD)
+        key_samples = get_samples(lambda: SSHclient(
+            server.address, USERNAME, None, port=server.port, key_filename=key_filename, passphrase=PASSWORD).close(), iterations)
+
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'latency': get_statistics(samples),
+        'phases': collector.summary(),
+        'key_latency': get_statistics(key_samples)
+    }
+
+
+def benchmark_execute(server, iterations, output_size):
+    """ return execute latency and throughput in commands and megabytes per second
+    """
+    client = get_client(server)
+    cached_client = get_client(server, cache=ResultCache())
+    try:
+        commands = ['echo {}'.format(index) for index in range(iterations)]
+        return {
+            'latency': get_statistics(get_samples(lambda: client.execute('echo benchmark'), iterations)),
+            'commands_per_second': get_rate(lambda: [client.execute(command) for command in commands], iterations),
+            'execute_many_commands_per_second': get_rate(lambda: client.execute_many(commands), iterations),
+            'execute_batch_commands_per_second': get_rate(lambda: client.execute_batch(commands), iterations),
+            'cached_commands_per_second': get_rate(
+                lambda: [cached_client.execute('echo benchmark', idempotent=True) for _ in commands], iterations),
+            'megabytes_per_second': get_rate(lambda: client.execute('output {}'.format(output_size)), output_size / float(MEGABYTE)),
+            'capture_megabytes_per_second': get_rate(
+                lambda: client.execute_capture('output {}'.format(output_size)).close(), output_size / float(MEGABYTE))
+        }
+
+    finally:
+        client.close()
+        cached_client.close()
+
+
+def benchmark_shell(server, iterations):
+    """ return shell execute latency for a new shell, a persistent session and an expected prompt step
+    """
+    client = get_client(server)
+    try:
+        client.shell_execute('warmup', [], prompt=SHELL_PROMPT, persistent=True)
+        return {
+            'shell_latency': get_statistics(get_samples(
+                lambda: client.shell_execute('show version', [], prompt=SHELL_PROMPT), iterations)),
+            'persistent_step_latency': get_statistics(get_samples(
+                lambda: client.shell_execute('show version', [], prompt=SHELL_PROMPT, persistent=True), iterations)),
+            'expect_step_latency': get_statistics(get_samples(
+                lambda: client.shell_execute('confirm', [('[yes/no]: ', 'yes')], persistent=True), iterations))
+        }
+
+    finally:
+        client.close()
+
+
+def benchmark_fleet(host_counts, max_workers, latency):
+    """ return fleet throughput in hosts per second against each number of fake hosts on loopback addresses
+    """
+    servers = [FakeSSHServer(address='127.0.0.2', latency=latency).start()]
+    port = servers[0].port
+    for index in range(1, max(host_counts)):
+        servers.append(FakeSSHServer(address='127.0.0.{}'.format(index + 2), port=port, latency=latency).start())
+
+    try:
+        results = {}
+        for count in host_counts:
+            hosts = [server.address for server in servers[:count]]
+            start = time()
+            statuses = [result.status for result in execute_fleet(
+                hosts, USERNAME, PASSWORD, 'echo benchmark', max_workers=max_workers, port=port, timeout=30)]
+            elapsed = time() - start
+            results[str(count)] = {
+                'hosts_per_second': count / elapsed,
+                'seconds': elapsed,
+                'failed': len([status for status in statuses if status != 'success'])
+            }
+        return results
+
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def benchmark_profiles(server, output_size, delays, bandwidth):
+    """ return throughput and cpu seconds per megabyte of each transport profile and the default through
+        links with each one way delay in seconds
+    """
+    megabytes = output_size / float(MEGABYTE)
+    results = {}
+    for delay in delays:
+        link = {}
+        with LatencyProxy(server.port, delay, bandwidth=bandwidth) as proxy:
+            for name in [None] + sorted(PROFILES):
+                client = SSHclient(proxy.address, USERNAME, PASSWORD, port=proxy.port, profile=name)
+                try:
+                    client.execute('echo warmup')
+                    start, cpu = time(), get_cpu_time()
+                    client.execute_capture('output {}'.format(output_size)).close()
+                    link[name or 'default'] = {
+                        'megabytes_per_second': megabytes / (time() - start),
+                        'cpu_seconds_per_megabyte': (get_cpu_time() - cpu) / megabytes
+                    }
+
+                finally:
+                    client.close()
+        results['delay_{}'.format(delay)] = link
+    return results
+
+
+def benchmark_output(server, output_size):
+    """ return client cpu seconds and peak memory growth receiving output_size bytes of output with execute,
+        execute_capture and shell_execute
+    """
+    command = 'output {}'.format(output_size)
+
+    def connect(method):
+        client = get_client(server)
+        client.execute('echo warmup')
+        return {
+            'execute': lambda: client.execute(command),
+            'execute_capture': lambda: client.execute_capture(command).close(),
+            'shell_execute': lambda: client.shell_execute(command, [], prompt=SHELL_PROMPT, timeout=600)
+        }[method]
+
+    return dict((method, measure_in_process(connect, method)) for method in ['execute', 'execute_capture', 'shell_execute'])
+
+
+def benchmark_governor(connects, max_startups, max_workers):
+    """ return throughput and failed connects of a fleet run against a server dropping connections beyond
+        max_startups unauthenticated connections with a fixed number of workers and with a governor
+    """
+    with FakeSSHServer(max_startups=max_startups) as server:
+        hosts = [server.address] * connects
+        results = {}
+        for name, governor in [('fixed', None), ('governor', ConcurrencyGovernor())]:
+            start = time()
+            statuses = [result.status for result in execute_fleet(
+                hosts, USERNAME, PASSWORD, 'echo benchmark', max_workers=max_workers, port=server.port, timeout=30,
+                governor=governor)]
+            elapsed = time() - start
+            results[name] = {
+                'hosts_per_second': connects / elapsed,
+                'failed': len([status for status in statuses if status != 'success'])
+            }
+        return results
+
+
+def get_metrics(results, prefix=''):
+    """ return flattened numeric metrics of results keyed by their dotted path
+    """
+    metrics = {}
+    for key, value in results.items():
+        path = '{}{}'.format(prefix, key)
+        if isinstance(value, dict):
+            metrics.update(get_metrics(value, prefix=path + '.'))
+        elif isinstance(value, (int, float)):
+            metrics[path] = value
+    return metrics
+
+
+def print_comparison(results, baseline):
+    """ print each benchmark metric with its change against the same metric of baseline
+    """
+    metrics = get_metrics(results['benchmarks'])
+    baseline_metrics = get_metrics(baseline['benchmarks'])
+    for path in sorted(metrics):
+        change = ''
+        if baseline_metrics.get(path):
+            change = '{:+.1f}%'.format((metrics[path] - baseline_metrics[path]) * 100 / baseline_metrics[path])
+        print '{:70} {:14.6f} {}'.format(path, metrics[path], change)
+
+
+def run(iterations, output_size, host_counts, max_workers, latency, delays, bandwidth, connects, max_startups,
+        large_output_size):
+    """ return results of every benchmark
+    """
+    with FakeSSHServer(latency=latency) as server:
+        benchmarks = {
+            'connect': benchmark_connect(server, iterations),
+            'execute': benchmark_execute(server, iterations, output_size),
+            'shell_execute': benchmark_shell(server, iterations),
+            'profiles': benchmark_profiles(server, output_size, delays, bandwidth),
+            'output': benchmark_output(server, large_output_size)
+        }
+    benchmarks['fleet'] = benchmark_fleet(host_counts, max_workers, latency)
+    benchmarks['governor'] = benchmark_governor(connects, max_startups, max_workers)
+    return {
+        'timestamp': time(),
+        'python': platform.python_version(),
+        'paramiko': paramiko.__version__,
+        'platform': platform.platform(),
+        'parameters': {
+            'iterations': iterations,
+            'output_size': output_size,
+            'host_counts': host_counts,
+            'max_workers': max_workers,
+            'latency': latency,
+            'delays': delays,
+            'bandwidth': bandwidth,
+            'connects': connects,
+            'max_startups': max_startups,
+            'large_output_size': large_output_size
+        },
+        'benchmarks': benchmarks
+    }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='benchmark SSHclient against fake ssh servers on loopback')
+    parser.add_argument('--output', default='benchmark.json', help='file results are written to')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--iterations', type=int, default=50, help='iterations of each latency benchmark')
+    parser.add_argument('--output-size', type=int, default=32 * MEGABYTE, help='bytes of output for throughput benchmarks')
+    parser.add_argument('--hosts', type=int, nargs='+', default=[1, 8, 32], help='numbers of fake hosts for fleet benchmarks')
+    parser.add_argument('--max-workers', type=int, default=32, help='fleet max workers')
+    parser.add_argument('--latency', type=float, default=0, help='seconds fake servers wait before responding')
+    parser.add_argument('--delays', type=float, nargs='+', default=[0, 0.05], help='one way link delays for profile benchmarks')
+    parser.add_argument('--bandwidth', type=int, help='link bytes per second for profile benchmarks')
+    parser.add_argument('--connects', type=int, default=128, help='connects for the governor benchmark')
+    parser.add_argument('--max-startups', type=int, default=8, help='unauthenticated connections the governor benchmark server allows')
+    parser.add_argument(
+        '--large-output-size', type=int, default=100 * MEGABYTE, help='bytes of output for cpu and memory benchmarks')
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    results = run(
+        args.iterations, args.output_size, args.hosts, args.max_workers, args.latency, args.delays, args.bandwidth,
+        args.connects, args.max_startups, args.large_output_size)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_comparison(results, baseline or {'benchmarks': {}})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+import socket
+import subprocess
+import threading
+import time
+from Queue import Queue
+
+import paramiko
+
+import logging
+logger = logging.getLogger(__name__)
+
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark'
+PROMPT = 'fakehost# '
+BANNER = 'Fake SSH server for SSHclient benchmarks\r\n'
+CHUNK_SIZE = 32768
+LINE_LENGTH = 100
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def get_host_key():
+    """ return host key shared by every fake server - generated once per process
+    """
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+def get_output(size, line_length=None):
+    """ return size bytes of output made of line_length byte lines
+    """
+    line_length = line_length or LINE_LENGTH
+    line = 'x' * (line_length - 1) + '\n'
+    return (line * (size // line_length + 1))[:size]
+
+
+def run_command(command, latency):
+    """ return stdout, stderr and exit code of fake command
+
+        output SIZE [LINE_LENGTH]   SIZE bytes of stdout in lines of LINE_LENGTH bytes
+        sleep SECONDS               nothing after SECONDS seconds
+        exit CODE                   message on stderr and exit code CODE
+        anything else               the command echoed back
+
+        commands spanning several lines such as execute_batch scripts are run by /bin/sh
+    """
+    if latency:
+        time.sleep(latency)
+
+    if '\n' in command.strip():
+        process = subprocess.Popen(['/bin/sh', '-c', command], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        return stdout, stderr, process.returncode
+
+    words = command.split()
+    if words and words[0] == 'output':
+        return get_output(int(words[1]), int(words[2]) if len(words) > 2 else None), '', 0
+
+    if words and words[0] == 'sleep':
+        time.sleep(float(words[1]))
+        return '', '', 0
+
+    if words and words[0] == 'exit':
+        return '', 'command failed\n', int(words[1])
+
+    return command + '\n', '', 0
+
+
+class FakeTransport(paramiko.Transport):
+    """ transport that starts the work of a channel request only once the request has been acknowledged
+
+        the acknowledgement is sent by the transport thread right after the server interface accepts
+        the request, output sent before it makes the client see the channel close before its reply
+    """
+    def __init__(self, sock):
+        super(FakeTransport, self).__init__(sock)
+        self.deferred = []
+
+    def defer(self, target, *args):
+        self.deferred.append((target, args))
+
+    def _send_user_message(self, data):
+        super(FakeTransport, self)._send_user_message(data)
+        if threading.current_thread() is self:
+            deferred, self.deferred = self.deferred, []
+            for target, args in deferred:
+                thread = threading.Thread(target=target, args=args)
+                thread.daemon = True
+                thread.start()
+
+
+class FakeServerInterface(paramiko.ServerInterface):
+    """ accepts the benchmark password or any public key and runs exec and shell requests of a single connection
+    """
+    def __init__(self, server):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return 'password,publickey'
+
+    def check_auth_publickey(self, username, key):
+        if username == USERNAME:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_password(self, username, password):
+        if username == USERNAME and password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, channel_id):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixel_width, pixel_height, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        channel.get_transport().defer(self.server.run_exec, channel, command)
+        return True
+
+    def check_channel_shell_request(self, channel):
+        channel.get_transport().defer(self.server.run_shell, channel)
+        return True
+
+
+class FakeSSHServer(object):
+    """ in process ssh server on loopback with fake commands and an emulated interactive shell
+
+        latency seconds are added before each command and each shell response, the shell shows
+        BANNER then PROMPT, 'confirm' asks '[yes/no]: ' before returning to the prompt
+
+        like sshd MaxStartups connections are dropped before the handshake while max_startups
+        connections are not yet authenticated
+    """
+    def __init__(self, address=None, port=None, latency=None, max_startups=None):
+        self.address = address or '127.0.0.1'
+        self.latency = latency or 0
+        self.max_startups = max_startups
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.address, port or 0))
+        self.port = self.listener.getsockname()[1]
+        self.transports = []
+        self.lock = threading.Lock()
+        self.stopped = False
+
+    def start(self):
+        """ start accepting connections
+        """
+        get_host_key()
+        self.listener.listen(128)
+        thread = threading.Thread(target=self.accept)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """ stop accepting connections and close every open connection
+        """
+        self.stopped = True
+        self.listener.close()
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+
+    def get_startups(self):
+        """ return number of connections not yet authenticated
+        """
+        with self.lock:
+            self.transports = [transport for transport in self.transports if transport.is_active()]
+            return len([transport for transport in self.transports if not transport.is_authenticated()])
+
+    def accept(self):
+        while not self.stopped:
+            try:
+                sock, _ = self.listener.accept()
+
+            except socket.error:
+                return
+
+            if self.max_startups and self.get_startups() >= self.max_startups:
+                logger.debug('fake server dropping connection - too many unauthenticated connections')
+                sock.close()
+                continue
+
+            transport = FakeTransport(sock)
+            transport.add_server_key(get_host_key())
+            # offer zlib so clients that ask for compression get it
+            transport.use_compression(True)
+            with self.lock:
+                self.transports.append(transport)
+            # with an event the handshake runs in the transport thread so handshakes overlap as with sshd
+            transport.start_server(event=threading.Event(), server=FakeServerInterface(self))
+
+    def run_exec(self, channel, command):
+        stdout, stderr, exit_code = run_command(command, self.latency)
+        for offset in range(0, len(stdout), CHUNK_SIZE):
+            channel.sendall(stdout[offset:offset + CHUNK_SIZE])
+        if stderr:
+            channel.sendall_stderr(stderr)
+        channel.send_exit_status(exit_code)
+        channel.shutdown_write()
+        channel.close()
+
+    def run_shell(self, channel):
+        channel.sendall(BANNER + PROMPT)
+        data = ''
+        while True:
+            chunk = channel.recv(1024)
+            if not chunk:
+                return
+
+            data += chunk
+            while '\n' in data:
+                line, data = data.split('\n', 1)
+                line = line.strip()
+                if self.latency:
+                    time.sleep(self.latency)
+                if line == 'exit':
+                    channel.close()
+                    return
+                if line == 'confirm':
+                    channel.sendall('confirm\r\nAre you sure [yes/no]: ')
+                    continue
+                stdout, _, _ = run_command(line, 0) if line else ('', '', 0)
+                channel.sendall(line + '\r\n' + stdout.replace('\n', '\r\n') + PROMPT)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class LatencyProxy(object):
+    """ tcp proxy on loopback that delays data in each direction by delay seconds to simulate a wan link
+
+        when bandwidth is set data is sent at no more than bandwidth bytes per second in each direction
+    """
+    def __init__(self, target_port, delay, address=None, target_address=None, bandwidth=None):
+        self.address = address or '127.0.0.1'
+        self.target = (target_address or '127.0.0.1', target_port)
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.address, 0))
+        self.port = self.listener.getsockname()[1]
+        self.stopped = False
+
+    def start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def start(self):
+        self.listener.listen(128)
+        self.start_thread(self.accept)
+        return self
+
+    def stop(self):
+        self.stopped = True
+        self.listener.close()
+
+    def accept(self):
+        while not self.stopped:
+            try:
+                client, _ = self.listener.accept()
+
+            except socket.error:
+                return
+
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.forward(client, server)
+            self.forward(server, client)
+
+    def forward(self, source, destination):
+        """ send data received from source to destination delay seconds after it was received
+        """
+        queue = Queue()
+
+        def receive():
+            while True:
+                try:
+                    data = source.recv(65536)
+
+                except socket.error:
+                    data = ''
+                queue.put((time.time() + self.delay, data))
+                if not data:
+                    return
+
+        def send():
+            while True:
+                due, data = queue.get()
+                wait = due - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                if not data:
+                    try:
+                        destination.shutdown(socket.SHUT_WR)
+
+                    except socket.error:
+                        pass
+                    return
+                try:
+                    destination.sendall(data)
+
+                except socket.error:
+                    return
+                if self.bandwidth:
+                    time.sleep(len(data) / float(self.bandwidth))
+
+        self.start_thread(receive)
+        self.start_thread(send)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
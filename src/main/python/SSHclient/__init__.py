@@ -1,10 +1,74 @@
+import importlib
+import sys
+import types
 
-from sshclient import SSHclient
-from sshclient import ConnectError
-from sshclient import ExecuteError
-from sshclient import TimeOutError
-from sshclient import NotAuthorizedError
-from sshclient import UnknownHostError
-from sshclient import print_out
-from sshclient import connect
-from sshclient import generate_hostnames
+# public names and the module defining them - modules are imported when one of their names is first used
+# so importing the package and running the command line tool do not load paramiko until a connection is made
+EXPORTS = {
+    'SSHclient': 'sshclient',
+    'ConnectError': 'sshclient',
+    'ExecuteError': 'sshclient',
+    'TimeOutError': 'sshclient',
+    'NotAuthorizedError': 'sshclient',
+    'UnknownHostError': 'sshclient',
+    'CommandTimeoutError': 'sshclient',
+    'CommandCancelledError': 'sshclient',
+    'CommandResult': 'sshclient',
+    'print_out': 'sshclient',
+    'connect': 'sshclient',
+    'race_connect': 'sshclient',
+    'generate_hostnames': 'sshclient',
+    'ShellSession': 'shell',
+    'OutputSink': 'output',
+    'CapturedOutput': 'output',
+    'ConnectionPool': 'pool',
+    'get_default_pool': 'pool',
+    'set_default_pool': 'pool',
+    'execute_fleet': 'fleet',
+    'execute_host': 'fleet',
+    'HostResult': 'fleet',
+    'AsyncSSHclient': 'asyncclient',
+    'Future': 'asyncclient',
+    'LatencyCollector': 'instrument',
+    'PhaseEvent': 'instrument',
+    'add_listener': 'instrument',
+    'remove_listener': 'instrument',
+    'Resolver': 'resolver',
+    'get_default_resolver': 'resolver',
+    'set_default_resolver': 'resolver',
+    'ResultCache': 'cache',
+    'get_default_cache': 'cache',
+    'set_default_cache': 'cache',
+    'Credentials': 'auth',
+    'load_private_key': 'auth',
+    'TransportProfile': 'profiles',
+    'get_profile': 'profiles',
+    'CancelToken': 'cancel',
+    'ChannelReader': 'reader',
+    'ConcurrencyGovernor': 'governor'
+}
+
+__all__ = sorted(EXPORTS)
+
+
+class LazyPackage(types.ModuleType):
+    """ package module importing the module defining a public name when the name is first used
+    """
+    def __getattr__(self, name):
+        if name not in EXPORTS:
+            raise AttributeError("'module' object has no attribute '{}'".format(name))
+
+        value = getattr(importlib.import_module('{}.{}'.format(__name__, EXPORTS[name])), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(EXPORTS))
+
+
+_package = LazyPackage(__name__, __doc__)
+_package.__dict__.update(
+    (name, value) for name, value in globals().items() if name not in ('LazyPackage', '_package'))
+# the original module is kept referenced since python 2 clears the globals of collected modules
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
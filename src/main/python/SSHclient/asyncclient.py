@@ -0,0 +1,378 @@
+import os
+import select
+import threading
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+from sshclient import SSHclient
+from sshclient import ExecuteError
+from sshclient import TimeOutError
+from sshclient import CHANNEL_BUFFER_SIZE
+from sshclient import is_connected
+from matcher import compile_success_responses
+from output import OutputSink
+
+import logging
+logger = logging.getLogger(__name__)
+
+# threads used for the blocking connect and channel open steps
+POOL_SIZE = 32
+
+# states a handler reports after reading its channel
+READING = 'reading'
+# the channel needs no more draining but the future is completed later - once the exit status arrives
+DETACHED = 'detached'
+FINISHED = 'finished'
+
+HANGUP_EVENTS = select.POLLHUP | select.POLLERR | select.POLLNVAL
+
+_pool = None
+_pool_lock = threading.Lock()
+_reactor = None
+_reactor_lock = threading.Lock()
+
+
+def get_pool():
+    """ return thread pool shared by async clients for blocking steps
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(processes=POOL_SIZE)
+        return _pool
+
+
+def get_reactor():
+    """ return reactor shared by async clients for draining channels
+    """
+    global _reactor
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = Reactor()
+        return _reactor
+
+
+class Future(object):
+    """ result of an asynchronous operation
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._event.is_set()
+
+    def set_result(self, result):
+        self._set(result, None)
+
+    def set_exception(self, exception):
+        self._set(None, exception)
+
+    def _set(self, result, exception):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._result = result
+            self._exception = exception
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def _run_callback(self, callback):
+        try:
+            callback(self)
+
+        except Exception:
+            logger.exception('future callback raised')
+
+    def add_done_callback(self, callback):
+        """ call callback with the future once it is done - immediately if already done
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        self._run_callback(callback)
+
+    def exception(self, timeout=None):
+        """ return exception raised by operation or None waiting up to timeout seconds for it to complete
+        """
+        if not self._event.wait(timeout):
+            raise TimeOutError('operation did not complete within {} seconds'.format(timeout))
+        return self._exception
+
+    def result(self, timeout=None):
+        """ return result of operation waiting up to timeout seconds for it to complete
+
+            raises the exception raised by the operation
+        """
+        exception = self.exception(timeout=timeout)
+        if exception:
+            raise exception
+        return self._result
+
+
+def submit(function, *args, **kwargs):
+    """ return future of calling function on the shared thread pool
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args, **kwargs))
+
+        except Exception as exception:
+            future.set_exception(exception)
+
+    get_pool().apply_async(run)
+    return future
+
+
+def get_lines(sink):
+    """ return decoded lines of output written to sink - the sink is consumed
+    """
+    output = sink.result()
+    try:
+        return output.decode_lines()
+
+    finally:
+        output.close()
+
+
+class Reactor(object):
+    """ single thread that waits on the channels of all in flight commands and drains them as data arrives
+
+        paramiko channels expose a pipe through fileno that becomes readable when stdout or stderr
+        data or eof is received, so one poll loop serves every command no matter how many are running
+    """
+    def __init__(self):
+        self.handlers = {}
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        self.poller = select.poll()
+        self.poller.register(self.wakeup_read, select.POLLIN)
+        self.thread = threading.Thread(target=self.run, name='sshclient-reactor')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def register(self, channel, handler):
+        """ call handler when channel is readable until it reports it is detached or finished
+        """
+        with self.lock:
+            self.pending.append((channel.fileno(), handler))
+        os.write(self.wakeup_write, 'x')
+
+    def _register_pending(self):
+        with self.lock:
+            while self.pending:
+                fd, handler = self.pending.popleft()
+                self.handlers[fd] = handler
+                self.poller.register(fd, select.POLLIN)
+
+    def _unregister(self, fd):
+        self.poller.unregister(fd)
+        del self.handlers[fd]
+
+    def run(self):
+        while True:
+            for fd, event in self.poller.poll():
+                if fd == self.wakeup_read:
+                    os.read(self.wakeup_read, 4096)
+                    self._register_pending()
+                    continue
+
+                handler = self.handlers.get(fd)
+                if not handler:
+                    continue
+
+                try:
+                    state = handler.on_readable()
+
+                except Exception as exception:
+                    self._unregister(fd)
+                    handler.on_error(exception)
+                    continue
+
+                if state != READING:
+                    self._unregister(fd)
+                elif event & HANGUP_EVENTS:
+                    self._unregister(fd)
+                    handler.on_error(ExecuteError('channel closed'))
+
+
+class CommandHandler(object):
+    """ drains stdout and stderr of a command channel and completes its future
+
+        when callback is specified each stdout line is passed to it as soon as it is received and
+        the channel is closed as soon as a success response is found
+    """
+    def __init__(self, future, channel, success_responses=None, expected_exit_code=None, callback=None):
+        self.future = future
+        self.channel = channel
+        self.success_responses = success_responses
+        self.expected_exit_code = expected_exit_code if expected_exit_code else 0
+        self.callback = callback
+        self.stream = compile_success_responses(success_responses).stream() if success_responses and callback else None
+        self.stdout = OutputSink()
+        self.stderr = OutputSink()
+        self.line = ''
+
+    def on_readable(self):
+        """ return READING while output is expected, DETACHED once output is drained but the exit status
+            has not arrived and FINISHED once the future is complete
+        """
+        channel = self.channel
+        # read before draining so data received just ahead of eof is not left behind
+        eof = channel.eof_received
+        # a channel closed before eof - or by a dropped connection - stays readable without more output
+        lost = not eof and (channel.closed or not is_connected(channel))
+        while channel.recv_ready():
+            data = channel.recv(CHANNEL_BUFFER_SIZE)
+            if self.callback:
+                if self._stream(data):
+                    return FINISHED
+            else:
+                self.stdout.write(data)
+
+        while channel.recv_stderr_ready():
+            self.stderr.write(channel.recv_stderr(CHANNEL_BUFFER_SIZE))
+
+        if lost:
+            self.on_error(EOFError('connection lost before command completed'))
+            return FINISHED
+
+        if not eof:
+            return READING
+
+        if self.callback and self.line:
+            if self._stream_line(self.line):
+                return FINISHED
+
+        if channel.exit_status_ready():
+            self.complete(channel.recv_exit_status())
+            return FINISHED
+
+        # the exit status may follow eof - it is waited for on the pool so the reactor is not blocked
+        submit(channel.recv_exit_status).add_done_callback(self._on_exit_status)
+        return DETACHED
+
+    def _on_exit_status(self, future):
+        exception = future.exception()
+        if exception:
+            self.on_error(exception)
+        else:
+            self.complete(future.result())
+
+    def _stream(self, data):
+        """ pass complete lines of data to callback and return True if a success response was found
+        """
+        lines = (self.line + data).split('\n')
+        self.line = lines.pop()
+        for line in lines:
+            if self._stream_line(line + '\n'):
+                return True
+        return False
+
+    def _stream_line(self, line):
+        self.callback(line)
+        if self.stream and self.stream.feed(line):
+            logger.debug('success response found - closing channel')
+            self.channel.close()
+            self.future.set_result(None)
+            return True
+        return False
+
+    def complete(self, exit_code):
+        """ complete future with stdout lines checking success responses and exit code
+        """
+        self.channel.close()
+        # lines are decoded and split as SSHclient.execute does
+        lines = get_lines(self.stdout)
+        if self.success_responses:
+            if self.callback or not compile_success_responses(self.success_responses).check(''.join(lines)):
+                self.future.set_exception(ExecuteError('success responses not found in stdout'))
+                return
+            self.future.set_result(lines)
+            return
+
+        if exit_code != self.expected_exit_code:
+            error = ''.join(get_lines(self.stderr)) + 'exit code: {}'.format(exit_code)
+            self.future.set_exception(ExecuteError(error))
+            return
+
+        self.future.set_result(None if self.callback else lines)
+
+    def on_error(self, exception):
+        self.future.set_exception(exception)
+
+
+class AsyncSSHclient(object):
+    """ non-blocking client - every operation returns a future immediately
+
+        connecting and opening channels run on a small shared thread pool while the output of every
+        in flight command is drained by a single shared reactor thread, so a long running command
+        does not hold a thread - results and errors are the same as SSHclient
+    """
+    def __init__(self, hostname, username, password, **kwargs):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.kwargs = kwargs
+        self.client = None
+
+    def _connect(self):
+        self.client = SSHclient(self.hostname, self.username, self.password, **self.kwargs)
+        return self
+
+    def connect(self):
+        """ return future of connecting that resolves to this client
+        """
+        return submit(self._connect)
+
+    def _execute(self, future, command, send_input, success_responses, expected_exit_code, callback):
+        logger.debug('executing command "{}" on host {}'.format(command, self.client.hostname))
+        stdin, stdout, stderr = self.client.ssh.exec_command(command)
+        if send_input:
+            logger.debug('sending stdin')
+            stdin.write('{}\n'.format(send_input))
+            stdin.flush()
+
+        handler = CommandHandler(
+            future, stdout.channel, success_responses=success_responses, expected_exit_code=expected_exit_code, callback=callback)
+        get_reactor().register(stdout.channel, handler)
+
+    def _start(self, command, send_input, success_responses, expected_exit_code, callback):
+        future = Future()
+        opened = submit(self._execute, future, command, send_input, success_responses, expected_exit_code, callback)
+        opened.add_done_callback(lambda opened: opened.exception() and future.set_exception(opened.exception()))
+        return future
+
+    def execute(self, command, send_input=None, success_responses=None, expected_exit_code=None):
+        """ return future of executing command that resolves to stdout lines as SSHclient.execute
+        """
+        return self._start(command, send_input, success_responses, expected_exit_code, None)
+
+    def execute_stream(self, command, callback, send_input=None, success_responses=None, expected_exit_code=None):
+        """ return future of executing command passing each stdout line to callback as it is received
+
+            the future resolves to None once the command completes or a success response is found
+        """
+        return self._start(command, send_input, success_responses, expected_exit_code, callback)
+
+    def shell_execute(self, command, send_inputs, success_responses=None, **kwargs):
+        """ return future of executing shell command that resolves to stdout lines as SSHclient.shell_execute
+
+            interactive steps are sequential so a shell execute holds a pool thread while it runs
+        """
+        return submit(self.client.shell_execute, command, send_inputs, success_responses=success_responses, **kwargs)
+
+    def close(self):
+        """ close ssh connection
+        """
+        if self.client:
+            self.client.close()
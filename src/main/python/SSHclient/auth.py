@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+
+import paramiko
+
+import logging
+logger = logging.getLogger(__name__)
+
+KEY = 'key'
+AGENT = 'agent'
+PASSWORD = 'password'
+
+AUTH_ORDER = [KEY, AGENT, PASSWORD]
+KEY_CLASSES = [paramiko.RSAKey, paramiko.ECDSAKey, paramiko.Ed25519Key, paramiko.DSSKey]
+
+_keys = {}
+_keys_lock = threading.Lock()
+_agent = threading.local()
+
+
+def parse_private_key(path, passphrase=None):
+    """ return private key read from path trying each key type
+
+        raises SSHException carrying the error of every key type if none can parse the key - a wrong
+        passphrase is only reported by the matching key type - or if the file can not be read
+    """
+    errors = []
+    for key_class in KEY_CLASSES:
+        try:
+            return key_class.from_private_key_file(path, password=passphrase)
+
+        except paramiko.ssh_exception.PasswordRequiredException:
+            raise
+
+        except paramiko.ssh_exception.SSHException as exception:
+            errors.append('{}: {}'.format(key_class.__name__, exception))
+            continue
+
+        except (IOError, OSError) as exception:
+            raise paramiko.ssh_exception.SSHException('unable to read private key {}: {}'.format(path, exception))
+
+    raise paramiko.ssh_exception.SSHException('unable to parse private key {} - {}'.format(path, '; '.join(errors)))
+
+
+def load_private_key(key_filename, passphrase=None):
+    """ return private key in key_filename
+
+        keys are parsed and decrypted once per process and parsed again only if the file changes
+    """
+    path = os.path.abspath(os.path.expanduser(key_filename))
+    try:
+        modified = os.path.getmtime(path)
+
+    except (IOError, OSError) as exception:
+        # reported as a connect error like every other failure to use the credentials
+        raise paramiko.ssh_exception.SSHException('unable to read private key {}: {}'.format(path, exception))
+
+    cache_key = (path, modified, hashlib.sha256(passphrase).hexdigest() if passphrase else None)
+    with _keys_lock:
+        key = _keys.get(cache_key)
+    if key is not None:
+        return key
+
+    logger.debug('parsing private key {}'.format(path))
+    key = parse_private_key(path, passphrase=passphrase)
+    with _keys_lock:
+        _keys[cache_key] = key
+    return key
+
+
+def clear_keys():
+    """ forget parsed private keys
+    """
+    with _keys_lock:
+        _keys.clear()
+
+
+def get_agent_keys():
+    """ return keys held by the ssh agent
+
+        the agent connection is opened once per thread since requests to it can not be interleaved
+    """
+    agent = getattr(_agent, 'agent', None)
+    if agent is None:
+        agent = _agent.agent = paramiko.Agent()
+    return agent.get_keys()
+
+
+class Credentials(object):
+    """ password, private key and ssh agent authentication for a connection
+
+        methods are tried in auth_order - the first method that succeeds is used so the fastest method
+        for the hosts should be first, methods without credentials are skipped
+    """
+    def __init__(self, password=None, key_filename=None, passphrase=None, allow_agent=False, auth_order=None):
+        self.password = password
+        self.key_filename = key_filename
+        self.passphrase = passphrase
+        self.allow_agent = allow_agent
+        self.auth_order = auth_order if auth_order else AUTH_ORDER
+
+    def get_methods(self):
+        """ return (method, credential) pairs to try in order - a password or a private key
+        """
+        methods = []
+        for method in self.auth_order:
+            if method == KEY and self.key_filename:
+                methods.append((KEY, load_private_key(self.key_filename, passphrase=self.passphrase)))
+            elif method == AGENT and self.allow_agent:
+                methods.extend((AGENT, key) for key in get_agent_keys())
+            elif method == PASSWORD and self.password is not None:
+                methods.append((PASSWORD, self.password))
+        return methods
+
+    def __repr__(self):
+        return 'Credentials({})'.format(self.auth_order)
@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from time import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+# seconds a command result is reused
+RESULT_TTL = 60
+MAX_ENTRIES = 1024
+# seconds between deadline checks of a caller waiting for a shared execution
+WAIT_INTERVAL = .1
+
+_default_cache = None
+
+
+def get_default_cache():
+    """ return process wide result cache or None if caching is not enabled
+    """
+    return _default_cache
+
+
+def set_default_cache(cache):
+    """ set process wide result cache used by SSHclient - None disables caching
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+class Flight(object):
+    """ execution of a command shared by every caller asking for its result while it runs
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+        # the exception was caused by the deadline or cancellation of the caller executing the command
+        self.expired = False
+        self.invalidated = False
+
+
+class ResultCache(object):
+    """ cache of command results keyed by hostname, username and command
+
+        results are reused until they expire after ttl seconds, the least recently used result is evicted
+        once max_entries are cached, concurrent requests for a result that is not cached share a single
+        execution - safe to share between threads and clients
+    """
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl if ttl is not None else RESULT_TTL
+        self.max_entries = max_entries if max_entries else MAX_ENTRIES
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, function, ttl=None, deadline=None, cacheable=None):
+        """ return cached result of key or the result of function cached for ttl seconds
+
+            callers asking for key while function runs wait for its result - or its exception - instead
+            of calling function again, exceptions are not cached and results for which cacheable returns
+            False are only shared with the callers waiting for them
+
+            a caller waiting for a shared execution stops waiting when its command deadline passes or it is
+            cancelled - deadline.check raises the error - and calls function itself when the shared execution
+            failed because the deadline of its caller passed or it was cancelled
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.pop(key, None)
+                if entry is not None and entry[1] > time():
+                    self.entries[key] = entry
+                    return entry[0]
+
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = Flight()
+
+            if leader:
+                return self._execute(key, flight, function, ttl, deadline, cacheable)
+
+            logger.debug('waiting for result of {} being executed'.format(key))
+            if deadline is None:
+                flight.event.wait()
+            else:
+                while not flight.event.wait(deadline.limit(WAIT_INTERVAL)):
+                    deadline.check()
+                deadline.check()
+            if flight.exception is None:
+                return flight.result
+
+            if not flight.expired:
+                raise flight.exception
+
+            logger.debug('shared execution of {} timed out or was cancelled - executing it again'.format(key))
+
+    def _execute(self, key, flight, function, ttl, deadline, cacheable):
+        try:
+            flight.result = function()
+
+        except Exception as exception:
+            flight.exception = exception
+            flight.expired = deadline is not None and deadline.expired()
+            raise
+
+        else:
+            if cacheable is None or cacheable(flight.result):
+                self._set(key, flight, ttl)
+
+        finally:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+            flight.event.set()
+
+        return flight.result
+
+    def _set(self, key, flight, ttl):
+        with self.lock:
+            # a result started before an invalidation may be stale
+            if flight.invalidated:
+                return
+            self.entries[key] = (flight.result, time() + (ttl if ttl is not None else self.ttl))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, hostname=None, username=None, command=None):
+        """ forget results matching hostname, username and command - each matches any when None
+        """
+        def matches(key):
+            return all(value is None or value == part for value, part in zip((hostname, username, command), key))
+
+        with self.lock:
+            for key in [key for key in self.entries if matches(key)]:
+                logger.debug('invalidating cached result of {}'.format(key))
+                del self.entries[key]
+            for key in [key for key in self.flights if matches(key)]:
+                self.flights.pop(key).invalidated = True
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
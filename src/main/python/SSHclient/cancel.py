@@ -0,0 +1,43 @@
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class CancelToken(object):
+    """ cancels the commands of every client and fleet it is passed to
+
+        channels of running commands are closed as soon as the token is cancelled and commands not yet
+        started are not executed - safe to share between threads
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.channels = set()
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        """ cancel outstanding commands closing their channels
+        """
+        logger.debug('cancelling commands')
+        with self.lock:
+            self.event.set()
+            channels, self.channels = self.channels, set()
+        for channel in channels:
+            channel.close()
+
+    def register(self, channel):
+        """ close channel when cancelled - at once if already cancelled
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.channels.add(channel)
+                return
+        channel.close()
+
+    def unregister(self, channel):
+        with self.lock:
+            self.channels.discard(channel)
@@ -0,0 +1,124 @@
+""" execute a command against hosts and print each host result as a json line as soon as the host completes
+
+    sshclient --hosts-file hosts.txt --domains .company.com --success-response 3.7.2 --max-workers 100 'puppet -V'
+"""
+import argparse
+import getpass
+import json
+import os
+import sys
+
+import logging
+logger = logging.getLogger(__name__)
+
+PASSWORD_VARIABLE = 'SSHCLIENT_PASSWORD'
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='sshclient', description='execute a command against hosts printing a json line per host as it completes')
+    parser.add_argument('command', help='command to execute')
+    parser.add_argument('hosts', nargs='*', help='hosts to execute command against')
+    parser.add_argument('-f', '--hosts-file', help="file with a host per line - '-' reads hosts from stdin")
+    parser.add_argument('-u', '--username', default=getpass.getuser(), help='username - defaults to the current user')
+    parser.add_argument(
+        '-p', '--password', default=os.environ.get(PASSWORD_VARIABLE),
+        help='password - defaults to ${} or a prompt when no key is used'.format(PASSWORD_VARIABLE))
+    parser.add_argument('-i', '--key-filename', help='private key file')
+    parser.add_argument('--allow-agent', action='store_true', help='authenticate with keys held by the ssh agent')
+    parser.add_argument('-d', '--domains', nargs='+', help='domains tried in order for hosts that are not fully qualified')
+    parser.add_argument(
+        '-s', '--success-response', action='append', dest='success_responses',
+        help='text that marks success when found in stdout - may be repeated')
+    parser.add_argument('--expected-exit-code', type=int, help='exit code that marks success - defaults to 0')
+    parser.add_argument('-w', '--max-workers', type=int, help='hosts processed concurrently')
+    parser.add_argument('--processes', type=int, help='worker processes hosts are sharded across')
+    parser.add_argument('--governor', action='store_true', help='adapt connects in flight per subnet or domain')
+    parser.add_argument('--port', type=int, help='ssh port')
+    parser.add_argument('-t', '--timeout', type=int, help='connect timeout in seconds')
+    parser.add_argument('--command-timeout', type=float, help='seconds each command may run')
+    parser.add_argument('--profile', choices=['lan-fast', 'wan-bulk', 'low-cpu'], help='transport profile')
+    parser.add_argument('--debug', action='store_true', help='log debug messages to stderr')
+    return parser
+
+
+def read_hosts(lines):
+    """ return hosts in lines skipping blank lines and comments
+    """
+    hosts = []
+    for line in lines:
+        host = line.split('#', 1)[0].strip()
+        if host:
+            hosts.append(host)
+    return hosts
+
+
+def get_hosts(args):
+    """ return hosts given as arguments followed by hosts in the hosts file
+    """
+    hosts = list(args.hosts)
+    if args.hosts_file == '-':
+        hosts.extend(read_hosts(sys.stdin))
+    elif args.hosts_file:
+        with open(args.hosts_file) as hosts_file:
+            hosts.extend(read_hosts(hosts_file))
+    return hosts
+
+
+def get_record(result):
+    """ return json serializable record of host result
+    """
+    return {
+        'hostname': result.hostname,
+        'status': result.status,
+        'output': ''.join(result.output) if result.output is not None else None,
+        'error': result.error,
+        'elapsed': result.elapsed
+    }
+
+
+def main(argv=None):
+    """ execute command against hosts printing host results as json lines - exit code is 1 if any host failed
+    """
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    try:
+        hosts = get_hosts(args)
+
+    except IOError as exception:
+        parser.error('unable to read hosts file: {}'.format(exception))
+
+    if not hosts:
+        parser.error('no hosts given')
+
+    if args.debug:
+        logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+
+    password = args.password
+    if password is None and not (args.key_filename or args.allow_agent):
+        password = getpass.getpass('password for {}: '.format(args.username))
+
+    # paramiko is only loaded once arguments are valid so help and usage errors return at once
+    from auth import Credentials
+    from fleet import execute_fleet
+    from governor import ConcurrencyGovernor
+
+    if args.key_filename or args.allow_agent:
+        password = Credentials(password=password, key_filename=args.key_filename, allow_agent=args.allow_agent)
+
+    failed = 0
+    for result in execute_fleet(
+            hosts, args.username, password, args.command, success_responses=args.success_responses,
+            expected_exit_code=args.expected_exit_code, timeout=args.timeout, domains=args.domains,
+            max_workers=args.max_workers, processes=args.processes, port=args.port, profile=args.profile,
+            command_timeout=args.command_timeout, governor=ConcurrencyGovernor() if args.governor else None):
+        if not result.succeeded:
+            failed += 1
+        sys.stdout.write(json.dumps(get_record(result), sort_keys=True) + '\n')
+        sys.stdout.flush()
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import multiprocessing
+from collections import Counter
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from Queue import Empty
+from time import time
+
+from sshclient import SSHclient
+from sshclient import ConnectError
+from sshclient import TimeOutError
+from sshclient import NotAuthorizedError
+from sshclient import UnknownHostError
+from sshclient import ExecuteError
+from sshclient import CommandTimeoutError
+from sshclient import CommandCancelledError
+from pool import set_default_pool
+
+import logging
+logger = logging.getLogger(__name__)
+
+SUCCESS = 'success'
+TIMEOUT = 'timeout'
+NOT_AUTHORIZED = 'not_authorized'
+UNKNOWN_HOST = 'unknown_host'
+CONNECT_ERROR = 'connect_error'
+EXECUTE_ERROR = 'execute_error'
+COMMAND_TIMEOUT = 'command_timeout'
+CANCELLED = 'cancelled'
+ERROR = 'error'
+
+MAX_WORKERS = 32
+# seconds the parent waits for a result before checking that worker processes are still running
+WORKER_POLL_INTERVAL = 1
+
+# most specific errors first since the connect errors all derive from ConnectError
+ERROR_STATUSES = [
+    (TimeOutError, TIMEOUT),
+    (NotAuthorizedError, NOT_AUTHORIZED),
+    (UnknownHostError, UNKNOWN_HOST),
+    (ConnectError, CONNECT_ERROR),
+    (CommandTimeoutError, COMMAND_TIMEOUT),
+    (CommandCancelledError, CANCELLED),
+    (ExecuteError, EXECUTE_ERROR)
+]
+
+
+class HostResult(object):
+    """ outcome of executing a command against a host
+    """
+    def __init__(self, hostname, status, output=None, error=None, elapsed=None):
+        self.hostname = hostname
+        self.status = status
+        self.output = output
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return self.status == SUCCESS
+
+    def __repr__(self):
+        return 'HostResult({}, {})'.format(self.hostname, self.status)
+
+
+def get_status(exception):
+    """ return result status for exception
+    """
+    for error_class, status in ERROR_STATUSES:
+        if isinstance(exception, error_class):
+            return status
+    return ERROR
+
+
+def execute_host(hostname, username, password, command, send_input=None, success_responses=None, expected_exit_code=None,
+                 timeout=None, domains=None, set_missing_host_key_policy=True, port=None, profile=None, command_timeout=None,
+                 cancel_token=None, governor=None):
+    """ return host result of executing command against hostname
+
+        hosts are not connected to once cancel_token is cancelled, when a governor is specified each connect
+        waits until the governor allows it - keyed on the domain qualified hostname tried when domains are given
+    """
+    start = time()
+    client = None
+    if cancel_token is not None and cancel_token.cancelled:
+        return HostResult(hostname, CANCELLED, error='cancelled before connecting', elapsed=0)
+
+    try:
+        client = SSHclient(
+            hostname, username, password, set_missing_host_key_policy=set_missing_host_key_policy, timeout=timeout,
+            domains=domains, port=port, profile=profile, governor=governor)
+        output = client.execute(
+            command, send_input=send_input, success_responses=success_responses, expected_exit_code=expected_exit_code,
+            command_timeout=command_timeout, cancel_token=cancel_token)
+        return HostResult(hostname, SUCCESS, output=output, elapsed=time() - start)
+
+    except Exception as exception:
+        status = get_status(exception)
+        logger.debug('executing command "{}" on host {} failed with {}: {}'.format(command, hostname, status, exception))
+        return HostResult(hostname, status, error=str(exception), elapsed=time() - start)
+
+    finally:
+        if client:
+            client.close()
+
+
+def execute_shard(index, hosts, results, fleet_arguments):
+    """ put host results of executing command against hosts on results queue followed by a None sentinel
+
+        runs in a worker process - connections pooled by the parent are not usable after fork
+    """
+    set_default_pool(None)
+    try:
+        for result in execute_fleet(hosts, **fleet_arguments):
+            results.put((index, result))
+
+    finally:
+        results.put((index, None))
+        results.close()
+        results.join_thread()
+
+
+def execute_sharded(hosts, processes, fleet_arguments, cancel_token=None):
+    """ yield host results of executing command against hosts sharded across processes worker processes
+
+        each worker runs its own concurrent fleet so key exchange and packet crypto use every core, results
+        are streamed back as they complete and hosts of a worker that dies are yielded as errors
+
+        workers are terminated once cancel_token is cancelled and their outstanding hosts yielded as cancelled
+    """
+    hosts = list(hosts)
+    processes = min(processes, len(hosts))
+    results = multiprocessing.Queue()
+    pending = {}
+    workers = {}
+    logger.debug('sharding {} hosts across {} processes'.format(len(hosts), processes))
+    try:
+        for index in range(processes):
+            shard = hosts[index::processes]
+            pending[index] = Counter(shard)
+            workers[index] = multiprocessing.Process(
+                target=execute_shard, args=(index, shard, results, fleet_arguments), name='sshclient-fleet-{}'.format(index))
+            workers[index].daemon = True
+            workers[index].start()
+
+        while workers:
+            if cancel_token is not None and cancel_token.cancelled:
+                for index, worker in workers.items():
+                    worker.terminate()
+                    del workers[index]
+                    for hostname in pending[index].elements():
+                        yield HostResult(hostname, CANCELLED, error='cancelled')
+                return
+
+            try:
+                index, result = results.get(timeout=WORKER_POLL_INTERVAL)
+
+            except Empty:
+                for index, worker in workers.items():
+                    if worker.is_alive():
+                        continue
+                    logger.debug('worker process {} exited with {}'.format(worker.name, worker.exitcode))
+                    del workers[index]
+                    for hostname in pending[index].elements():
+                        yield HostResult(hostname, ERROR, error='worker process exited with {}'.format(worker.exitcode))
+                continue
+
+            if result is None:
+                workers.pop(index).join()
+                continue
+
+            pending[index][result.hostname] -= 1
+            yield result
+
+    finally:
+        for worker in workers.values():
+            worker.terminate()
+
+
+def execute_fleet(hosts, username, password, command, send_input=None, success_responses=None, expected_exit_code=None,
+                  timeout=None, domains=None, set_missing_host_key_policy=True, max_workers=None, processes=None, port=None,
+                  profile=None, command_timeout=None, cancel_token=None, governor=None):
+    """ yield host results of executing command against hosts as they complete
+
+        at most max_workers hosts are processed concurrently - per process when hosts are sharded across
+        processes worker processes
+
+        each command is aborted after command_timeout seconds, cancelling cancel_token stops outstanding
+        commands and the remaining hosts are yielded as cancelled
+
+        a governor adapts the connects in flight per subnet or domain suffix to what the hosts sustain and
+        max_workers then only caps the threads - worker processes each adapt their own copy of the governor
+    """
+    if not max_workers:
+        max_workers = MAX_WORKERS
+
+    if processes:
+        fleet_arguments = {
+            'username': username, 'password': password, 'command': command, 'send_input': send_input,
+            'success_responses': success_responses, 'expected_exit_code': expected_exit_code, 'timeout': timeout,
+            'domains': domains, 'set_missing_host_key_policy': set_missing_host_key_policy, 'max_workers': max_workers,
+            'port': port, 'profile': profile, 'command_timeout': command_timeout, 'governor': governor
+        }
+        for result in execute_sharded(hosts, processes, fleet_arguments, cancel_token=cancel_token):
+            yield result
+        return
+
+    function = partial(
+        execute_host, username=username, password=password, command=command, send_input=send_input,
+        success_responses=success_responses, expected_exit_code=expected_exit_code, timeout=timeout, domains=domains,
+        set_missing_host_key_policy=set_missing_host_key_policy, port=port, profile=profile,
+        command_timeout=command_timeout, cancel_token=cancel_token, governor=governor)
+
+    logger.debug('executing command "{}" on fleet with {} workers'.format(command, max_workers))
+    pool = ThreadPool(processes=max_workers)
+    try:
+        for result in pool.imap_unordered(function, hosts):
+            yield result
+
+    finally:
+        pool.terminate()
@@ -0,0 +1,126 @@
+import re
+import threading
+from time import time
+
+from sshclient import ConnectError
+from sshclient import UnknownHostError
+
+import logging
+logger = logging.getLogger(__name__)
+
+# connects in flight per key before any outcome is known
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 256
+# limit is multiplied by this when connects time out or are refused
+DECREASE_FACTOR = 0.5
+# connects slower than this multiple of the fastest connect seen for the key do not grow the limit
+LATENCY_TOLERANCE = 3
+
+IPV4_ADDRESS = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$')
+
+
+def get_key(hostname):
+    """ return the /24 subnet of an ipv4 address or the domain suffix of a hostname
+    """
+    if IPV4_ADDRESS.match(hostname):
+        return '{}.0/24'.format(hostname.rsplit('.', 1)[0])
+    return hostname.split('.', 1)[1] if '.' in hostname else ''
+
+
+def is_congestion(exception):
+    """ return True if exception is a connect failure caused by load - timeouts, refused or throttled
+        authentication and dropped handshakes - False otherwise
+    """
+    return isinstance(exception, ConnectError) and not isinstance(exception, UnknownHostError)
+
+
+class ConcurrencyLimit(object):
+    """ adaptive number of connects allowed in flight for a key
+    """
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.active = 0
+        self.slow_start = True
+        self.fastest = None
+        self.last_decrease = 0
+
+
+class ConcurrencyGovernor(object):
+    """ adapts the number of connects in flight per subnet or domain suffix with additive increase and
+        multiplicative decrease
+
+        the limit of a key doubles every round of successful connects until the first congestion, then grows
+        by one per round while connects succeed within LATENCY_TOLERANCE times the fastest connect seen,
+        timeouts, refused and throttled authentication cut it by decrease_factor - once per round since the
+        connects already in flight were started under the old limit - safe to share between threads
+    """
+    def __init__(self, initial_limit=None, min_limit=None, max_limit=None, decrease_factor=None, key_function=None):
+        self.initial_limit = initial_limit if initial_limit else INITIAL_LIMIT
+        self.min_limit = min_limit if min_limit else MIN_LIMIT
+        self.max_limit = max_limit if max_limit else MAX_LIMIT
+        self.decrease_factor = decrease_factor if decrease_factor else DECREASE_FACTOR
+        self.key_function = key_function if key_function else get_key
+        self.limits = {}
+        self.condition = threading.Condition()
+
+    def get_limit(self, key):
+        """ return current limit of key
+        """
+        with self.condition:
+            limit = self.limits.get(key)
+            return int(limit.limit) if limit else self.initial_limit
+
+    def acquire(self, hostname):
+        """ wait until another connect to the key of hostname is allowed and return the key and start time
+        """
+        key = self.key_function(hostname)
+        with self.condition:
+            limit = self.limits.get(key)
+            if limit is None:
+                limit = self.limits[key] = ConcurrencyLimit(self.initial_limit)
+            while limit.active >= int(limit.limit):
+                self.condition.wait()
+            limit.active += 1
+        return key, time()
+
+    def release(self, key, start, exception=None):
+        """ record the outcome of a connect to key started at start adjusting the limit of key
+        """
+        elapsed = time() - start
+        with self.condition:
+            limit = self.limits[key]
+            limit.active -= 1
+            if exception is None:
+                self._increase(key, limit, elapsed)
+            elif is_congestion(exception) and start > limit.last_decrease:
+                self._decrease(key, limit, exception)
+            self.condition.notify_all()
+
+    def _increase(self, key, limit, elapsed):
+        if limit.fastest is None or elapsed < limit.fastest:
+            limit.fastest = elapsed
+        if elapsed > limit.fastest * LATENCY_TOLERANCE:
+            return
+
+        limit.limit = min(limit.limit + (1 if limit.slow_start else 1 / limit.limit), self.max_limit)
+
+    def _decrease(self, key, limit, exception):
+        limit.limit = max(limit.limit * self.decrease_factor, self.min_limit)
+        limit.slow_start = False
+        limit.last_decrease = time()
+        logger.debug('connect to {} failed with {} - reducing limit to {}'.format(key, exception.__class__.__name__, int(limit.limit)))
+
+    def run(self, hostname, function):
+        """ return result of connect function for hostname run once the governor allows it
+        """
+        key, start = self.acquire(hostname)
+        try:
+            result = function()
+
+        except Exception as exception:
+            self.release(key, start, exception)
+            raise
+
+        self.release(key, start)
+        return result
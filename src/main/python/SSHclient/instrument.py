@@ -0,0 +1,123 @@
+import json
+import math
+import threading
+from array import array
+from time import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+DNS = 'dns'
+TCP_CONNECT = 'tcp_connect'
+# key exchange and authentication - both run inside paramiko SSHClient.connect
+HANDSHAKE = 'handshake'
+CHANNEL_OPEN = 'channel_open'
+FIRST_BYTE = 'first_byte'
+EXIT_STATUS = 'exit_status'
+
+PHASES = [DNS, TCP_CONNECT, HANDSHAKE, CHANNEL_OPEN, FIRST_BYTE, EXIT_STATUS]
+PERCENTILES = [50, 95, 99]
+
+# listeners called with each phase event - phases are only timed while a listener is attached
+listeners = []
+
+
+class PhaseEvent(object):
+    """ timing of a connect or execute phase for a host - command is None for connect phases
+    """
+    def __init__(self, hostname, phase, start, elapsed, command=None):
+        self.hostname = hostname
+        self.phase = phase
+        self.start = start
+        self.elapsed = elapsed
+        self.command = command
+
+    def __repr__(self):
+        return 'PhaseEvent({}, {}, {:.6f})'.format(self.hostname, self.phase, self.elapsed)
+
+
+def add_listener(listener):
+    """ call listener with a phase event each time a connect or execute phase completes
+    """
+    listeners.append(listener)
+
+
+def remove_listener(listener):
+    """ stop calling listener with phase events
+    """
+    listeners.remove(listener)
+
+
+def emit(hostname, phase, start, command=None):
+    """ pass phase event for phase that began at start to every listener
+    """
+    if not listeners:
+        return
+
+    event = PhaseEvent(hostname, phase, start, time() - start, command=command)
+    for listener in list(listeners):
+        try:
+            listener(event)
+
+        except Exception:
+            logger.exception('phase listener raised')
+
+
+def get_percentile(samples, percent):
+    """ return nearest rank percentile of sorted samples
+    """
+    if not samples:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(samples))) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+class LatencyCollector(object):
+    """ listener aggregating the elapsed seconds of phase events into latency percentiles per phase
+
+        attach with add_listener - samples are held in compact arrays so millions of events are cheap
+    """
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock:
+            samples = self.samples.get(event.phase)
+            if samples is None:
+                samples = self.samples[event.phase] = array('d')
+            samples.append(event.elapsed)
+
+    def reset(self):
+        with self.lock:
+            self.samples = {}
+
+    def summary(self):
+        """ return count, min, mean, max and percentiles in seconds for each phase with samples
+        """
+        with self.lock:
+            phases = dict((phase, sorted(samples)) for phase, samples in self.samples.items())
+
+        summary = {}
+        for phase, samples in phases.items():
+            statistics = {
+                'count': len(samples),
+                'min': samples[0],
+                'mean': sum(samples) / len(samples),
+                'max': samples[-1]
+            }
+            for percent in PERCENTILES:
+                statistics['p{}'.format(percent)] = get_percentile(samples, percent)
+            summary[phase] = statistics
+        return summary
+
+    def to_json(self, indent=None):
+        """ return summary as json
+        """
+        return json.dumps(self.summary(), indent=indent, sort_keys=True)
+
+    def dump(self, path):
+        """ write summary as json to path
+        """
+        with open(path, 'w') as output:
+            output.write(self.to_json(indent=2))
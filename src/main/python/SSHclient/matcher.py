@@ -0,0 +1,152 @@
+import re
+import threading
+from collections import OrderedDict
+
+import logging
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 128
+# number of characters of an unterminated line kept when streaming
+LINE_WINDOW = 4096
+# literals longer than this are matched as escaped alternatives instead of being merged into the trie
+# which is built recursively one level per character
+MAX_TRIE_LITERAL = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def split_success_responses(success_responses):
+    """ return literal success responses and regex success responses
+    """
+    literals = []
+    regexes = []
+    for success_response in success_responses:
+        success_response = str(success_response)
+        if '{regex}' in success_response:
+            regexes.append(success_response.split('{regex}')[1])
+        else:
+            literals.append(success_response)
+    return literals, regexes
+
+
+def _build_trie_regex(trie):
+    """ return regex source matching the literals stored in trie
+    """
+    alternatives = [re.escape(character) + _build_trie_regex(trie[character]) for character in sorted(trie) if character]
+    if not alternatives:
+        return ''
+
+    regex = alternatives[0] if len(alternatives) == 1 else '(?:{})'.format('|'.join(alternatives))
+    if '' in trie:
+        regex = '(?:{})?'.format(regex)
+    return regex
+
+
+def compile_literals(literals):
+    """ return compiled regex matching any of literals
+
+        the literals are merged into a trie so shared prefixes are only compared once and the
+        contents are scanned in a single pass no matter how many literals there are - literals longer
+        than MAX_TRIE_LITERAL are added as alternatives of their own
+    """
+    trie = {}
+    alternatives = []
+    for literal in literals:
+        if len(literal) > MAX_TRIE_LITERAL:
+            alternatives.append(re.escape(literal))
+            continue
+
+        node = trie
+        for character in literal:
+            node = node.setdefault(character, {})
+        node[''] = True
+
+    if trie:
+        alternatives.insert(0, _build_trie_regex(trie))
+    return re.compile('|'.join(alternatives))
+
+
+class SuccessMatcher(object):
+    """ compiled success responses
+
+        literal success responses are found anywhere in the contents while regex success responses
+        must match from the start of the contents as in check_success_responses
+    """
+    def __init__(self, success_responses):
+        literals, regexes = split_success_responses(success_responses)
+        self.literals = compile_literals(literals) if literals else None
+        self.regexes = [re.compile(regex, re.DOTALL) for regex in regexes]
+        # characters of previous data that can be the start of a literal split across chunks
+        self.overlap = max(len(literal) for literal in literals) - 1 if literals else 0
+
+    def check(self, contents):
+        """ returns True if any success response in contents False otherwise
+        """
+        if self.literals:
+            match = self.literals.search(contents)
+            if match:
+                logger.debug('success response {} found in contents'.format(match.group()))
+                return True
+
+        for regex in self.regexes:
+            if regex.match(contents):
+                logger.debug('regex {} found in contents'.format(regex.pattern))
+                return True
+
+        return False
+
+    def stream(self):
+        """ return stream match for checking contents received in chunks
+        """
+        return StreamMatch(self)
+
+
+class StreamMatch(object):
+    """ incremental match of success matcher over contents received in chunks
+
+        only the end of the previous chunks that can be part of a match is kept, literal success
+        responses are found even when split across chunks while regex success responses are
+        matched against each line - including the current unterminated line
+    """
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.tail = ''
+        self.line = ''
+
+    def feed(self, chunk):
+        """ returns True if any success response is found in contents received so far False otherwise
+        """
+        matcher = self.matcher
+        if matcher.literals:
+            window = self.tail + chunk
+            match = matcher.literals.search(window)
+            if match:
+                logger.debug('success response {} found in stream'.format(match.group()))
+                return True
+            self.tail = window[-matcher.overlap:] if matcher.overlap else ''
+
+        if matcher.regexes:
+            lines = (self.line + chunk).split('\n')
+            self.line = lines[-1][-LINE_WINDOW:]
+            for line in lines:
+                for regex in matcher.regexes:
+                    if regex.match(line):
+                        logger.debug('regex {} found in stream'.format(regex.pattern))
+                        return True
+
+        return False
+
+
+def compile_success_responses(success_responses):
+    """ return success matcher for success responses reusing recently compiled matchers
+    """
+    key = tuple(str(success_response) for success_response in success_responses)
+    with _cache_lock:
+        matcher = _cache.pop(key, None)
+        if matcher is None:
+            matcher = SuccessMatcher(success_responses)
+            while len(_cache) >= CACHE_SIZE:
+                _cache.popitem(last=False)
+        _cache[key] = matcher
+    return matcher
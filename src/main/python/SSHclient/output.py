@@ -0,0 +1,171 @@
+import io
+import mmap
+import re
+import tempfile
+from array import array
+
+from matcher import compile_success_responses
+
+import logging
+logger = logging.getLogger(__name__)
+
+# bytes held in memory before output is spilled to a temporary file
+SPILL_THRESHOLD = 16 * 1024 * 1024
+# bytes of output decoded at once when decoding lines
+DECODE_BLOCK_SIZE = 1024 * 1024
+
+
+def decode_lines(data, encoding=None):
+    """ return lines of data decoded from encoding - utf-8 by default - split after each line feed
+    """
+    return io.StringIO(data.decode(encoding or 'utf-8')).readlines()
+
+
+class OutputSink(object):
+    """ collects output in memory until it exceeds threshold bytes then spills it to a temporary file
+    """
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold else SPILL_THRESHOLD
+        self.chunks = []
+        self.size = 0
+        self.file = None
+
+    def write(self, data):
+        """ add data to output
+        """
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+
+        self.size += len(data)
+        if self.file:
+            self.file.write(data)
+            return
+
+        self.chunks.append(data)
+        if self.size > self.threshold:
+            logger.debug('output exceeded {} bytes - spilling to temporary file'.format(self.threshold))
+            self.file = tempfile.TemporaryFile(prefix='sshclient-')
+            self.file.writelines(self.chunks)
+            self.chunks = []
+
+    def result(self):
+        """ return captured output of everything written to sink
+        """
+        if self.file and self.size:
+            self.file.flush()
+            return CapturedOutput(mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ), self.file)
+
+        if self.file:
+            self.file.close()
+
+        contents = ''.join(self.chunks)
+        self.chunks = []
+        return CapturedOutput(contents)
+
+
+class CapturedOutput(object):
+    """ captured output held in memory or memory mapped from a temporary file
+
+        lines are indexed on first access and returned one at a time so the output is never split
+        into a list of strings, success responses and regexes are searched directly in the buffer
+    """
+    def __init__(self, buffer, file=None):
+        self.buffer = buffer
+        self.file = file
+        self._offsets = None
+
+    @property
+    def size(self):
+        return len(self.buffer)
+
+    @property
+    def offsets(self):
+        """ return start offset of each line
+        """
+        if self._offsets is None:
+            offsets = array('L')
+            find = self.buffer.find
+            size = len(self.buffer)
+            position = 0
+            while position < size:
+                offsets.append(position)
+                position = find('\n', position) + 1
+                if not position:
+                    break
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        offsets = self.offsets
+        if index < 0:
+            index += len(offsets)
+        if not 0 <= index < len(offsets):
+            raise IndexError('line index out of range')
+
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(self.buffer)
+        return self.buffer[offsets[index]:end]
+
+    def __iter__(self):
+        find = self.buffer.find
+        size = len(self.buffer)
+        position = 0
+        while position < size:
+            end = find('\n', position) + 1 or size
+            yield self.buffer[position:end]
+            position = end
+
+    def decode_lines(self, encoding=None):
+        """ return lines of output decoded from encoding - utf-8 by default
+
+            output is decoded and split a block of whole lines at a time instead of a line at a time, a line
+            end byte is never part of a multi byte character so blocks always end on character boundaries
+        """
+        buffer = self.buffer
+        size = len(buffer)
+        lines = []
+        position = 0
+        while position < size:
+            end = min(position + DECODE_BLOCK_SIZE, size)
+            if end < size:
+                # lines longer than a block are decoded whole
+                end = buffer.rfind('\n', position, end) + 1 or buffer.find('\n', end) + 1 or size
+            lines.extend(decode_lines(buffer[position:end], encoding))
+            position = end
+        return lines
+
+    def read(self):
+        """ return whole output as a string
+        """
+        return self.buffer[:]
+
+    def find(self, literal, start=0):
+        """ return offset of literal in output or -1 if not found
+        """
+        return self.buffer.find(literal, start)
+
+    def search(self, regex, flags=0):
+        """ return match of regex anywhere in output or None
+        """
+        return re.compile(regex, flags).search(self.buffer)
+
+    def check_success_responses(self, success_responses):
+        """ returns True if any success response in output False otherwise
+        """
+        return compile_success_responses(success_responses).check(self.buffer)
+
+    def close(self):
+        """ release memory map and temporary file
+        """
+        if self.file:
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
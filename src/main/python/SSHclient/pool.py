@@ -0,0 +1,156 @@
+import threading
+from collections import OrderedDict
+from time import time
+
+import sshclient
+
+import logging
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = 64
+IDLE_TIMEOUT = 300
+
+_default_pool = None
+
+
+def get_default_pool():
+    """ return process wide connection pool or None if pooling is not enabled
+    """
+    return _default_pool
+
+
+def set_default_pool(pool):
+    """ set process wide connection pool used by SSHclient - None disables pooling
+    """
+    global _default_pool
+    _default_pool = pool
+
+
+def is_busy(ssh):
+    """ return True if ssh connection has channels open False otherwise
+    """
+    transport = ssh.get_transport()
+    return transport is not None and len(transport._channels) > 0
+
+
+class PooledConnection(object):
+    """ ssh connection held by pool
+    """
+    def __init__(self, ssh):
+        self.ssh = ssh
+        self.last_used = time()
+
+    def is_idle(self, idle_timeout=0):
+        """ return True if no channel is open and the connection was not acquired or released for idle_timeout seconds
+        """
+        return not is_busy(self.ssh) and time() - self.last_used >= idle_timeout
+
+
+class ConnectionPool(object):
+    """ pool of live ssh connections keyed by hostname, username and port
+
+        a pooled connection is shared by every client that acquires it since ssh multiplexes
+        channels over a single transport, connections without open channels are closed once idle
+        for idle_timeout seconds or when room is needed for a new connection - clients whose
+        connection was closed acquire a new one before their next command
+
+        when every pooled connection has channels open new connections are made outside the pool
+        and closed when released
+    """
+    def __init__(self, max_size=None, idle_timeout=None):
+        self.max_size = max_size if max_size else MAX_SIZE
+        self.idle_timeout = idle_timeout if idle_timeout else IDLE_TIMEOUT
+        self.connections = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, hostname, username, password, timeout, set_missing_host_key_policy=False, port=None, profile=None):
+        """ return live ssh connection for hostname, username and port connecting if required
+
+            profile is only applied to new connections - a pooled connection keeps the profile it was made with
+        """
+        key = (hostname, username, port or sshclient.SSH_PORT)
+        with self.lock:
+            self._evict_idle()
+            connection = self._get(key)
+            if connection:
+                logger.debug('reusing pooled connection to: {}'.format(hostname))
+                connection.last_used = time()
+                return connection.ssh
+
+        ssh = sshclient.connect(
+            hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy, port=port,
+            profile=profile)
+        with self.lock:
+            connection = self._get(key)
+            if connection:
+                # another thread connected while this one was connecting
+                logger.debug('discarding duplicate connection to: {}'.format(hostname))
+                ssh.close()
+                connection.last_used = time()
+                return connection.ssh
+
+            if not self._make_room():
+                logger.debug('connection pool is full - connection to: {} is not pooled'.format(hostname))
+                return ssh
+
+            self.connections[key] = PooledConnection(ssh)
+            return ssh
+
+    def release(self, ssh):
+        """ release ssh connection back to pool
+        """
+        with self.lock:
+            for connection in self.connections.values():
+                if connection.ssh is ssh:
+                    connection.last_used = time()
+                    return
+
+        # connection was not pooled or was evicted or replaced
+        ssh.close()
+
+    def close(self):
+        """ close all pooled connections
+        """
+        with self.lock:
+            for key, connection in self.connections.items():
+                logger.debug('closing pooled connection to: {}'.format(key[0]))
+                connection.ssh.close()
+            self.connections.clear()
+
+    def _get(self, key):
+        """ return live connection for key marking it most recently used or None
+        """
+        connection = self.connections.pop(key, None)
+        if not connection:
+            return None
+
+        if not sshclient.is_connected(connection.ssh):
+            logger.debug('discarding dead pooled connection to: {}'.format(key[0]))
+            connection.ssh.close()
+            return None
+
+        self.connections[key] = connection
+        return connection
+
+    def _evict_idle(self):
+        """ close connections idle for longer than idle timeout
+        """
+        for key, connection in self.connections.items():
+            if connection.is_idle(self.idle_timeout):
+                logger.debug('evicting idle pooled connection to: {}'.format(key[0]))
+                connection.ssh.close()
+                del self.connections[key]
+
+    def _make_room(self):
+        """ close least recently used connections without open channels until there is room for another
+            connection - return False if every connection has channels open
+        """
+        for key, connection in self.connections.items():
+            if len(self.connections) < self.max_size:
+                return True
+            if connection.is_idle():
+                logger.debug('evicting least recently used pooled connection to: {}'.format(key[0]))
+                connection.ssh.close()
+                del self.connections[key]
+
+        return len(self.connections) < self.max_size
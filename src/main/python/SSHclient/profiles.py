@@ -0,0 +1,81 @@
+import paramiko
+
+import logging
+logger = logging.getLogger(__name__)
+
+LAN_FAST = 'lan-fast'
+WAN_BULK = 'wan-bulk'
+LOW_CPU = 'low-cpu'
+
+# hmac-sha2-512 costs about two thirds of hmac-sha2-256 per byte on 64 bit hosts and the mac dominates the
+# crypto cost since aes-ctr runs in openssl - hmac-sha1 is kept as a fallback for older devices
+FAST_CIPHERS = ['aes128-ctr', 'aes256-ctr']
+FAST_MACS = ['hmac-sha2-512', 'hmac-sha2-512-etm@openssh.com', 'hmac-sha1']
+
+
+class TransportProfile(object):
+    """ cipher and mac preference, compression, channel window and maximum packet size of a connection
+
+        ciphers and macs restrict the algorithms offered - in paramiko's order of preference - window_size
+        and max_packet_size apply to every channel opened on the connection
+    """
+    def __init__(self, name, ciphers=None, macs=None, compress=False, window_size=None, max_packet_size=None):
+        self.name = name
+        self.ciphers = ciphers
+        self.macs = macs
+        self.compress = compress
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+
+    def get_disabled_algorithms(self):
+        """ return algorithms to disable so only the profile ciphers and macs are offered
+        """
+        disabled = {}
+        if self.ciphers:
+            disabled['ciphers'] = [cipher for cipher in paramiko.Transport._preferred_ciphers if cipher not in self.ciphers]
+        if self.macs:
+            disabled['macs'] = [mac for mac in paramiko.Transport._preferred_macs if mac not in self.macs]
+        return disabled
+
+    def get_connect_arguments(self):
+        """ return paramiko connect keyword arguments of profile
+        """
+        return {
+            'compress': self.compress,
+            'disabled_algorithms': self.get_disabled_algorithms()
+        }
+
+    def apply(self, transport):
+        """ set channel window and maximum packet size of transport
+        """
+        if self.window_size:
+            transport.default_window_size = self.window_size
+        if self.max_packet_size:
+            transport.default_max_packet_size = self.max_packet_size
+
+    def __repr__(self):
+        return 'TransportProfile({})'.format(self.name)
+
+
+PROFILES = {
+    # low latency links - cheapest secure algorithms with a channel window that covers the lan round trip
+    LAN_FAST: TransportProfile(
+        LAN_FAST, ciphers=FAST_CIPHERS, macs=FAST_MACS, window_size=4 * 1024 * 1024),
+    # high latency links - the window covers the bandwidth delay product and compression saves bandwidth
+    WAN_BULK: TransportProfile(
+        WAN_BULK, ciphers=FAST_CIPHERS, macs=FAST_MACS, compress=True, window_size=32 * 1024 * 1024),
+    # fewer larger packets and window adjustments mean fewer per packet mac and python overheads
+    LOW_CPU: TransportProfile(
+        LOW_CPU, ciphers=FAST_CIPHERS, macs=FAST_MACS, window_size=16 * 1024 * 1024, max_packet_size=256 * 1024)
+}
+
+
+def get_profile(profile):
+    """ return transport profile for profile name or profile - None if profile is None
+    """
+    if profile is None or isinstance(profile, TransportProfile):
+        return profile
+
+    if profile not in PROFILES:
+        raise ValueError('unknown transport profile "{}" - expected one of {}'.format(profile, sorted(PROFILES)))
+    return PROFILES[profile]
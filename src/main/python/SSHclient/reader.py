@@ -0,0 +1,99 @@
+import select
+
+from output import OutputSink
+
+import logging
+logger = logging.getLogger(__name__)
+
+STDOUT = 'stdout'
+STDERR = 'stderr'
+# bytes received from each stream per read
+BUFFER_SIZE = 32768
+
+
+class ChannelReader(object):
+    """ drains stdout and stderr of a channel together from one readiness loop
+
+        both streams share the channel window so output left unread on one stalls the other - each
+        stream is written to its own output sink as it arrives and when merged is set the chunks of
+        both streams are also kept as (stream, data) tuples in the order they were received
+    """
+    def __init__(self, channel, stdout=None, stderr=None, merged=False):
+        self.channel = channel
+        self.stdout = stdout if stdout is not None else OutputSink()
+        self.stderr = stderr if stderr is not None else OutputSink()
+        self.merged = [] if merged else None
+
+    def read(self):
+        """ read both streams until eof or until the channel is closed
+        """
+        for stream, data in self._receive():
+            self._write(stream, self.stdout if stream == STDOUT else self.stderr, data)
+
+    def iter_lines(self):
+        """ yield stdout lines with their line endings as they are received until eof or until the channel is
+            closed - stderr is written to its sink from the same loop and only the current stdout line is held
+        """
+        partial = ''
+        for stream, data in self._receive():
+            if stream == STDERR:
+                self._write(STDERR, self.stderr, data)
+                continue
+
+            lines = (partial + data).split('\n')
+            partial = lines.pop()
+            for line in lines:
+                yield line + '\n'
+
+        if partial:
+            yield partial
+
+    def _receive(self):
+        """ yield (stream, data) chunks of both streams as they are received until eof or the channel is closed
+        """
+        channel = self.channel
+        while True:
+            # all output has been received once eof is seen so it is checked before draining
+            eof = channel.eof_received or channel.closed
+            received = False
+            if channel.recv_ready():
+                received = True
+                yield STDOUT, channel.recv(BUFFER_SIZE)
+            if channel.recv_stderr_ready():
+                received = True
+                yield STDERR, channel.recv_stderr(BUFFER_SIZE)
+            if received:
+                continue
+            if eof:
+                return
+            select.select([channel], [], [])
+
+    def _write(self, stream, sink, data):
+        sink.write(data)
+        if self.merged is not None:
+            self.merged.append((stream, data))
+
+    def get_data(self, stream):
+        """ return output of stream - the sink of the stream is consumed
+        """
+        output = (self.stdout if stream == STDOUT else self.stderr).result()
+        try:
+            return output.read()
+
+        finally:
+            output.close()
+
+    def get_lines(self, stream):
+        """ return decoded lines of stream - the sink of the stream is consumed
+        """
+        output = (self.stdout if stream == STDOUT else self.stderr).result()
+        try:
+            return output.decode_lines()
+
+        finally:
+            output.close()
+
+    def get_merged(self):
+        """ return output of both streams in the order it was received
+        """
+        return ''.join(data for _, data in self.merged or [])
@@ -0,0 +1,102 @@
+import socket
+import threading
+from time import time
+
+import logging
+logger = logging.getLogger(__name__)
+
+# seconds the domain a hostname last connected with is tried first
+DOMAIN_TTL = 300
+# seconds resolved addresses are reused
+ADDRESS_TTL = 60
+
+_default_resolver = None
+
+
+def get_default_resolver():
+    """ return process wide resolver or None if caching is not enabled
+    """
+    return _default_resolver
+
+
+def set_default_resolver(resolver):
+    """ set process wide resolver used by connect and SSHclient - None disables caching
+    """
+    global _default_resolver
+    _default_resolver = resolver
+
+
+class Resolver(object):
+    """ cache of the domain each hostname last connected with and of the addresses names resolve to
+
+        the domain that last succeeded is tried first until it expires or fails, resolved addresses are
+        reused until they expire or a connection to them fails - safe to share between threads
+    """
+    def __init__(self, domain_ttl=None, address_ttl=None):
+        self.domain_ttl = domain_ttl if domain_ttl is not None else DOMAIN_TTL
+        self.address_ttl = address_ttl if address_ttl is not None else ADDRESS_TTL
+        self.domains = {}
+        self.addresses = {}
+        self.lock = threading.Lock()
+
+    def get_domain(self, hostname):
+        """ return domain hostname last connected with or None if unknown or expired
+        """
+        with self.lock:
+            entry = self.domains.get(hostname)
+            if entry is None:
+                return None
+            if entry[1] <= time():
+                del self.domains[hostname]
+                return None
+            return entry[0]
+
+    def order_domains(self, hostname, domains):
+        """ return domains with the domain hostname last connected with first
+        """
+        domain = self.get_domain(hostname)
+        if domain not in domains:
+            return list(domains)
+        logger.debug('trying cached domain {} first for {}'.format(domain, hostname))
+        return [domain] + [other for other in domains if other != domain]
+
+    def set_domain(self, hostname, domain):
+        """ remember hostname connected with domain
+        """
+        with self.lock:
+            self.domains[hostname] = (domain, time() + self.domain_ttl)
+
+    def invalidate_domain(self, hostname, domain):
+        """ forget domain for hostname if it is the remembered domain
+        """
+        with self.lock:
+            entry = self.domains.get(hostname)
+            if entry is not None and entry[0] == domain:
+                logger.debug('invalidating cached domain {} for {}'.format(domain, hostname))
+                del self.domains[hostname]
+
+    def getaddrinfo(self, hostname, port):
+        """ return stream addresses of hostname resolving it only when not cached or expired
+        """
+        key = (hostname, port)
+        with self.lock:
+            entry = self.addresses.get(key)
+            if entry is not None and entry[1] > time():
+                return entry[0]
+
+        addresses = socket.getaddrinfo(hostname, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        with self.lock:
+            self.addresses[key] = (addresses, time() + self.address_ttl)
+        return addresses
+
+    def invalidate_addresses(self, hostname):
+        """ forget addresses of hostname
+        """
+        with self.lock:
+            for key in [key for key in self.addresses if key[0] == hostname]:
+                del self.addresses[key]
+
+    def clear(self):
+        with self.lock:
+            self.domains = {}
+            self.addresses = {}
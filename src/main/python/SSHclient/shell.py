@@ -0,0 +1,181 @@
+import re
+import socket
+import threading
+from time import time
+
+import sshclient
+from matcher import compile_success_responses
+
+import logging
+logger = logging.getLogger(__name__)
+
+# end of output that looks like a shell prompt - used to notice a prompt that changed since it was detected
+ANY_PROMPT = r'[#$>%] ?\Z'
+
+
+def detect_prompt(data):
+    """ return regex matching the prompt that data ends with or None if data does not end with a prompt
+    """
+    data = data[-sshclient.PROMPT_WINDOW:]
+    if not re.search(ANY_PROMPT, data):
+        return None
+    prompt = data.replace('\r', '\n').split('\n')[-1].strip()
+    return '{}\\s*$'.format(re.escape(prompt))
+
+
+def shell_expect(shell, lines, prompt, timeout=None):
+    """ return data received from shell until prompt is received and add data to lines
+
+        prompt is matched incrementally as data is received - literal or {regex} as in success responses
+        with a regex prompt matched against each line - raises ExecuteError if prompt is not received
+        within timeout seconds or the shell is closed
+    """
+    if not timeout:
+        timeout = sshclient.SHELL_TIMEOUT
+
+    logger.debug('expecting prompt "{}"'.format(prompt))
+    stream = compile_success_responses([prompt]).stream()
+    deadline = time() + timeout
+    chunks = []
+    while True:
+        remaining = deadline - time()
+        if remaining <= 0:
+            raise sshclient.ExecuteError('prompt "{}" not received within {} seconds'.format(prompt, timeout))
+
+        shell.settimeout(remaining)
+        try:
+            chunk = shell.recv(sshclient.SHELL_BUFFER_SIZE)
+
+        except socket.timeout:
+            continue
+
+        if not chunk:
+            raise sshclient.ExecuteError('shell closed before prompt "{}" was received'.format(prompt))
+
+        chunks.append(chunk)
+        if stream.feed(chunk):
+            logger.debug('prompt "{}" received'.format(prompt))
+            break
+
+    data = ''.join(chunks)
+    # the chunks are released before data is split so they are not held alongside the lines
+    del chunks[:]
+    lines += data.split('\r\n')
+    return data
+
+
+class ShellSession(object):
+    """ long lived interactive shell on an ssh connection
+
+        the shell is opened once and reused for every command, the prompt is detected from the
+        login banner unless specified and the shell is reopened if it is found to have died
+
+        a detected prompt is detected again after each command since commands such as configure terminal
+        or cd change it - output that ends with a different prompt is complete once the shell goes quiet
+    """
+    def __init__(self, ssh, prompt=None, timeout=None, quiet_period=None):
+        self.ssh = ssh
+        self.prompt = prompt
+        self.auto_prompt = not prompt
+        self.timeout = timeout
+        self.quiet_period = quiet_period
+        self.shell = None
+        self.banner = None
+        self.lock = threading.Lock()
+
+    def is_alive(self):
+        """ return True if shell is open and the remote shell has not exited False otherwise
+        """
+        if self.shell is None or self.shell.closed or self.shell.exit_status_ready():
+            return False
+        return sshclient.is_connected(self.ssh)
+
+    def open(self):
+        """ open shell and wait for login banner
+        """
+        logger.debug('opening shell session')
+        self.shell = self.ssh.invoke_shell()
+        self.banner = sshclient._shell_receive(
+            self.shell, [], timeout=self.timeout, quiet_period=self.quiet_period, prompt=None if self.auto_prompt else self.prompt)
+        if self.auto_prompt:
+            self.prompt = detect_prompt(self.banner)
+            logger.debug('detected shell prompt {}'.format(self.prompt))
+
+    def close(self):
+        """ close shell
+        """
+        if self.shell is not None:
+            logger.debug('closing shell session')
+            self.shell.close()
+            self.shell = None
+
+    def _receive(self, lines, prompt, fallback_prompt=None):
+        """ return data received from shell and add data to lines
+        """
+        return sshclient._shell_receive(
+            self.shell, lines, timeout=self.timeout, quiet_period=self.quiet_period, prompt=prompt,
+            fallback_prompt=fallback_prompt)
+
+    def _check_prompt(self, data):
+        """ detect prompt again from data if it was detected and raise ExecuteError if data does not end with
+            the shell prompt while the shell is still open
+        """
+        if self.prompt and re.search(self.prompt, data[-sshclient.PROMPT_WINDOW:]):
+            return
+
+        if self.auto_prompt:
+            prompt = detect_prompt(data)
+            if prompt:
+                logger.debug('shell prompt changed to {}'.format(prompt))
+                self.prompt = prompt
+                return
+
+            if self.prompt is None:
+                # without a prompt output is complete once the shell goes quiet
+                return
+
+        if self.is_alive():
+            raise sshclient.ExecuteError('shell prompt not received within {} seconds'.format(
+                self.timeout or sshclient.SHELL_TIMEOUT))
+
+    def run(self, command, send_inputs=None, success_responses=None, input_prompt=None):
+        """ execute command in shell with provided inputs and return output lines
+
+            an input given as a (prompt, input) tuple is sent as soon as its prompt is received, output
+            before any other input is complete once it ends with input_prompt - or the shell goes quiet if
+            not specified - and output after the final input is complete once the shell prompt returns,
+            ExecuteError is raised if the shell prompt does not return within timeout seconds
+        """
+        with self.lock:
+            if not self.is_alive():
+                if self.shell is not None:
+                    logger.debug('shell session died - reopening')
+                    self.close()
+                self.open()
+
+            if self.shell.recv_ready():
+                # discard output left over from a previous command
+                sshclient._shell_receive(self.shell, [], quiet_period=self.quiet_period, wait=False)
+
+            stdoutlines = []
+            logger.debug('executing shell session command "{}"'.format(command))
+            self.shell.send(command + '\n')
+            for send_input in send_inputs or []:
+                if isinstance(send_input, tuple):
+                    prompt, send_input = send_input
+                    shell_expect(self.shell, stdoutlines, prompt, timeout=self.timeout)
+                else:
+                    self._receive(stdoutlines, input_prompt)
+                self.shell.send(send_input + '\n')
+            self._check_prompt(self._receive(stdoutlines, self.prompt, ANY_PROMPT if self.auto_prompt else None))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('\r\n'.join(stdoutlines))
+        if success_responses:
+            logger.debug('checking stdout for success responses "{}"'.format(success_responses))
+            if sshclient.check_success_responses(''.join(stdoutlines), success_responses):
+                return stdoutlines
+
+            raise sshclient.ExecuteError('success responses not found in stdout')
+
+        return stdoutlines
@@ -1,14 +1,57 @@
 
 import re
 import paramiko
+import select
 import socket
+import threading
+import uuid
+from Queue import Queue
+from multiprocessing.pool import ThreadPool
 from time import sleep
+from time import time
+
+import instrument
+from auth import Credentials
+from auth import PASSWORD
+from cache import get_default_cache
+from matcher import compile_success_responses
+from output import OutputSink
+from output import decode_lines
+from pool import get_default_pool
+from profiles import get_profile
+from reader import ChannelReader
+from reader import STDERR
+from reader import STDOUT
+from resolver import get_default_resolver
+from shell import ShellSession
+from shell import shell_expect
 
 import logging
 logger = logging.getLogger(__name__)
 
 logging.getLogger('paramiko').setLevel(logging.CRITICAL)
 
+SSH_PORT = 22
+# seconds to wait for each step of a shell execute to complete
+SHELL_TIMEOUT = 30
+# seconds without data after which shell output is considered complete
+SHELL_QUIET_PERIOD = .25
+SHELL_BUFFER_SIZE = 16348
+CHANNEL_BUFFER_SIZE = 32768
+# number of trailing characters of shell output searched for the prompt
+PROMPT_WINDOW = 256
+# OpenSSH default MaxSessions - the number of channels sshd allows per connection
+MAX_CHANNELS = 10
+# attempts made to reconnect a dropped connection - RECONNECT_BACKOFF seconds apart doubling after each attempt
+RECONNECT_ATTEMPTS = 3
+RECONNECT_BACKOFF = 1
+# seconds to wait for the channel opened by a liveness probe
+PROBE_TIMEOUT = 5
+# exit code paramiko reports for a channel closed without an exit status
+NO_EXIT_STATUS = -1
+# errors raised by paramiko when the connection is lost while a command is executed
+CONNECTION_ERRORS = (paramiko.ssh_exception.SSHException, socket.error, EOFError)
+
 
 def print_out(lines):
     """ print lines to screen
@@ -18,9 +61,11 @@ def print_out(lines):
 
 
 class ConnectError(Exception):
-    """ connection error
+    """ connection error - errors maps each attempted hostname to the error it raised
     """
-    pass
+    def __init__(self, *args, **kwargs):
+        self.errors = kwargs.pop('errors', None) or {}
+        super(ConnectError, self).__init__(*args, **kwargs)
 
 
 class TimeOutError(ConnectError):
@@ -42,19 +87,239 @@ class UnknownHostError(ConnectError):
 
 
 class ExecuteError(Exception):
-    """ execution error
+    """ execution error - results holds the command results of a batch when one of its commands failed
+    """
+    def __init__(self, *args, **kwargs):
+        self.results = kwargs.pop('results', None) or []
+        super(ExecuteError, self).__init__(*args, **kwargs)
+
+
+class CommandTimeoutError(ExecuteError):
+    """ command did not complete within its command timeout
+    """
+    pass
+
+
+class CommandCancelledError(ExecuteError):
+    """ command cancelled by its cancel token
     """
     pass
 
 
+class CommandDeadline(object):
+    """ closes the channel of a command once command_timeout seconds have passed or cancel_token is cancelled
+
+        closing the channel unblocks every read and the wait for the exit status so a hung command can
+        not hold its thread
+    """
+    def __init__(self, command, command_timeout=None, cancel_token=None):
+        self.command = command
+        self.command_timeout = command_timeout
+        self.cancel_token = cancel_token
+        self.deadline = time() + command_timeout if command_timeout else None
+        self.channel = None
+        self.timer = None
+
+    def remaining(self):
+        """ return seconds left before the deadline - None if there is no deadline
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time(), 0)
+
+    def limit(self, seconds):
+        """ return seconds capped to the time left before the deadline
+        """
+        remaining = self.remaining()
+        return seconds if remaining is None else min(seconds, remaining)
+
+    def expired(self):
+        """ return True if the command was cancelled or is past its deadline False otherwise
+        """
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return True
+        return self.deadline is not None and time() >= self.deadline
+
+    def check(self):
+        """ raise CommandCancelledError or CommandTimeoutError if the command was cancelled or is past its deadline
+        """
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            raise CommandCancelledError('command "{}" cancelled'.format(self.command))
+        if self.deadline is not None and time() >= self.deadline:
+            raise CommandTimeoutError('command "{}" timed out after {} seconds'.format(self.command, self.command_timeout))
+
+    def watch(self, channel):
+        """ close channel at the deadline or when cancelled
+        """
+        self.channel = channel
+        if self.deadline is not None:
+            self.timer = threading.Timer(self.remaining(), self.expire)
+            self.timer.daemon = True
+            self.timer.start()
+        if self.cancel_token is not None:
+            self.cancel_token.register(channel)
+
+    def expire(self):
+        logger.debug('command "{}" timed out after {} seconds - closing channel'.format(self.command, self.command_timeout))
+        self.channel.close()
+
+    def stop(self):
+        """ stop watching the channel
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.cancel_token is not None and self.channel is not None:
+            self.cancel_token.unregister(self.channel)
+
+
+def is_connected(ssh):
+    """ return True if transport of ssh connection - or of a channel - is active False otherwise
+    """
+    transport = ssh.get_transport()
+    return transport is not None and transport.is_active()
+
+
+def probe(ssh, timeout=None):
+    """ return True if a channel can be opened on ssh connection within timeout seconds False otherwise
+
+        costs a single round trip - detects sessions dropped by the network that still look active
+    """
+    if not is_connected(ssh):
+        return False
+
+    try:
+        channel = ssh.get_transport().open_session(timeout=timeout or PROBE_TIMEOUT)
+
+    except CONNECTION_ERRORS as exception:
+        logger.debug('liveness probe failed: {}'.format(exception))
+        return False
+
+    channel.close()
+    return True
+
+
+class CommandResult(object):
+    """ stdout lines, stderr lines and exit code of executed command
+    """
+    def __init__(self, command, stdout, stderr, exit_code):
+        self.command = command
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_code = exit_code
+
+    def has_exit_status(self):
+        """ return True if the command reported an exit status False if its channel closed without one
+        """
+        return self.exit_code is not None and self.exit_code != NO_EXIT_STATUS
+
+    def __repr__(self):
+        return 'CommandResult({}, {})'.format(self.command, self.exit_code)
+
+
+def get_batch_script(commands, marker):
+    """ return shell script running commands one after the other each followed by a marker line on stdout
+        carrying its index and exit code and a marker line on stderr carrying its index
+
+        each command runs in its own subshell so an exit or failure does not end the batch
+    """
+    steps = []
+    for index, command in enumerate(commands):
+        steps.append(
+            "(\n{}\n) </dev/null\n"
+            "printf '\\n%s:%d:%d\\n' '{}' {} $?\n"
+            "printf '\\n%s:%d\\n' '{}' {} >&2".format(command, marker, index, marker, index))
+    return '\n'.join(steps) + '\n'
+
+
+def split_batch_output(stdout, stderr, commands, marker):
+    """ return command results parsed from marker delimited stdout and stderr of batch script
+
+        the newline written ahead of each marker is removed so output is returned exactly as written - decoded
+        and split into lines as by execute
+    """
+    stdout_parts = re.split('\n{}:[0-9]+:([0-9]+)\n'.format(re.escape(marker)), stdout)
+    stderr_parts = re.split('\n{}:[0-9]+\n'.format(re.escape(marker)), stderr)
+    results = []
+    for index, exit_code in enumerate(stdout_parts[1::2]):
+        stderr_part = stderr_parts[index] if index < len(stderr_parts) else ''
+        results.append(CommandResult(
+            commands[index], decode_lines(stdout_parts[index * 2]), decode_lines(stderr_part), int(exit_code)))
+    return results
+
+
 def generate_hostnames(hostname, domains):
     """ return hostnames
     """
     return ['{}{}'.format(hostname, domain) for domain in domains]
 
 
-def connect(hostname, username, password, timeout, set_missing_host_key_policy=False):
+def open_socket(hostname, port, timeout, resolver=None):
+    """ return socket connected to hostname timing the dns and tcp connect phases
+
+        addresses are taken from resolver when specified and forgotten if none of them can be connected
+    """
+    start = time()
+    if resolver is not None:
+        addresses = resolver.getaddrinfo(hostname, port)
+    else:
+        addresses = socket.getaddrinfo(hostname, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    instrument.emit(hostname, instrument.DNS, start)
+
+    start = time()
+    for family, socket_type, protocol, _, address in addresses:
+        sock = socket.socket(family, socket_type, protocol)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+
+        except socket.error as exception:
+            sock.close()
+            error = exception
+            continue
+
+        instrument.emit(hostname, instrument.TCP_CONNECT, start)
+        return sock
+
+    if resolver is not None:
+        resolver.invalidate_addresses(hostname)
+    raise error
+
+
+def authenticate(ssh, username, methods):
+    """ return True if any of methods authenticates the transport of ssh False otherwise
+
+        used for the methods after the first which is tried by paramiko connect
+    """
+    transport = ssh.get_transport()
+    for method, credential in methods:
+        if transport is None or not transport.is_active():
+            return False
+
+        logger.debug('attempting {} authentication'.format(method))
+        try:
+            if method == PASSWORD:
+                transport.auth_password(username, credential)
+            else:
+                transport.auth_publickey(username, credential)
+
+        except paramiko.ssh_exception.AuthenticationException:
+            continue
+
+        if transport.is_authenticated():
+            return True
+    return False
+
+
+def connect(hostname, username, password, timeout, set_missing_host_key_policy=False, port=None, profile=None):
     """ return ssh connection
+
+        password is a password or Credentials - the first of its methods is passed to paramiko connect
+        and the remaining methods are tried on the same transport if it fails
+
+        profile is a transport profile or the name of one - its algorithms and compression are negotiated
+        and its window and packet sizes are used by every channel of the connection
+
+        the address of hostname is taken from the default resolver when one is set
     """
     try:
         ssh = paramiko.SSHClient()
@@ -62,8 +327,37 @@ def connect(hostname, username, password, timeout, set_missing_host_key_policy=F
         if set_missing_host_key_policy:
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
+        methods = []
+        arguments = {'password': password}
+        if isinstance(password, Credentials):
+            methods = password.get_methods()
+            if not methods:
+                raise paramiko.ssh_exception.AuthenticationException('no authentication methods available')
+            method, credential = methods.pop(0)
+            arguments = {'allow_agent': False, 'look_for_keys': False}
+            arguments['password' if method == PASSWORD else 'pkey'] = credential
+
+        profile = get_profile(profile)
+        if profile is not None:
+            arguments.update(profile.get_connect_arguments())
+
         logger.debug('attempting to connect to: {}'.format(hostname))
-        ssh.connect(hostname, username=username, password=password, timeout=timeout)
+        resolver = get_default_resolver()
+        if instrument.listeners or resolver is not None:
+            arguments['sock'] = open_socket(hostname, port or SSH_PORT, timeout, resolver=resolver)
+
+        start = time()
+        try:
+            ssh.connect(hostname, port=port or SSH_PORT, username=username, timeout=timeout, **arguments)
+
+        except paramiko.ssh_exception.AuthenticationException as exception:
+            if not authenticate(ssh, username, methods):
+                ssh.close()
+                raise exception
+
+        if profile is not None:
+            profile.apply(ssh.get_transport())
+        instrument.emit(hostname, instrument.HANDSHAKE, start)
         logger.debug('successfully connected to: {}'.format(hostname))
         return ssh
 
@@ -77,6 +371,12 @@ def connect(hostname, username, password, timeout, set_missing_host_key_policy=F
         logger.error(message)
         raise UnknownHostError(message)
 
+    except socket.error as exception:
+        # refused, reset and unreachable connections
+        message = 'error connecting to: {} : {}'.format(hostname, str(exception))
+        logger.error(message)
+        raise ConnectError(message)
+
     except paramiko.ssh_exception.AuthenticationException:
         message = 'error connecting to: {} authentication error for user {} credentials'.format(hostname, username)
         logger.error(message)
@@ -88,73 +388,552 @@ def connect(hostname, username, password, timeout, set_missing_host_key_policy=F
         raise ConnectError(message)
 
 
+def _race_attempt(index, hostname, results, done, stagger, connect_function):
+    """ attempt connection to hostname and put outcome on results queue
+    """
+    if stagger and index:
+        done.wait(stagger * index)
+
+    if done.is_set():
+        logger.debug('connection attempt to: {} cancelled'.format(hostname))
+        results.put((hostname, None, None))
+        return
+
+    try:
+        ssh = connect_function(hostname)
+
+    except Exception as exception:
+        results.put((hostname, None, exception))
+        return
+
+    results.put((hostname, ssh, None))
+
+
+def _close_race_losers(results, count, close_function):
+    """ close any connections established by attempts that lost the race
+    """
+    for _ in range(count):
+        hostname, ssh, error = results.get()
+        if ssh:
+            logger.debug('closing connection to: {} lost the race'.format(hostname))
+            close_function(ssh)
+
+
+def _race(hostnames, connect_function, stagger=None, close_function=None):
+    """ return hostname and ssh connection of the first hostname connect_function connects to
+    """
+    if not close_function:
+        close_function = _close
+    results = Queue()
+    done = threading.Event()
+    for index, hostname in enumerate(hostnames):
+        thread = threading.Thread(
+            target=_race_attempt,
+            args=(index, hostname, results, done, stagger, connect_function),
+            name='race-{}'.format(hostname))
+        thread.daemon = True
+        thread.start()
+
+    errors = {}
+    for received in range(1, len(hostnames) + 1):
+        hostname, ssh, error = results.get()
+        if ssh:
+            done.set()
+            logger.debug('{} won the connection race'.format(hostname))
+            reaper = threading.Thread(target=_close_race_losers, args=(results, len(hostnames) - received, close_function))
+            reaper.daemon = True
+            reaper.start()
+            return hostname, ssh
+
+        errors[hostname] = error
+
+    raise ConnectError('unable to connect to any of {}'.format(', '.join(hostnames)), errors=errors)
+
+
+def _close(ssh):
+    """ close ssh connection
+    """
+    ssh.close()
+
+
+def race_connect(hostnames, username, password, timeout, set_missing_host_key_policy=False, stagger=None, port=None,
+                 pool=None, profile=None, governor=None):
+    """ return hostname and ssh connection of the first hostname to connect
+
+        connection attempts to all hostnames are started at once - or stagger seconds apart - the first
+        to authenticate wins, attempts not yet started are cancelled and late connections are closed
+        or released back to pool if one is specified, each attempt waits until governor allows it if specified
+    """
+    def connect_hostname(hostname):
+        if pool is not None:
+            return pool.acquire(
+                hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy, port=port,
+                profile=profile)
+        return connect(
+            hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy, port=port,
+            profile=profile)
+
+    def connect_function(hostname):
+        if governor is not None:
+            return governor.run(hostname, lambda: connect_hostname(hostname))
+        return connect_hostname(hostname)
+
+    return _race(hostnames, connect_function, stagger=stagger, close_function=pool.release if pool is not None else None)
+
+
 def check_success_responses(contents, success_responses):
     """ returns True if any success response in contents False otherwise
     """
-    for success_response in success_responses:
-        if '{regex}' in str(success_response):
-            success_response_split = success_response.split('{regex}')
-            match = success_response_split[1]
-            logger.debug('checking regex {} in contents'.format(match))
-            if re.match(match, contents, re.DOTALL):
-                logger.debug('regex {} found in contents'.format(match))
-                return True
-        else:
-            if str(success_response) in contents:
-                logger.debug('success response {} found in contents'.format(success_response))
-                return True
-    return False
+    return compile_success_responses(success_responses).check(contents)
 
 
-def _shell_receive(shell, lines):
-    """ return data received from shell and data to lines
+def check_result(result, success_responses, printout, expected_exit_code):
+    """ return a copy of the stdout lines of result if success responses are found in them or else if its
+        exit code is expected_exit_code - printed out when printout is set
+
+        results may be cached and shared between callers so callers never get the cached list itself
     """
-    while not shell.recv_ready():
-        sleep(.1)
+    if not expected_exit_code:
+        expected_exit_code = 0
+
+    if success_responses:
+        logger.debug('checking stdout for success responses "{}"'.format(success_responses))
+        if check_success_responses(''.join(result.stdout), success_responses):
+            return list(result.stdout)
+
+        raise ExecuteError('success responses not found in stdout')
+
+    if result.exit_code != expected_exit_code:
+        error = ''.join(result.stderr) + 'exit code: {}'.format(result.exit_code)
+        raise ExecuteError(error)
+
+    if printout:
+        return print_out(result.stdout)
+
+    return list(result.stdout)
+
+
+def _shell_receive(shell, lines, timeout=None, quiet_period=None, prompt=None, wait=True, fallback_prompt=None):
+    """ return data received from shell and add data to lines
 
-    data = ''
-    while shell.recv_ready():
-        data += shell.recv(16348)
+        blocks until data is received - or for up to quiet_period seconds if wait is False - then reads until
+        prompt matches the end of the data or, without a prompt, until no data is received for quiet_period
+        seconds - stops early if the shell is closed or timeout seconds have elapsed
 
+        when fallback_prompt is specified reading also stops once the data ends with fallback_prompt and no
+        data is received for quiet_period seconds - for a prompt that may change between commands
+    """
+    if not timeout:
+        timeout = SHELL_TIMEOUT
+
+    if not quiet_period:
+        quiet_period = SHELL_QUIET_PERIOD
+
+    if prompt:
+        prompt = re.compile(prompt)
+
+    if fallback_prompt:
+        fallback_prompt = re.compile(fallback_prompt)
+
+    deadline = time() + timeout
+    chunks = []
+    tail = ''
+    while True:
+        remaining = deadline - time()
+        if remaining <= 0:
+            logger.debug('shell receive timed out after {} seconds'.format(timeout))
+            break
+
+        # once data is received output ends at the prompt if one is specified otherwise when the shell goes quiet
+        if chunks:
+            quiet = not prompt or bool(fallback_prompt and fallback_prompt.search(tail))
+        else:
+            quiet = not wait
+        shell.settimeout(min(remaining, quiet_period) if quiet else remaining)
+        try:
+            chunk = shell.recv(SHELL_BUFFER_SIZE)
+
+        except socket.timeout:
+            if quiet:
+                break
+            continue
+
+        if not chunk:
+            logger.debug('shell closed')
+            break
+
+        chunks.append(chunk)
+        if prompt:
+            # only the end of the chunk can hold the prompt so large chunks are not copied
+            tail = (tail + chunk[-PROMPT_WINDOW:])[-PROMPT_WINDOW:]
+            if prompt.search(tail):
+                break
+
+    data = ''.join(chunks)
+    # the chunks are released before data is split so they are not held alongside the lines
+    del chunks[:]
     lines += data.split('\r\n')
     return data
 
 
 class SSHclient(object):
 
-    def __init__(self, hostname, username, password, set_missing_host_key_policy=True, timeout=None, domains=None):
+    def __init__(self, hostname, username, password, set_missing_host_key_policy=True, timeout=None, domains=None,
+                 race_domains=False, stagger=None, port=None, pool=None, key_filename=None, passphrase=None,
+                 allow_agent=False, auth_order=None, profile=None, keepalive=None, reconnect=False, cache=None,
+                 governor=None):
         """ class constructor
+
+            authenticates with the private key in key_filename and keys held by the ssh agent when allowed as
+            well as password - trying the methods in auth_order, by default key then agent then password
+
+            when race_domains is set connection attempts to all domains are made in parallel - stagger
+            seconds apart if specified - and the first to connect is kept
+
+            connections are taken from pool - or the default pool if one is set - when available
+
+            profile names a transport profile - lan-fast, wan-bulk or low-cpu - tuning ciphers, compression,
+            window and packet sizes of new connections
+
+            keepalive packets are sent every keepalive seconds so idle sessions are not dropped by firewalls,
+            when reconnect is set a dropped connection is reopened to the same hostname and domains before
+            the next command and idempotent commands are retried once if the connection drops during them
+
+            results of idempotent commands are shared through cache - or the default cache if one is set
+
+            each connect waits until governor allows it if specified - keyed on the hostname tried, with domains
+            the domain qualified hostname
         """
         logger.debug('SSHclient constructor')
 
         if not timeout:
             timeout = 10
 
-        if domains:
+        if key_filename or allow_agent or auth_order:
+            password = Credentials(
+                password=password, key_filename=key_filename, passphrase=passphrase, allow_agent=allow_agent, auth_order=auth_order)
+
+        self.pool = pool if pool is not None else get_default_pool()
+        self.cache = cache if cache is not None else get_default_cache()
+        self.governor = governor
+        self.shell_session = None
+        self.keepalive = keepalive
+        self.reconnect_enabled = reconnect
+        self.connect_arguments = {
+            'hostname': hostname, 'username': username, 'password': password, 'timeout': timeout,
+            'set_missing_host_key_policy': set_missing_host_key_policy, 'domains': domains, 'race_domains': race_domains,
+            'stagger': stagger, 'port': port, 'profile': profile
+        }
+        self._open(**self.connect_arguments)
+        self.username = username
+
+    def _open(self, hostname, username, password, timeout, set_missing_host_key_policy, domains, race_domains, stagger,
+              port, profile):
+        """ connect to hostname or the first of its domains to connect
+        """
+        resolver = get_default_resolver()
+        if domains and resolver is not None:
+            domains = resolver.order_domains(hostname, domains)
+
+        if domains and race_domains:
             hostnames = generate_hostnames(hostname, domains)
-            for hostname in hostnames:
+            try:
+                self.hostname, self.ssh = race_connect(
+                    hostnames, username, password, timeout,
+                    set_missing_host_key_policy=set_missing_host_key_policy, stagger=stagger, port=port, pool=self.pool,
+                    profile=profile, governor=self.governor)
+
+            except ConnectError as exception:
+                self._remember_domain(resolver, hostname, domains, None, exception.errors)
+                raise ConnectError(
+                    'unable to connect to any {} with domains {}'.format(hostname, domains), errors=exception.errors)
+
+            self._remember_domain(resolver, hostname, domains, self.hostname, {})
+
+        elif domains:
+            errors = {}
+            for candidate in generate_hostnames(hostname, domains):
                 try:
-                    self.ssh = connect(hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy)
-                    self.hostname = hostname
+                    self.ssh = self._connect(candidate, username, password, timeout, set_missing_host_key_policy, port, profile)
+                    self.hostname = candidate
                     break
 
-                except ConnectError:
+                except ConnectError as exception:
+                    errors[candidate] = exception
                     continue
             else:
-                raise ConnectError('unable to connect to any {} with domains {}'.format(hostname, domains))
+                self._remember_domain(resolver, hostname, domains, None, errors)
+                raise ConnectError('unable to connect to any {} with domains {}'.format(hostname, domains), errors=errors)
+
+            self._remember_domain(resolver, hostname, domains, self.hostname, errors)
 
         else:
-            self.ssh = connect(hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy)
+            self.ssh = self._connect(hostname, username, password, timeout, set_missing_host_key_policy, port, profile)
             self.hostname = hostname
 
-        self.username = username
+        if self.keepalive:
+            self.ssh.get_transport().set_keepalive(self.keepalive)
+
+    def _remember_domain(self, resolver, hostname, domains, connected_hostname, errors):
+        """ remember the domain hostname connected with and forget domains that failed
+        """
+        if resolver is None:
+            return
+
+        for domain in domains:
+            candidate = '{}{}'.format(hostname, domain)
+            if candidate == connected_hostname:
+                resolver.set_domain(hostname, domain)
+            elif candidate in errors:
+                resolver.invalidate_domain(hostname, domain)
+
+    def _connect(self, hostname, username, password, timeout, set_missing_host_key_policy, port, profile):
+        """ return ssh connection from pool if set otherwise a new ssh connection - once governor allows it if set
+        """
+        def connect_function():
+            if self.pool is not None:
+                return self.pool.acquire(
+                    hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy,
+                    port=port, profile=profile)
+            return connect(
+                hostname, username, password, timeout, set_missing_host_key_policy=set_missing_host_key_policy, port=port,
+                profile=profile)
+
+        if self.governor is not None:
+            return self.governor.run(hostname, connect_function)
+        return connect_function()
+
+    def close(self):
+        """ close ssh connection or release it back to pool
+        """
+        if self.shell_session is not None:
+            self.shell_session.close()
+            self.shell_session = None
+
+        if self.pool is not None:
+            logger.debug('releasing connection to: {}'.format(self.hostname))
+            self.pool.release(self.ssh)
+            return
+
+        logger.debug('closing connection to: {}'.format(self.hostname))
+        self.ssh.close()
 
-    def execute(self, command, send_input=None, success_responses=None, printout=False, expected_exit_code=None):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_alive(self, probe_connection=False):
+        """ return True if the ssh connection is usable False otherwise
+
+            only the transport state is checked unless probe_connection is set, a probe opens a channel to
+            detect sessions dropped by the network which look active until the next write fails
+        """
+        if probe_connection:
+            return probe(self.ssh)
+        return is_connected(self.ssh)
+
+    def reconnect(self, deadline=None):
+        """ reopen the ssh connection with the original hostname, credentials and domains
+
+            attempts are made RECONNECT_ATTEMPTS times with exponential backoff, authentication errors are
+            raised at once since retrying can not fix them - connect timeouts and backoff are cut short by
+            the command deadline if one is given
+        """
+        logger.debug('reconnecting to: {}'.format(self.hostname))
+        self.close()
+        for attempt in range(RECONNECT_ATTEMPTS):
+            connect_arguments = self.connect_arguments
+            if deadline is not None:
+                deadline.check()
+                connect_arguments = dict(connect_arguments, timeout=deadline.limit(connect_arguments['timeout']))
+            try:
+                self._open(**connect_arguments)
+                return
+
+            except NotAuthorizedError:
+                raise
+
+            except ConnectError as exception:
+                if deadline is not None:
+                    deadline.check()
+                if attempt == RECONNECT_ATTEMPTS - 1:
+                    raise
+                backoff = RECONNECT_BACKOFF * 2 ** attempt
+                logger.debug('reconnect attempt {} failed: {} - retrying in {} seconds'.format(attempt + 1, exception, backoff))
+                sleep(deadline.limit(backoff) if deadline is not None else backoff)
+
+    def _ensure_connected(self, deadline=None):
+        """ reconnect if reconnect is enabled or the connection is pooled and the connection was dropped
+
+            a pooled connection is closed when the pool evicts it
+        """
+        if (self.reconnect_enabled or self.pool is not None) and not self.is_alive():
+            logger.debug('connection to: {} was dropped'.format(self.hostname))
+            self.reconnect(deadline=deadline)
+
+    def _retry(self, function, idempotent, deadline, *args):
+        """ return result of function called with deadline and args - called again once on a new connection
+            if the connection drops during it and it is idempotent, reconnecting and retrying share deadline
+        """
+        self._ensure_connected(deadline=deadline)
+        try:
+            return function(deadline, *args)
+
+        except CONNECTION_ERRORS as exception:
+            if not (self.reconnect_enabled and idempotent) or self.is_alive():
+                raise
+            logger.debug('connection to: {} dropped during command: {} - retrying'.format(self.hostname, exception))
+
+        deadline.check()
+        self.reconnect(deadline=deadline)
+        return function(deadline, *args)
+
+    def execute(self, command, send_input=None, success_responses=None, printout=False, expected_exit_code=None,
+                idempotent=False, command_timeout=None, cancel_token=None, cache_ttl=None):
         """ execute ssh command against host
+
+            when reconnect is enabled an idempotent command is executed again once if the connection drops
+
+            command_timeout bounds the whole call - reconnecting, opening the channel, sending input, reading
+            output, waiting for the exit status and retrying - the channel is closed and CommandTimeoutError
+            raised once it passes, CommandCancelledError is raised if cancel_token is cancelled before or
+            while the command runs
+
+            when the client has a result cache the result of an idempotent command without input is reused
+            for cache_ttl seconds - or the cache ttl - success responses and exit code are checked against
+            the cached result on every call
+        """
+        deadline = CommandDeadline(command, command_timeout=command_timeout, cancel_token=cancel_token)
+        deadline.check()
+        return self._retry(
+            self._execute, idempotent, deadline, command, send_input, success_responses, printout, expected_exit_code,
+            idempotent, cache_ttl)
+
+    def _execute(self, deadline, command, send_input, success_responses, printout, expected_exit_code, idempotent=False,
+                 cache_ttl=None):
+        """ execute ssh command against host within its deadline
+        """
+        deadline.check()
+        try:
+            if self.cache is not None and idempotent and not send_input:
+                result = self.cache.get(
+                    (self.hostname, self.username, command), lambda: self._receive_cacheable(command, deadline),
+                    ttl=cache_ttl, deadline=deadline, cacheable=CommandResult.has_exit_status)
+                return check_result(result, success_responses, printout, expected_exit_code)
+
+            return self._execute_command(command, send_input, success_responses, printout, expected_exit_code, deadline)
+
+        except Exception:
+            # errors caused by closing the channel are reported as the timeout or cancellation
+            deadline.check()
+            raise
+
+        finally:
+            deadline.stop()
+
+    def _execute_command(self, command, send_input, success_responses, printout, expected_exit_code, deadline):
+        """ execute ssh command against host
+        """
+        # the exit status is not needed when stdout is checked for success responses
+        result = self._receive_command(command, send_input, deadline, exit_status=not success_responses)
+        return check_result(result, success_responses, printout, expected_exit_code)
+
+    def _receive_cacheable(self, command, deadline):
+        """ return result of ssh command executed against host for the result cache
+        """
+        result = self._receive_command(command, None, deadline)
+        # a channel closed at the deadline or on cancellation leaves a result that must not be shared
+        deadline.check()
+        return result
+
+    def _receive_command(self, command, send_input, deadline, exit_status=True):
+        """ return result of ssh command executed against host
+        """
+        logger.debug('executing command "{}" on host {}'.format(command, self.hostname))
+        start = time()
+        stdin, stdout, stderr = self.ssh.exec_command(command, timeout=deadline.remaining())
+        deadline.watch(stdout.channel)
+        instrument.emit(self.hostname, instrument.CHANNEL_OPEN, start, command=command)
+        if send_input:
+            logger.debug('sending stdin')
+            stdin.write('{}\n'.format(send_input))
+            stdin.flush()
+
+        self._wait_first_byte(stdout.channel, command)
+        reader = ChannelReader(stdout.channel)
+        reader.read()
+        stdoutlines = reader.get_lines(STDOUT)
+        # output is only joined when it is logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('\r\n{}'.format(''.join(stdoutlines)))
+        exit_code = None
+        if exit_status:
+            # the exit status arrives before eof so this does not wait for another round trip
+            start = time()
+            exit_code = stdout.channel.recv_exit_status()
+            instrument.emit(self.hostname, instrument.EXIT_STATUS, start, command=command)
+        # a dropped connection closes the channel without an error - output is incomplete without eof and
+        # the exit status is missing
+        complete = exit_code != NO_EXIT_STATUS if exit_status else stdout.channel.eof_received
+        if not complete and not is_connected(stdout.channel):
+            raise EOFError('connection to {} lost while executing command "{}"'.format(self.hostname, command))
+        return CommandResult(command, stdoutlines, reader.get_lines(STDERR), exit_code)
+
+    def execute_stream(self, command, send_input=None, success_responses=None, expected_exit_code=None):
+        """ execute ssh command against host yielding stdout lines as they are received
+
+            when success responses are specified the channel is closed as soon as one is found in stdout,
+            literal success responses are found even when split across lines while regex success responses
+            are matched against each line - only the current line is held in memory
+
+            stderr is drained into an output sink while stdout lines are yielded so output on stderr does not
+            stall the stream
         """
         if not expected_exit_code:
             expected_exit_code = 0
 
+        self._ensure_connected()
+        logger.debug('streaming command "{}" on host {}'.format(command, self.hostname))
+        stdin, stdout, stderr = self.ssh.exec_command(command)
+        if send_input:
+            logger.debug('sending stdin')
+            stdin.write('{}\n'.format(send_input))
+            stdin.flush()
+
+        channel = stdout.channel
+        reader = ChannelReader(channel)
+        stream = compile_success_responses(success_responses).stream() if success_responses else None
+        try:
+            for line in reader.iter_lines():
+                found = stream and stream.feed(line)
+                yield line
+                if found:
+                    return
+
+            if success_responses:
+                raise ExecuteError('success responses not found in stdout')
+
+            exit_code = channel.recv_exit_status()
+            if exit_code != expected_exit_code:
+                error = reader.get_data(STDERR) + 'exit code: {}'.format(exit_code)
+                raise ExecuteError(error)
+
+        finally:
+            channel.close()
+
+    def execute_capture(self, command, send_input=None, success_responses=None, expected_exit_code=None, threshold=None):
+        """ execute ssh command against host and return its stdout as captured output
+
+            stdout is received in chunks into an output sink that spills to a temporary file once it
+            exceeds threshold bytes, the captured output gives lazy line access and searching over
+            the memory mapped file so huge outputs are never held in memory as python strings
+        """
+        if not expected_exit_code:
+            expected_exit_code = 0
+
+        self._ensure_connected()
         logger.debug('executing command "{}" on host {}'.format(command, self.hostname))
         stdin, stdout, stderr = self.ssh.exec_command(command)
         if send_input:
@@ -162,50 +941,177 @@ class SSHclient(object):
             stdin.write('{}\n'.format(send_input))
             stdin.flush()
 
-        stdoutlines = stdout.readlines()
-        stdout_contents = ''.join(stdoutlines)
-        logger.debug('\r\n{}'.format(stdout_contents))
+        channel = stdout.channel
+        reader = ChannelReader(channel, stdout=OutputSink(threshold=threshold))
+        reader.read()
+        output = reader.stdout.result()
+        logger.debug('received {} bytes of stdout'.format(output.size))
+
         if success_responses:
             logger.debug('checking stdout for success responses "{}"'.format(success_responses))
-            if check_success_responses(stdout_contents, success_responses):
-                return stdoutlines
+            if output.check_success_responses(success_responses):
+                return output
 
+            output.close()
             raise ExecuteError('success responses not found in stdout')
 
-        exit_code = stdout.channel.recv_exit_status()
+        exit_code = channel.recv_exit_status()
         if exit_code != expected_exit_code:
-            error = ''.join(stderr.readlines()) + 'exit code: {}'.format(exit_code)
+            output.close()
+            error = ''.join(reader.get_lines(STDERR)) + 'exit code: {}'.format(exit_code)
             raise ExecuteError(error)
 
-        if printout:
-            return print_out(stdoutlines)
+        return output
 
-        return stdoutlines
+    def _wait_first_byte(self, channel, command):
+        """ wait for the first output or eof on channel timing the first byte phase - only while instrumented
+        """
+        if not instrument.listeners:
+            return
 
-    def shell_execute(self, command, send_inputs, success_responses=None):
+        start = time()
+        select.select([channel], [], [])
+        instrument.emit(self.hostname, instrument.FIRST_BYTE, start, command=command)
+
+    def _execute_channel(self, command):
+        """ return command result of executing command on its own channel
+        """
+        logger.debug('executing command "{}" on host {}'.format(command, self.hostname))
+        start = time()
+        try:
+            stdin, stdout, stderr = self.ssh.exec_command(command)
+
+        except paramiko.ssh_exception.SSHException as exception:
+            raise ExecuteError('unable to open channel for command "{}": {}'.format(command, str(exception)))
+
+        instrument.emit(self.hostname, instrument.CHANNEL_OPEN, start, command=command)
+        stdin.close()
+        self._wait_first_byte(stdout.channel, command)
+        reader = ChannelReader(stdout.channel)
+        reader.read()
+        stdoutlines = reader.get_lines(STDOUT)
+        stderrlines = reader.get_lines(STDERR)
+        start = time()
+        exit_code = stdout.channel.recv_exit_status()
+        instrument.emit(self.hostname, instrument.EXIT_STATUS, start, command=command)
+        return CommandResult(command, stdoutlines, stderrlines, exit_code)
+
+    def execute_many(self, commands, max_channels=None):
+        """ execute commands concurrently on separate channels of the ssh transport and return their command results
+
+            at most max_channels channels are open at a time, results are returned in the order of commands
+        """
+        if not max_channels:
+            max_channels = MAX_CHANNELS
+
+        if not commands:
+            return []
+
+        self._ensure_connected()
+        logger.debug('executing {} commands on host {} over {} channels'.format(len(commands), self.hostname, max_channels))
+        pool = ThreadPool(processes=min(max_channels, len(commands)))
+        try:
+            return pool.map(self._execute_channel, commands)
+
+        finally:
+            pool.terminate()
+
+    def execute_batch(self, commands, success_responses=None, expected_exit_code=None):
+        """ execute commands one after the other in a single channel and return their command results
+
+            the commands are sent as one shell script with unique markers after each command, its output
+            is split back into the stdout, stderr and exit code of every command so the batch costs a
+            single round trip - success responses or expected exit code are checked for each command and
+            ExecuteError carrying the command results is raised for the first command that failed
+        """
+        if not expected_exit_code:
+            expected_exit_code = 0
+
+        if not commands:
+            return []
+
+        self._ensure_connected()
+        marker = 'SSHCLIENT-{}'.format(uuid.uuid4().hex)
+        logger.debug('executing batch of {} commands on host {}'.format(len(commands), self.hostname))
+        stdin, stdout, stderr = self.ssh.exec_command(get_batch_script(commands, marker))
+        stdin.close()
+        reader = ChannelReader(stdout.channel)
+        reader.read()
+        results = split_batch_output(reader.get_data(STDOUT), reader.get_data(STDERR), commands, marker)
+        stdout.channel.recv_exit_status()
+
+        for result in results:
+            if success_responses:
+                if not check_success_responses(''.join(result.stdout), success_responses):
+                    raise ExecuteError('success responses not found in stdout of command "{}"'.format(result.command), results=results)
+
+            elif result.exit_code != expected_exit_code:
+                error = 'command "{}" failed: '.format(result.command) + ''.join(result.stderr) + 'exit code: {}'.format(result.exit_code)
+                raise ExecuteError(error, results=results)
+
+        if len(results) < len(commands):
+            raise ExecuteError('batch ended before command "{}" completed'.format(commands[len(results)]), results=results)
+
+        return results
+
+    def get_shell_session(self, prompt=None, timeout=None, quiet_period=None):
+        """ return persistent shell session creating it if required - options only apply to a new session
+        """
+        if self.shell_session is None:
+            self.shell_session = ShellSession(self.ssh, prompt=prompt, timeout=timeout, quiet_period=quiet_period)
+        return self.shell_session
+
+    def shell_execute(self, command, send_inputs, success_responses=None, timeout=None, quiet_period=None, prompt=None,
+                      persistent=False, input_prompt=None):
         """ execute ssh shell command with provided inputs
+
+            each step waits up to timeout seconds for output and completes as soon as the output ends
+            with prompt - a regex such as '[#$>:?] ?$' - or, without a prompt, once no output is received
+            for quiet_period seconds, output before an input is matched against input_prompt instead if
+            specified
+
+            an input given as a (prompt, input) tuple is sent as soon as its prompt - literal or {regex} as
+            in success responses - is received, ExecuteError is raised if the prompt does not arrive
+
+            when persistent is set the command is executed in the persistent shell session which is kept
+            open between calls instead of a new shell, prompt is then the shell prompt of the session - detected
+            from the login banner if not specified when the session is opened - and ExecuteError is raised if
+            the shell prompt does not return after the final input
         """
+        self._ensure_connected()
+        if persistent:
+            session = self.get_shell_session(prompt=prompt, timeout=timeout, quiet_period=quiet_period)
+            return session.run(
+                command, send_inputs=send_inputs, success_responses=success_responses, input_prompt=input_prompt)
+
         stdoutlines = []
         logger.debug('executing shell command "{}" on host {}'.format(command, self.hostname))
 
         shell = self.ssh.invoke_shell()
-        _shell_receive(shell, stdoutlines)
+        try:
+            _shell_receive(shell, stdoutlines, timeout=timeout, quiet_period=quiet_period, prompt=prompt)
 
-        shell.send(command + '\n')
-        _shell_receive(shell, stdoutlines)
+            shell.send(command + '\n')
+            for send_input in send_inputs:
+                if isinstance(send_input, tuple):
+                    expect_prompt, send_input = send_input
+                    shell_expect(shell, stdoutlines, expect_prompt, timeout=timeout)
+                else:
+                    _shell_receive(
+                        shell, stdoutlines, timeout=timeout, quiet_period=quiet_period, prompt=input_prompt or prompt)
+                shell.send(send_input + '\n')
 
-        for send_input in send_inputs:
-            shell.send(send_input + '\n')
-            _shell_receive(shell, stdoutlines)
+            _shell_receive(shell, stdoutlines, timeout=timeout, quiet_period=quiet_period, prompt=prompt)
+            _shell_receive(shell, stdoutlines, timeout=timeout, quiet_period=quiet_period, prompt=prompt, wait=False)
 
-        _shell_receive(shell, stdoutlines)
-        shell.close()
+        finally:
+            shell.close()
 
-        logger.debug('\r\n'.join(stdoutlines))
-        stdout_contents = ''.join(stdoutlines)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('\r\n'.join(stdoutlines))
         if success_responses:
             logger.debug('checking stdout for success responses "{}"'.format(success_responses))
-            if check_success_responses(stdout_contents, success_responses):
+            if check_success_responses(''.join(stdoutlines), success_responses):
                 return stdoutlines
 
             raise ExecuteError('success responses not found in stdout')
@@ -12,18 +12,38 @@ from SSHclient import ConnectError
 from SSHclient import TimeOutError
 from SSHclient import NotAuthorizedError
 from SSHclient import UnknownHostError
+from SSHclient import CommandTimeoutError
+from SSHclient import CommandCancelledError
+from SSHclient import CancelToken
 from SSHclient import print_out
 from SSHclient import connect
+from SSHclient import race_connect
 from SSHclient import generate_hostnames
+from SSHclient import add_listener
+from SSHclient import remove_listener
+from SSHclient import Resolver
+from SSHclient import ResultCache
+from SSHclient import ConnectionPool
+from SSHclient import ConcurrencyGovernor
 from SSHclient.sshclient import check_success_responses
 from SSHclient.sshclient import _shell_receive
+from SSHclient.sshclient import is_connected
+from SSHclient.sshclient import probe
+from SSHclient.sshclient import get_batch_script
+from SSHclient.sshclient import split_batch_output
+from SSHclient.sshclient import open_socket
 
 from paramiko.ssh_exception import SSHException
 from paramiko.ssh_exception import AuthenticationException
 from socket import gaierror
 from socket import timeout
 
+import os
+import socket
+import subprocess
 import sys
+import threading
+from time import sleep
 import logging
 logger = logging.getLogger(__name__)
 
@@ -36,6 +56,51 @@ rootLogger.addHandler(consoleHandler)
 rootLogger.setLevel(logging.DEBUG)
 
 
+class FakeChannel(object):
+    """ channel that has received stdout and stderr chunks followed by eof - a hung channel receives
+        nothing until it is closed
+    """
+    def __init__(self, stdout=None, stderr=None, exit_status=0, hung=False):
+        self.stdout = list(stdout or [])
+        self.stderr = list(stderr or [])
+        self.eof_received = not hung
+        self.closed = False
+        self.pipe = os.pipe() if hung else None
+        self.close = Mock(side_effect=self._close)
+        self.recv_exit_status = Mock(return_value=exit_status)
+        self.transport = Mock()
+        self.transport.is_active.return_value = True
+
+    def _close(self):
+        self.closed = True
+        if self.pipe:
+            os.write(self.pipe[1], 'x')
+
+    def fileno(self):
+        return self.pipe[0]
+
+    def get_transport(self):
+        return self.transport
+
+    def drop(self):
+        """ lose the connection closing the channel without eof or exit status
+        """
+        self.transport.is_active.return_value = False
+        self._close()
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, nbytes):
+        return self.stdout.pop(0) if self.stdout else ''
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, nbytes):
+        return self.stderr.pop(0) if self.stderr else ''
+
+
 class TestSSHclient(unittest.TestCase):
 
     def setUp(self):
@@ -79,13 +144,559 @@ class TestSSHclient(unittest.TestCase):
         self.assertEqual(client.hostname, 'host1.vcff2.cps.intel.com')
         self.assertEqual(client.ssh, ssh_mock)
 
+    @patch('SSHclient.sshclient.generate_hostnames', return_value=['host1.vcff1.cps.intel.com', 'host1.vcff2.cps.intel.com'])
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_AttachErrors_When_DomainsConnectError(self, connect, *patches):
+        connect.side_effect = [
+            TimeOutError('timeout error'),
+            UnknownHostError('unknown host error')
+        ]
+        with self.assertRaises(ConnectError) as context:
+            SSHclient('host1', 'value', 'value', domains=['vcff1.cps.intel.com', 'vcff2.cps.intel.com'])
+        self.assertIsInstance(context.exception.errors['host1.vcff1.cps.intel.com'], TimeOutError)
+        self.assertIsInstance(context.exception.errors['host1.vcff2.cps.intel.com'], UnknownHostError)
+
+    @patch('SSHclient.sshclient.race_connect')
+    def test__init_Should_RaceDomains_When_RaceDomainsSpecified(self, race_connect_patch, *patches):
+        ssh_mock = Mock()
+        race_connect_patch.return_value = 'host1.vcff2.cps.intel.com', ssh_mock
+        client = SSHclient('host1', 'value', 'value', domains=['.vcff1.cps.intel.com', '.vcff2.cps.intel.com'], race_domains=True, stagger=.05)
+        self.assertEqual(client.hostname, 'host1.vcff2.cps.intel.com')
+        self.assertEqual(client.ssh, ssh_mock)
+        race_connect_patch.assert_called_once_with(
+            ['host1.vcff1.cps.intel.com', 'host1.vcff2.cps.intel.com'], 'value', 'value', 10,
+            set_missing_host_key_policy=True, stagger=.05, port=None, pool=None, profile=None, governor=None)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_GovernEachDomainQualifiedHostname_When_GovernorAndDomainsSpecified(self, connect, *patches):
+        ssh_mock = Mock()
+        connect.side_effect = [
+            TimeOutError('timeout'),
+            ssh_mock
+        ]
+        governor = ConcurrencyGovernor(initial_limit=4)
+        client = SSHclient('host1', 'value', 'value', domains=['.vcff1.com', '.vcff2.com'], governor=governor)
+        self.assertEqual(client.ssh, ssh_mock)
+        self.assertEqual(sorted(governor.limits), ['vcff1.com', 'vcff2.com'])
+        self.assertEqual(governor.get_limit('vcff1.com'), 2)
+        self.assertEqual(governor.get_limit('vcff2.com'), 5)
+
+    @patch('SSHclient.sshclient.race_connect')
+    def test__init_Should_RaiseConnectErrorWithErrors_When_RaceDomainsConnectError(self, race_connect_patch, *patches):
+        race_connect_patch.side_effect = ConnectError('connect error', errors={'host1.vcff1.cps.intel.com': TimeOutError('timeout')})
+        with self.assertRaises(ConnectError) as context:
+            SSHclient('host1', 'value', 'value', domains=['.vcff1.cps.intel.com'], race_domains=True)
+        self.assertIn('host1.vcff1.cps.intel.com', context.exception.errors)
+
+    @patch('SSHclient.sshclient.get_default_resolver')
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_TryCachedDomainFirst_When_DomainLastSucceeded(self, connect, get_default_resolver, *patches):
+        resolver = Resolver()
+        get_default_resolver.return_value = resolver
+
+        def connect_side_effect(hostname, *args, **kwargs):
+            if hostname == 'host1.vcff1.com':
+                raise TimeOutError('timeout')
+            return Mock()
+
+        connect.side_effect = connect_side_effect
+        SSHclient('host1', 'value', 'value', domains=['.vcff1.com', '.vcff2.com'])
+        self.assertEqual(resolver.get_domain('host1'), '.vcff2.com')
+
+        connect.reset_mock()
+        client = SSHclient('host1', 'value', 'value', domains=['.vcff1.com', '.vcff2.com'])
+        self.assertEqual(client.hostname, 'host1.vcff2.com')
+        self.assertEqual(connect.call_count, 1)
+
+    @patch('SSHclient.sshclient.get_default_resolver')
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_InvalidateCachedDomain_When_CachedDomainFails(self, connect, get_default_resolver, *patches):
+        resolver = Resolver()
+        resolver.set_domain('host1', '.vcff2.com')
+        get_default_resolver.return_value = resolver
+
+        def connect_side_effect(hostname, *args, **kwargs):
+            if hostname == 'host1.vcff2.com':
+                raise TimeOutError('timeout')
+            return Mock()
+
+        connect.side_effect = connect_side_effect
+        client = SSHclient('host1', 'value', 'value', domains=['.vcff1.com', '.vcff2.com'])
+        self.assertEqual(client.hostname, 'host1.vcff1.com')
+        self.assertEqual([call_args[0][0] for call_args in connect.call_args_list], ['host1.vcff2.com', 'host1.vcff1.com'])
+        self.assertEqual(resolver.get_domain('host1'), '.vcff1.com')
+
+    @patch('SSHclient.sshclient.get_default_resolver')
+    @patch('SSHclient.sshclient.race_connect')
+    def test__init_Should_RaceCachedDomainFirst_When_RaceDomainsSpecified(self, race_connect_patch, get_default_resolver, *patches):
+        resolver = Resolver()
+        resolver.set_domain('host1', '.vcff2.com')
+        get_default_resolver.return_value = resolver
+        race_connect_patch.return_value = 'host1.vcff2.com', Mock()
+        SSHclient('host1', 'value', 'value', domains=['.vcff1.com', '.vcff2.com'], race_domains=True)
+        self.assertEqual(race_connect_patch.call_args[0][0], ['host1.vcff2.com', 'host1.vcff1.com'])
+        self.assertEqual(resolver.get_domain('host1'), '.vcff2.com')
+
+    @patch('SSHclient.sshclient.open_socket', return_value='sock')
+    @patch('SSHclient.sshclient.get_default_resolver')
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_ConnectOverResolvedSocket_When_ResolverSet(self, ssh_client, get_default_resolver, open_socket_patch, *patches):
+        resolver = Resolver()
+        get_default_resolver.return_value = resolver
+        connect('server', 'username', 'password', 5)
+        open_socket_patch.assert_called_once_with('server', 22, 5, resolver=resolver)
+        ssh_client.return_value.connect.assert_called_once_with(
+            'server', port=22, username='username', password='password', timeout=5, sock='sock')
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_ApplyProfile_When_ProfileSpecified(self, ssh_client, *patches):
+        transport = ssh_client.return_value.get_transport.return_value
+        connect('server', 'username', 'password', 5, profile='low-cpu')
+        arguments = ssh_client.return_value.connect.call_args[1]
+        self.assertFalse(arguments['compress'])
+        self.assertIn('hmac-sha2-256', arguments['disabled_algorithms']['macs'])
+        self.assertEqual(transport.default_window_size, 16777216)
+        self.assertEqual(transport.default_max_packet_size, 262144)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_ReturnFirstConnected_When_Called(self, connect, *patches):
+        ssh_mock = Mock()
+
+        def connect_side_effect(hostname, *args, **kwargs):
+            if hostname == 'host1.dead.com':
+                raise TimeOutError('timeout')
+            return ssh_mock
+
+        connect.side_effect = connect_side_effect
+        result = race_connect(['host1.dead.com', 'host1.alive.com'], 'username', 'password', 5)
+        self.assertEqual(result, ('host1.alive.com', ssh_mock))
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_GovernEachHostname_When_GovernorSpecified(self, connect, *patches):
+        ssh_mock = Mock()
+        connect.return_value = ssh_mock
+        governor = Mock()
+        governor.run.side_effect = lambda hostname, function: function()
+        result = race_connect(['host1.one.com'], 'username', 'password', 5, governor=governor)
+        self.assertEqual(result, ('host1.one.com', ssh_mock))
+        self.assertEqual(governor.run.call_args[0][0], 'host1.one.com')
+        self.assertEqual(connect.call_args[0][0], 'host1.one.com')
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_RaiseConnectErrorWithErrors_When_AllFail(self, connect, *patches):
+        connect.side_effect = [
+            TimeOutError('timeout'),
+            NotAuthorizedError('not authorized')
+        ]
+        with self.assertRaises(ConnectError) as context:
+            race_connect(['host1.one.com', 'host1.two.com'], 'username', 'password', 5)
+        self.assertEqual(sorted(context.exception.errors), ['host1.one.com', 'host1.two.com'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_CloseLosers_When_LateConnectionSucceeds(self, connect, *patches):
+        winner_mock = Mock()
+        loser_mock = Mock()
+        release_loser = threading.Event()
+        loser_closed = threading.Event()
+        loser_mock.close.side_effect = lambda: loser_closed.set()
+
+        def connect_side_effect(hostname, *args, **kwargs):
+            if hostname == 'host1.slow.com':
+                release_loser.wait(5)
+                return loser_mock
+            return winner_mock
+
+        connect.side_effect = connect_side_effect
+        result = race_connect(['host1.slow.com', 'host1.fast.com'], 'username', 'password', 5)
+        release_loser.set()
+        self.assertEqual(result, ('host1.fast.com', winner_mock))
+        self.assertTrue(loser_closed.wait(5))
+        self.assertFalse(winner_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_CancelStaggeredAttempts_When_EarlierAttemptConnects(self, connect, *patches):
+        ssh_mock = Mock()
+        connect.return_value = ssh_mock
+        result = race_connect(['host1.one.com', 'host1.two.com'], 'username', 'password', 5, stagger=5)
+        self.assertEqual(result, ('host1.one.com', ssh_mock))
+        self.assertEqual(len(connect.mock_calls), 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__close_Should_CloseSsh_When_Called(self, connect, *patches):
+        ssh_mock = Mock()
+        connect.return_value = ssh_mock
+        client = SSHclient('server', 'username', 'password')
+        client.close()
+        self.assertTrue(ssh_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_SetKeepalive_When_KeepaliveSpecified(self, connect, *patches):
+        SSHclient('server', 'username', 'password', keepalive=30)
+        connect.return_value.get_transport.return_value.set_keepalive.assert_called_once_with(30)
+
+    def test__probe_Should_ReturnFalse_When_NotConnected(self, *patches):
+        ssh_mock = Mock()
+        ssh_mock.get_transport.return_value.is_active.return_value = False
+        self.assertFalse(probe(ssh_mock))
+        self.assertFalse(ssh_mock.get_transport.return_value.open_session.called)
+
+    def test__probe_Should_ReturnFalse_When_OpenSessionFails(self, *patches):
+        ssh_mock = Mock()
+        ssh_mock.get_transport.return_value.open_session.side_effect = SSHException('Timeout opening channel.')
+        self.assertFalse(probe(ssh_mock))
+
+    def test__probe_Should_ReturnTrueAndCloseChannel_When_ChannelOpens(self, *patches):
+        ssh_mock = Mock()
+        self.assertTrue(probe(ssh_mock, timeout=2))
+        ssh_mock.get_transport.return_value.open_session.assert_called_once_with(timeout=2)
+        self.assertTrue(ssh_mock.get_transport.return_value.open_session.return_value.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__is_alive_Should_Probe_When_ProbeConnection(self, connect, *patches):
+        connect.return_value.get_transport.return_value.open_session.side_effect = SSHException('Timeout opening channel.')
+        client = SSHclient('server', 'username', 'password')
+        self.assertTrue(client.is_alive())
+        self.assertFalse(client.is_alive(probe_connection=True))
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_ReconnectFirst_When_ConnectionDropped(self, connect, *patches):
+        dead_mock = Mock()
+        dead_mock.get_transport.return_value.is_active.return_value = False
+        live_mock = Mock()
+        live_mock.exec_command.return_value = None, Mock(channel=FakeChannel(['output'])), Mock()
+        connect.side_effect = [dead_mock, live_mock]
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        self.assertEqual(client.execute('command'), ['output'])
+        self.assertTrue(dead_mock.close.called)
+        self.assertEqual(connect.call_count, 2)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RetryOnce_When_IdempotentAndConnectionDropsDuringCommand(self, connect, *patches):
+        dropped_mock = Mock()
+        dropped_mock.exec_command.side_effect = EOFError()
+        # connection drops after the liveness check
+        dropped_mock.get_transport.return_value.is_active.side_effect = [True, False]
+        stdout_mock = Mock(channel=FakeChannel(['output']))
+        live_mock = Mock()
+        live_mock.exec_command.return_value = None, stdout_mock, Mock()
+        connect.side_effect = [dropped_mock, live_mock]
+
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        self.assertEqual(client.execute('command', idempotent=True), ['output'])
+        self.assertEqual(connect.call_count, 2)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RetryOnce_When_IdempotentAndConnectionDropsWhileReadingOutput(self, connect, *patches):
+        channel = FakeChannel(hung=True, exit_status=-1)
+        dropped_mock = Mock()
+        dropped_mock.exec_command.return_value = Mock(), Mock(channel=channel), Mock()
+        dropped_mock.get_transport.return_value = channel.transport
+        live_mock = Mock()
+        live_mock.exec_command.return_value = Mock(), Mock(channel=FakeChannel(['output\n'])), Mock()
+        connect.side_effect = [dropped_mock, live_mock]
+
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        threading.Timer(.1, channel.drop).start()
+        self.assertEqual(client.execute('command', idempotent=True), ['output\n'])
+        self.assertEqual(connect.call_count, 2)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RaiseEOFError_When_ConnectionDropsWhileReadingOutput(self, connect, *patches):
+        channel = FakeChannel(hung=True, exit_status=-1)
+        connect.return_value.exec_command.return_value = Mock(), Mock(channel=channel), Mock()
+        client = SSHclient('server', 'username', 'password')
+        threading.Timer(.1, channel.drop).start()
+        with self.assertRaises(EOFError):
+            client.execute('command')
+
+    @patch('SSHclient.sshclient.sleep')
+    @patch('SSHclient.sshclient.time')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RaiseCommandTimeoutError_When_ReconnectExceedsCommandTimeout(self, connect, time_patch, sleep_patch, *patches):
+        clock = [100]
+        time_patch.side_effect = lambda: clock[0]
+        sleep_patch.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        dropped_mock = Mock()
+        dropped_mock.get_transport.return_value.is_active.return_value = False
+        connect.side_effect = [dropped_mock, TimeOutError(), TimeOutError(), Mock()]
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        with self.assertRaises(CommandTimeoutError):
+            client.execute('command', idempotent=True, command_timeout=3)
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual([call[0][3] for call in connect.call_args_list], [10, 3, 2])
+        self.assertEqual(sleep_patch.call_args_list, [call(1), call(2)])
+
+    @patch('SSHclient.sshclient.time')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotRetry_When_CommandTimeoutPassedBeforeRetry(self, connect, time_patch, *patches):
+        clock = [100]
+        time_patch.side_effect = lambda: clock[0]
+
+        def drop(*args, **kwargs):
+            clock[0] += 5
+            raise EOFError()
+
+        dropped_mock = Mock()
+        dropped_mock.exec_command.side_effect = drop
+        dropped_mock.get_transport.return_value.is_active.side_effect = [True, False]
+        connect.side_effect = [dropped_mock, Mock()]
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        with self.assertRaises(CommandTimeoutError):
+            client.execute('command', idempotent=True, command_timeout=3)
+        self.assertEqual(connect.call_count, 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_Raise_When_NotIdempotentAndConnectionDropsDuringCommand(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = EOFError()
+        connect.return_value.get_transport.return_value.is_active.side_effect = [True, False]
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        with self.assertRaises(EOFError):
+            client.execute('command')
+        self.assertEqual(connect.call_count, 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_Raise_When_ErrorAndConnectionAlive(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = SSHException('channel open failed')
+        client = SSHclient('server', 'username', 'password', reconnect=True)
+        with self.assertRaises(SSHException):
+            client.execute('command', idempotent=True)
+        self.assertEqual(connect.call_count, 1)
+
+    def get_hung_channel_ssh(self):
+        """ return ssh mock whose channel receives nothing until it is closed
+        """
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), Mock(channel=FakeChannel(hung=True, exit_status=-1)), Mock()
+        return ssh_mock
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_CloseChannelAndRaiseCommandTimeoutError_When_CommandTimeoutExceeded(self, connect, *patches):
+        ssh_mock = self.get_hung_channel_ssh()
+        connect.return_value = ssh_mock
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(CommandTimeoutError):
+            client.execute('command', command_timeout=.1)
+        stdout_mock = ssh_mock.exec_command.return_value[1]
+        self.assertTrue(stdout_mock.channel.close.called)
+        self.assertLessEqual(ssh_mock.exec_command.call_args[1]['timeout'], .1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RaiseCommandTimeoutError_When_ChannelOpenTimesOut(self, connect, *patches):
+        def exec_command(command, timeout):
+            sleep(timeout)
+            raise SSHException('Timeout opening channel.')
+
+        connect.return_value.exec_command.side_effect = exec_command
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(CommandTimeoutError):
+            client.execute('command', command_timeout=.05)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_CloseChannelAndRaiseCommandCancelledError_When_Cancelled(self, connect, *patches):
+        ssh_mock = self.get_hung_channel_ssh()
+        connect.return_value = ssh_mock
+        cancel_token = CancelToken()
+        threading.Timer(.1, cancel_token.cancel).start()
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(CommandCancelledError):
+            client.execute('command', cancel_token=cancel_token)
+        self.assertEqual(cancel_token.channels, set())
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotExecute_When_AlreadyCancelled(self, connect, *patches):
+        cancel_token = CancelToken()
+        cancel_token.cancel()
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(CommandCancelledError):
+            client.execute('command', cancel_token=cancel_token)
+        self.assertFalse(connect.return_value.exec_command.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_RaiseExecuteError_When_CommandFailsWithinCommandTimeout(self, connect, *patches):
+        stdout_mock = Mock(channel=FakeChannel(stderr=['error'], exit_status=1))
+        connect.return_value.exec_command.return_value = None, stdout_mock, Mock()
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError) as context:
+            client.execute('command', command_timeout=10)
+        self.assertNotIsInstance(context.exception, CommandTimeoutError)
+        self.assertFalse(stdout_mock.channel.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_ReuseCachedResult_When_IdempotentAndCacheSet(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = lambda *args, **kwargs: (None, Mock(channel=FakeChannel(['3.7.2\n'], exit_status=0)), Mock())
+        cache = ResultCache()
+        client1 = SSHclient('server', 'username', 'password', cache=cache)
+        client2 = SSHclient('server', 'username', 'password', cache=cache)
+        self.assertEqual(client1.execute('puppet -V', success_responses=['3.7.2'], idempotent=True), ['3.7.2\n'])
+        self.assertEqual(client2.execute('puppet -V', idempotent=True), ['3.7.2\n'])
+        with self.assertRaises(ExecuteError):
+            client2.execute('puppet -V', success_responses=['4.0'], idempotent=True)
+        self.assertEqual(connect.return_value.exec_command.call_count, 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotCacheResult_When_CachedCommandTimedOut(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = [
+            (Mock(), Mock(channel=FakeChannel(hung=True, exit_status=-1)), Mock()),
+            (Mock(), Mock(channel=FakeChannel(['output\n'], exit_status=0)), Mock())
+        ]
+        cache = ResultCache()
+        client = SSHclient('server', 'username', 'password', cache=cache)
+        with self.assertRaises(CommandTimeoutError):
+            client.execute('sleep 1', idempotent=True, command_timeout=.1)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(client.execute('sleep 1', idempotent=True), ['output\n'])
+        self.assertEqual(connect.return_value.exec_command.call_count, 2)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotCacheResult_When_ChannelClosedWithoutExitStatus(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = lambda *args, **kwargs: (Mock(), Mock(channel=FakeChannel(exit_status=-1)), Mock())
+        cache = ResultCache()
+        client = SSHclient('server', 'username', 'password', cache=cache)
+        with self.assertRaises(ExecuteError):
+            client.execute('command', idempotent=True)
+        self.assertEqual(len(cache), 0)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_ReturnCopyOfCachedResult_When_IdempotentAndCacheSet(self, connect, *patches):
+        connect.return_value.exec_command.return_value = None, Mock(channel=FakeChannel(['output\n'], exit_status=0)), Mock()
+        client = SSHclient('server', 'username', 'password', cache=ResultCache())
+        client.execute('command', idempotent=True).append('mutated\n')
+        self.assertEqual(client.execute('command', idempotent=True), ['output\n'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_CheckExitCodeOfCachedResult_When_IdempotentAndCacheSet(self, connect, *patches):
+        connect.return_value.exec_command.return_value = None, Mock(channel=FakeChannel(stderr=['error\n'], exit_status=1)), Mock()
+        client = SSHclient('server', 'username', 'password', cache=ResultCache())
+        with self.assertRaises(ExecuteError):
+            client.execute('command', idempotent=True)
+        self.assertEqual(client.execute('command', expected_exit_code=1, idempotent=True), [])
+        self.assertEqual(connect.return_value.exec_command.call_count, 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotUseCache_When_NotIdempotentOrSendInput(self, connect, *patches):
+        connect.return_value.exec_command.side_effect = lambda *args, **kwargs: (Mock(), Mock(channel=FakeChannel(['output\n'], exit_status=0)), Mock())
+        cache = ResultCache()
+        client = SSHclient('server', 'username', 'password', cache=cache)
+        client.execute('command')
+        client.execute('command', send_input='yes', idempotent=True)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(connect.return_value.exec_command.call_count, 2)
+
+    @patch('SSHclient.sshclient.sleep')
+    @patch('SSHclient.sshclient.connect')
+    def test__reconnect_Should_BackOff_When_ConnectFails(self, connect, sleep_patch, *patches):
+        ssh_mock = Mock()
+        connect.side_effect = [Mock(), TimeOutError(), TimeOutError(), ssh_mock]
+        client = SSHclient('server', 'username', 'password', domains=['.one.com'], reconnect=True)
+        client.reconnect()
+        self.assertIs(client.ssh, ssh_mock)
+        self.assertEqual(client.hostname, 'server.one.com')
+        self.assertEqual(sleep_patch.mock_calls, [call(1), call(2)])
+
+    @patch('SSHclient.sshclient.sleep')
+    @patch('SSHclient.sshclient.connect')
+    def test__reconnect_Should_RaiseAtOnce_When_NotAuthorized(self, connect, sleep_patch, *patches):
+        connect.side_effect = [Mock(), NotAuthorizedError()]
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(NotAuthorizedError):
+            client.reconnect()
+        self.assertFalse(sleep_patch.called)
+
+    @patch('SSHclient.sshclient.sleep')
+    @patch('SSHclient.sshclient.connect')
+    def test__reconnect_Should_RaiseLastError_When_AllAttemptsFail(self, connect, sleep_patch, *patches):
+        connect.side_effect = [Mock(), TimeOutError(), TimeOutError(), TimeOutError()]
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(TimeOutError):
+            client.reconnect()
+        self.assertEqual(connect.call_count, 4)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__race_connect_Should_AcquireFromAndReleaseLosersToPool_When_PoolSpecified(self, connect, *patches):
+        pool_mock = Mock()
+        winner_mock = Mock()
+        loser_mock = Mock()
+        release_loser = threading.Event()
+        loser_released = threading.Event()
+
+        def acquire_side_effect(hostname, *args, **kwargs):
+            if hostname == 'host1.slow.com':
+                release_loser.wait(5)
+                return loser_mock
+            return winner_mock
+
+        pool_mock.acquire.side_effect = acquire_side_effect
+        pool_mock.release.side_effect = lambda ssh: loser_released.set()
+        result = race_connect(['host1.slow.com', 'host1.fast.com'], 'username', 'password', 5, pool=pool_mock)
+        release_loser.set()
+        self.assertEqual(result, ('host1.fast.com', winner_mock))
+        self.assertTrue(loser_released.wait(5))
+        pool_mock.release.assert_called_once_with(loser_mock)
+        self.assertFalse(connect.called)
+        self.assertFalse(loser_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_AcquireFromPool_When_PoolSpecified(self, connect, *patches):
+        pool_mock = Mock()
+        pool_mock.acquire.return_value = 'pooled connection'
+        client = SSHclient('server', 'username', 'password', pool=pool_mock, port=2222)
+        self.assertEqual(client.ssh, 'pooled connection')
+        pool_mock.acquire.assert_called_once_with('server', 'username', 'password', 10, set_missing_host_key_policy=True, port=2222, profile=None)
+        self.assertFalse(connect.called)
+
+    @patch('SSHclient.sshclient.get_default_pool')
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_AcquireFromDefaultPool_When_DefaultPoolSet(self, connect, get_default_pool, *patches):
+        pool_mock = Mock()
+        get_default_pool.return_value = pool_mock
+        client = SSHclient('server', 'username', 'password')
+        self.assertEqual(client.ssh, pool_mock.acquire.return_value)
+        self.assertFalse(connect.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__init_Should_Connect_When_PoolFullOfUnclosedClients(self, connect, *patches):
+        connect.side_effect = lambda *args, **kwargs: Mock(**{'get_transport.return_value._channels': []})
+        pool = ConnectionPool(max_size=3)
+        clients = [SSHclient('server{}'.format(index), 'username', 'password', pool=pool) for index in range(4)]
+        self.assertEqual(len(pool.connections), 3)
+        self.assertEqual(connect.call_count, 4)
+        self.assertTrue(clients[0].ssh.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_AcquireNewConnection_When_PooledConnectionEvicted(self, connect, *patches):
+        evicted_mock = Mock(**{'get_transport.return_value._channels': []})
+        ssh_mock = Mock(**{'get_transport.return_value._channels': []})
+        ssh_mock.exec_command.return_value = None, Mock(channel=FakeChannel(['output\n'], exit_status=0)), Mock()
+        connect.side_effect = [evicted_mock, ssh_mock]
+        client = SSHclient('server', 'username', 'password', pool=ConnectionPool())
+        evicted_mock.get_transport.return_value.is_active.return_value = False
+        self.assertEqual(client.execute('command'), ['output\n'])
+        self.assertIs(client.ssh, ssh_mock)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__close_Should_ReleaseToPool_When_PoolSpecified(self, connect, *patches):
+        pool_mock = Mock()
+        client = SSHclient('server', 'username', 'password', pool=pool_mock)
+        client.close()
+        pool_mock.release.assert_called_once_with(pool_mock.acquire.return_value)
+        self.assertFalse(pool_mock.acquire.return_value.close.called)
+
+    def test__is_connected_Should_ReturnFalse_When_NoTransport(self, *patches):
+        ssh_mock = Mock()
+        ssh_mock.get_transport.return_value = None
+        self.assertFalse(is_connected(ssh_mock))
+
+    def test__is_connected_Should_ReturnTransportIsActive_When_Transport(self, *patches):
+        ssh_mock = Mock()
+        ssh_mock.get_transport.return_value.is_active.return_value = False
+        self.assertFalse(is_connected(ssh_mock))
+        ssh_mock.get_transport.return_value.is_active.return_value = True
+        self.assertTrue(is_connected(ssh_mock))
+
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_RaiseExecutionError_When_SshExecCodeNonZero(self, connect, *patches):
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = ['error']
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = []
-        mock_stdout.channel.recv_exit_status.return_value = 1
+        mock_stdout = Mock(channel=FakeChannel([], stderr=['error'], exit_status=1))
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -99,10 +710,7 @@ class TestSSHclient(unittest.TestCase):
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_RaiseExecutionError_When_SshExecCodeNotExpected(self, connect, *patches):
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = ['error']
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = []
-        mock_stdout.channel.recv_exit_status.return_value = 3
+        mock_stdout = Mock(channel=FakeChannel([], stderr=['error'], exit_status=3))
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -116,10 +724,7 @@ class TestSSHclient(unittest.TestCase):
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_Succeed_When_SshExecCodeExpected(self, connect, *patches):
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['some output']
-        mock_stdout.channel.recv_exit_status.return_value = 3
+        mock_stdout = Mock(channel=FakeChannel(['some output'], exit_status=3))
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -130,14 +735,20 @@ class TestSSHclient(unittest.TestCase):
         result = client.execute('command', expected_exit_code=3)
         self.assertEqual(result, ['some output'])
 
+    @patch('SSHclient.sshclient.logger')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotLogOutput_When_DebugDisabled(self, connect, logger_patch, *patches):
+        logger_patch.isEnabledFor.return_value = False
+        connect.return_value.exec_command.return_value = None, Mock(channel=FakeChannel(['secret output\n'], exit_status=0)), Mock()
+        client = SSHclient('server', 'username', 'password')
+        self.assertEqual(client.execute('command'), ['secret output\n'])
+        self.assertFalse([call for call in logger_patch.debug.call_args_list if 'secret output' in call[0][0]])
+
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_ReturnStdoutLines_When_SshExecReturnsStdoutLines(self, connect, *patches):
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['output']
-        mock_stdout.channel.recv_exit_status.return_value = 0
+        mock_stdout = Mock(channel=FakeChannel(['output'], exit_status=0))
 
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -149,15 +760,44 @@ class TestSSHclient(unittest.TestCase):
 
         self.assertEqual(result, expected_result)
 
+    @patch('SSHclient.sshclient.select.select')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_EmitExecutePhases_When_ListenerAttached(self, connect, select_patch, *patches):
+        mock_stdout = Mock(channel=FakeChannel(['output'], exit_status=0))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = None, mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        events = []
+        add_listener(events.append)
+        try:
+            client.execute('command')
+
+        finally:
+            remove_listener(events.append)
+        select_patch.assert_called_once_with([mock_stdout.channel], [], [])
+        self.assertEqual(
+            [(event.hostname, event.phase, event.command) for event in events],
+            [('server', 'channel_open', 'command'), ('server', 'first_byte', 'command'), ('server', 'exit_status', 'command')])
+
+    @patch('SSHclient.sshclient.select.select')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_Should_NotWaitForFirstByte_When_NoListenerAttached(self, connect, select_patch, *patches):
+        mock_stdout = Mock(channel=FakeChannel(['output'], exit_status=0))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = None, mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        SSHclient('server', 'username', 'password').execute('command')
+        self.assertFalse(select_patch.called)
+
     @patch('SSHclient.sshclient.print_out')
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_PrintStdoutLines_When_SshExecReturnsStdoutLinesAndPrintoutTrue(self, connect, print_out, *patches):
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['output']
-        mock_stdout.channel.recv_exit_status.return_value = 0
+        mock_stdout = Mock(channel=FakeChannel(['output'], exit_status=0))
 
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -171,11 +811,9 @@ class TestSSHclient(unittest.TestCase):
     @patch('SSHclient.sshclient.check_success_responses', return_value=False)
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_RaiseExcecuteError_When_CheckSuccessResponsesReturnsFalse(self, connect, *patches):
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['nobs']
+        mock_stdout = Mock(channel=FakeChannel(['nobs']))
 
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -188,11 +826,9 @@ class TestSSHclient(unittest.TestCase):
     @patch('SSHclient.sshclient.check_success_responses', return_value=True)
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_ReturnStdoutLines_When_CheckSuccessResponsesReturnsTrue(self, connect, *patches):
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['bs1', 'nobs']
+        mock_stdout = Mock(channel=FakeChannel(['bs1\n', 'nobs']))
 
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
 
         ssh_mock = Mock()
         ssh_mock.exec_command.return_value = None, mock_stdout, mock_stderr
@@ -200,17 +836,15 @@ class TestSSHclient(unittest.TestCase):
 
         client = SSHclient('hostname', 'user', 'password')
         result = client.execute('myfakecommand', success_responses=['bs1', 'bs2'])
-        expected_result = ['bs1', 'nobs']
+        expected_result = ['bs1\n', 'nobs']
         self.assertEqual(expected_result, result)
 
     @patch('SSHclient.sshclient.check_success_responses', return_value=True)
     @patch('SSHclient.sshclient.connect')
     def test__execute_Should_WriteStdin_When_SendInputProvided(self, connect, *patches):
-        mock_stdout = Mock()
-        mock_stdout.readlines.return_value = ['success']
+        mock_stdout = Mock(channel=FakeChannel(['success']))
 
         mock_stderr = Mock()
-        mock_stderr.readlines.return_value = []
 
         mock_stdin = Mock()
 
@@ -235,6 +869,15 @@ class TestSSHclient(unittest.TestCase):
         with self.assertRaises(ConnectError):
             connect('hostname', 'username', 'password', 5)
 
+    def test__connect_Should_RaiseConnectError_When_ConnectionRefused(self, *patches):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        # the port is closed so connecting to it is refused
+        listener.close()
+        with self.assertRaises(ConnectError):
+            connect('127.0.0.1', 'username', 'password', 5, port=port)
+
     @patch('SSHclient.sshclient.paramiko.SSHClient')
     def test__connect_Should_RaiseTimeOutError_When_SocketTimeoutException(self, ssh_client, *patches):
         ssh_client_mock = Mock()
@@ -289,6 +932,49 @@ class TestSSHclient(unittest.TestCase):
         connect('server', 'username', 'password', 5, set_missing_host_key_policy=True)
         self.assertTrue(ssh_client_mock.set_missing_host_key_policy.called)
 
+    @patch('SSHclient.sshclient.open_socket', return_value='sock')
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_ConnectOverOpenedSocketAndEmitHandshake_When_ListenerAttached(self, ssh_client, *patches):
+        events = []
+        add_listener(events.append)
+        try:
+            connect('server', 'username', 'password', 5, port=2222)
+
+        finally:
+            remove_listener(events.append)
+        ssh_client.return_value.connect.assert_called_once_with(
+            'server', port=2222, username='username', password='password', timeout=5, sock='sock')
+        self.assertEqual([(event.hostname, event.phase) for event in events], [('server', 'handshake')])
+
+    @patch('SSHclient.sshclient.socket.socket')
+    @patch('SSHclient.sshclient.socket.getaddrinfo')
+    def test__open_socket_Should_TryEachAddressAndEmitPhases_When_ListenerAttached(self, getaddrinfo, socket_patch, *patches):
+        getaddrinfo.return_value = [(10, 1, 6, '', ('::1', 22)), (2, 1, 6, '', ('127.0.0.1', 22))]
+        failed_sock = Mock()
+        failed_sock.connect.side_effect = timeout('timed out')
+        sock = Mock()
+        socket_patch.side_effect = [failed_sock, sock]
+        events = []
+        add_listener(events.append)
+        try:
+            result = open_socket('server', 22, 5)
+
+        finally:
+            remove_listener(events.append)
+        self.assertEqual(result, sock)
+        self.assertTrue(failed_sock.close.called)
+        sock.settimeout.assert_called_once_with(5)
+        sock.connect.assert_called_once_with(('127.0.0.1', 22))
+        self.assertEqual([event.phase for event in events], ['dns', 'tcp_connect'])
+
+    @patch('SSHclient.sshclient.socket.socket')
+    @patch('SSHclient.sshclient.socket.getaddrinfo')
+    def test__open_socket_Should_RaiseLastError_When_NoAddressConnects(self, getaddrinfo, socket_patch, *patches):
+        getaddrinfo.return_value = [(2, 1, 6, '', ('127.0.0.1', 22))]
+        socket_patch.return_value.connect.side_effect = timeout('timed out')
+        with self.assertRaises(timeout):
+            open_socket('server', 22, 5)
+
     def test__generate_hostnames_Should_ReturnHostnamesList_When_Called(self, *patches):
         result = generate_hostnames('hostname', ['.cps.intel.com', '.fm.intel.com'])
         expected_result = ['hostname.cps.intel.com', 'hostname.fm.intel.com']
@@ -345,41 +1031,27 @@ class TestSSHclient(unittest.TestCase):
         ]
         self.assertTrue(check_success_responses(contents, success_responses))
 
-    @patch('SSHclient.sshclient.sleep')
-    def test__shell_receive_Should_CallSleep_When_ShellRecvReadyReturnsFalse(self, sleep, *patches):
+    def test__shell_receive_Should_WaitForFirstDataThenQuietPeriod_When_Called(self, *patches):
         shell_mock = Mock()
-        shell_mock.recv_ready.side_effect = [
-            False,
-            False,
-            True,
-            True,
-            True,
-            False
-        ]
         shell_mock.recv.side_effect = [
             'data1\r\n',
-            'data2\r\n'
+            'data2\r\n',
+            timeout('timeout')
         ]
         lines = [
             'data0'
         ]
-        _shell_receive(shell_mock, lines)
-        self.assertEqual(len(sleep.mock_calls), 2)
+        _shell_receive(shell_mock, lines, timeout=30, quiet_period=.5)
+        self.assertEqual(shell_mock.settimeout.mock_calls[1:], [call(.5), call(.5)])
+        self.assertGreater(shell_mock.settimeout.mock_calls[0][1][0], 29)
 
-    @patch('SSHclient.sshclient.sleep')
-    def test__shell_receive_Should_ReturnAppendedRecv_When_ShellRecvReady(self, sleep, *patches):
+    def test__shell_receive_Should_ReturnAppendedRecv_When_ShellQuiet(self, *patches):
         shell_mock = Mock()
-        shell_mock.recv_ready.side_effect = [
-            False,
-            False,
-            True,
-            True,
-            True,
-            False
-        ]
         shell_mock.recv.side_effect = [
+            timeout('timeout'),
             'data1\r\n',
-            'data2\r\n'
+            'data2\r\n',
+            timeout('timeout')
         ]
         lines = [
             'data0'
@@ -395,32 +1067,351 @@ class TestSSHclient(unittest.TestCase):
         ]
         self.assertEqual(lines, expected_lines)
 
-    @patch('SSHclient.sshclient.sleep')
-    def test__shell_receive_Should_AppendRecvToLines_When_ShellRecvReady(self, sleep, *patches):
+    def test__shell_receive_Should_ReturnWithoutWaitingForQuiet_When_PromptMatches(self, *patches):
         shell_mock = Mock()
-        shell_mock.recv_ready.side_effect = [
-            False,
-            False,
-            True,
-            True,
-            True,
-            False
+        shell_mock.recv.side_effect = [
+            'banner\r\nhost',
+            '# ',
+            AssertionError('recv called after prompt')
         ]
+        lines = []
+        result = _shell_receive(shell_mock, lines, prompt='[#$>] ?$')
+        self.assertEqual(result, 'banner\r\nhost# ')
+        self.assertEqual(lines, ['banner', 'host# '])
+
+    def test__shell_receive_Should_WaitPastQuietPeriodForPrompt_When_PromptSpecified(self, *patches):
+        shell_mock = Mock()
         shell_mock.recv.side_effect = [
-            'data1\r\n',
-            'data2\r\n'
+            'part1\r\n',
+            timeout('timeout'),
+            'part2\r\nhost# '
         ]
-        lines = [
-            'data0'
+        lines = []
+        result = _shell_receive(shell_mock, lines, quiet_period=.5, prompt='# $')
+        self.assertEqual(result, 'part1\r\npart2\r\nhost# ')
+        self.assertGreater(shell_mock.settimeout.mock_calls[1][1][0], .5)
+
+    def test__shell_receive_Should_ReturnAfterQuietPeriod_When_FallbackPromptMatches(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
+            'configure terminal\r\n',
+            timeout('timeout'),
+            'switch(config)# ',
+            timeout('timeout'),
+            AssertionError('recv called after quiet period')
         ]
-        _shell_receive(shell_mock, lines)
-        expected_lines = [
-            'data0',
+        lines = []
+        result = _shell_receive(shell_mock, lines, quiet_period=.5, prompt='switch# $', fallback_prompt='[#$>] ?\\Z')
+        self.assertEqual(result, 'configure terminal\r\nswitch(config)# ')
+        self.assertGreater(shell_mock.settimeout.mock_calls[1][1][0], .5)
+        self.assertEqual(shell_mock.settimeout.mock_calls[3], call(.5))
+
+    def test__shell_receive_Should_ReturnData_When_ShellClosed(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
+            'data1\r\n',
+            ''
+        ]
+        lines = []
+        result = _shell_receive(shell_mock, lines)
+        self.assertEqual(result, 'data1\r\n')
+
+    @patch('SSHclient.sshclient.time')
+    def test__shell_receive_Should_ReturnReceivedData_When_TimeoutElapsed(self, time_patch, *patches):
+        time_patch.side_effect = [100, 100, 101, 106]
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
             'data1',
             'data2',
-            ''
+            AssertionError('recv called after timeout')
         ]
-        self.assertEqual(lines, expected_lines)
+        lines = []
+        result = _shell_receive(shell_mock, lines, timeout=5, quiet_period=10)
+        self.assertEqual(result, 'data1data2')
+
+    def test__shell_receive_Should_ReturnEmpty_When_NotWaitingAndNoData(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
+            timeout('timeout'),
+            AssertionError('recv called after quiet period')
+        ]
+        lines = []
+        result = _shell_receive(shell_mock, lines, quiet_period=.5, wait=False)
+        self.assertEqual(result, '')
+        shell_mock.settimeout.assert_called_once_with(.5)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_YieldLinesAndCheckExitCode_When_NoSuccessResponses(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['line1\nli', 'ne2\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        result = list(client.execute_stream('command'))
+        self.assertEqual(result, ['line1\n', 'line2\n'])
+        self.assertTrue(mock_stdout.channel.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_RaiseExecuteError_When_ExitCodeNotExpected(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['line1\n'], stderr=['error\n'], exit_status=2)
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError) as context:
+            list(client.execute_stream('command'))
+        self.assertEqual(str(context.exception), 'error\nexit code: 2')
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_DrainStderrWhileYieldingLines_When_StderrInterleaved(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['line1\n', 'line2'], stderr=['warning\n'] * 100)
+        mock_stderr = Mock()
+        mock_stderr.readlines.side_effect = AssertionError('stderr read after stdout')
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, mock_stderr
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        self.assertEqual(list(client.execute_stream('command')), ['line1\n', 'line2'])
+        self.assertEqual(mock_stdout.channel.stderr, [])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_StopAndCloseChannel_When_SuccessResponseFound(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['booting\nfirmware update ', 'complete\n', 'never read\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        result = list(client.execute_stream('tail -f firmware.log', success_responses=['update complete']))
+        self.assertEqual(result, ['booting\n', 'firmware update complete\n'])
+        self.assertTrue(mock_stdout.channel.close.called)
+        self.assertFalse(mock_stdout.channel.recv_exit_status.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_FindSuccessResponse_When_SplitAcrossLines(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['status:\n', 'ok\n', 'more\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        result = list(client.execute_stream('command', success_responses=['status:\nok']))
+        self.assertEqual(result, ['status:\n', 'ok\n'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_MatchRegexSuccessResponse_When_LineMatches(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['items=0\n', 'items=12 cached=12\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        result = list(client.execute_stream('command', success_responses=['{regex}.*items=[1-9][0-9]* cached=[1-9][0-9]*.*']))
+        self.assertEqual(result, ['items=0\n', 'items=12 cached=12\n'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_stream_Should_RaiseExecuteError_When_SuccessResponseNotFound(self, connect, *patches):
+        mock_stdout = Mock()
+        mock_stdout.channel = FakeChannel(stdout=['line1\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError):
+            list(client.execute_stream('command', success_responses=['never']))
+        self.assertTrue(mock_stdout.channel.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_capture_Should_ReturnCapturedOutput_When_ExitCodeExpected(self, connect, *patches):
+        mock_stdout = Mock(channel=FakeChannel(['line1\nli', 'ne2\n']))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        result = client.execute_capture('command')
+        self.assertEqual(list(result), ['line1\n', 'line2\n'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_capture_Should_SpillToFile_When_ThresholdExceeded(self, connect, *patches):
+        mock_stdout = Mock(channel=FakeChannel(['x' * 10 + '\n', 'y' * 10 + '\n']))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with client.execute_capture('command', threshold=16) as result:
+            self.assertIsNotNone(result.file)
+            self.assertEqual(result[1], 'y' * 10 + '\n')
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_capture_Should_RaiseExecuteError_When_SuccessResponsesNotFound(self, connect, *patches):
+        mock_stdout = Mock(channel=FakeChannel(['output\n']))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError):
+            client.execute_capture('command', success_responses=['3.7.2'])
+        self.assertFalse(mock_stdout.channel.recv_exit_status.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_capture_Should_RaiseExecuteError_When_ExitCodeNotExpected(self, connect, *patches):
+        mock_stdout = Mock(channel=FakeChannel(stderr=['error\n'], exit_status=1))
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = Mock(), mock_stdout, Mock()
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError):
+            client.execute_capture('command')
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_many_Should_ReturnCommandResultsInOrder_When_Called(self, connect, *patches):
+        def exec_command_side_effect(command):
+            channel = FakeChannel(
+                ['{} output'.format(command)], stderr=['{} error'.format(command)], exit_status=1 if command == 'false' else 0)
+            return Mock(), Mock(channel=channel), Mock()
+
+        ssh_mock = Mock()
+        ssh_mock.exec_command.side_effect = exec_command_side_effect
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        results = client.execute_many(['hostname', 'uptime', 'false'])
+        self.assertEqual([result.command for result in results], ['hostname', 'uptime', 'false'])
+        self.assertEqual(results[0].stdout, ['hostname output'])
+        self.assertEqual(results[1].stderr, ['uptime error'])
+        self.assertEqual([result.exit_code for result in results], [0, 0, 1])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_many_Should_LimitOpenChannels_When_MaxChannelsSpecified(self, connect, *patches):
+        lock = threading.Lock()
+        counts = {'open': 0, 'peak': 0}
+
+        def exec_command_side_effect(command):
+            with lock:
+                counts['open'] += 1
+                counts['peak'] = max(counts['peak'], counts['open'])
+
+            def recv_exit_status():
+                sleep(.01)
+                with lock:
+                    counts['open'] -= 1
+                return 0
+
+            channel = FakeChannel()
+            channel.recv_exit_status.side_effect = recv_exit_status
+            return Mock(), Mock(channel=channel), Mock()
+
+        ssh_mock = Mock()
+        ssh_mock.exec_command.side_effect = exec_command_side_effect
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        results = client.execute_many(['command{}'.format(index) for index in range(12)], max_channels=3)
+        self.assertEqual(len(results), 12)
+        self.assertLessEqual(counts['peak'], 3)
+
+    def test__get_batch_script_Should_SeparateCommandOutput_When_RunByShell(self, *patches):
+        commands = ['echo one', 'printf two', 'echo error >&2; exit 3', 'cat', 'echo "a\nb"']
+        process = subprocess.Popen(['sh', '-c', get_batch_script(commands, 'MARKER')], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        results = split_batch_output(stdout, stderr, commands, 'MARKER')
+        self.assertEqual([result.command for result in results], commands)
+        self.assertEqual([result.stdout for result in results], [['one\n'], ['two'], [], [], ['a\n', 'b\n']])
+        self.assertEqual([result.stderr for result in results], [[], [], ['error\n'], [], []])
+        self.assertEqual([result.exit_code for result in results], [0, 0, 3, 0, 0])
+
+    def test__split_batch_output_Should_DecodeLinesLikeExecute_When_Called(self, *patches):
+        results = split_batch_output('caf\xc3\xa9\rdone\n\nMARKER:0:0\n', 'warn\xc3\xa9\n\nMARKER:0\n', ['echo'], 'MARKER')
+        self.assertEqual(results[0].stdout, [u'caf\xe9\rdone\n'])
+        self.assertEqual(results[0].stderr, [u'warn\xe9\n'])
+        self.assertIsInstance(results[0].stdout[0], unicode)
+
+    def test__split_batch_output_Should_ReturnCompletedCommands_When_OutputTruncated(self, *patches):
+        results = split_batch_output('one\n\nMARKER:0:0\ntwo', '\nMARKER:0\n', ['echo one', 'echo two'], 'MARKER')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].stdout, ['one\n'])
+
+    @patch('SSHclient.sshclient.uuid.uuid4')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_batch_Should_ReturnCommandResults_When_CommandsSucceed(self, connect, uuid4, *patches):
+        uuid4.return_value.hex = 'id'
+        channel = FakeChannel(['host1\n\nSSHCLIENT-id:0:0\nup\n\nSSHCLIENT-id:1:0\n'], stderr=['\nSSHCLIENT-id:0\n\nSSHCLIENT-id:1\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = (Mock(), Mock(channel=channel), Mock())
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        results = client.execute_batch(['hostname', 'uptime'])
+        self.assertEqual([result.stdout for result in results], [['host1\n'], ['up\n']])
+        self.assertEqual(ssh_mock.exec_command.call_count, 1)
+        ssh_mock.exec_command.assert_called_once_with(get_batch_script(['hostname', 'uptime'], 'SSHCLIENT-id'))
+
+    @patch('SSHclient.sshclient.uuid.uuid4')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_batch_Should_RaiseExecuteErrorWithResults_When_CommandFails(self, connect, uuid4, *patches):
+        uuid4.return_value.hex = 'id'
+        channel = FakeChannel(['host1\n\nSSHCLIENT-id:0:0\n\nSSHCLIENT-id:1:2\n'], stderr=['\nSSHCLIENT-id:0\nmissing\n\nSSHCLIENT-id:1\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = (Mock(), Mock(channel=channel), Mock())
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaisesRegexp(ExecuteError, 'command "ls missing" failed: missing\nexit code: 2') as context:
+            client.execute_batch(['hostname', 'ls missing'])
+        self.assertEqual([result.exit_code for result in context.exception.results], [0, 2])
+
+    @patch('SSHclient.sshclient.uuid.uuid4')
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_batch_Should_CheckSuccessResponsesPerCommand_When_Specified(self, connect, uuid4, *patches):
+        uuid4.return_value.hex = 'id'
+        channel = FakeChannel(['ok\n\nSSHCLIENT-id:0:1\nnope\n\nSSHCLIENT-id:1:0\n'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = (Mock(), Mock(channel=channel), Mock())
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaisesRegexp(ExecuteError, 'success responses not found in stdout of command "second"'):
+            client.execute_batch(['first', 'second'], success_responses=['ok'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_batch_Should_RaiseExecuteError_When_BatchTruncated(self, connect, *patches):
+        channel = FakeChannel(['partial'])
+        ssh_mock = Mock()
+        ssh_mock.exec_command.return_value = (Mock(), Mock(channel=channel), Mock())
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaisesRegexp(ExecuteError, 'batch ended before command "hostname" completed'):
+            client.execute_batch(['hostname'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_many_Should_RaiseExecuteError_When_ChannelOpenFails(self, connect, *patches):
+        ssh_mock = Mock()
+        ssh_mock.exec_command.side_effect = SSHException('ChannelException(1, Administratively prohibited)')
+        connect.return_value = ssh_mock
+
+        client = SSHclient('server', 'username', 'password')
+        with self.assertRaises(ExecuteError):
+            client.execute_many(['command'])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__execute_many_Should_ReturnEmptyList_When_NoCommands(self, connect, *patches):
+        client = SSHclient('server', 'username', 'password')
+        self.assertEqual(client.execute_many([]), [])
 
     @patch('SSHclient.sshclient.check_success_responses', return_value=True)
     @patch('SSHclient.sshclient._shell_receive')
@@ -436,6 +1427,76 @@ class TestSSHclient(unittest.TestCase):
 
         self.assertEqual(shell_mock.send.mock_calls[0], call('command\n'))
 
+    @patch('SSHclient.sshclient.check_success_responses', return_value=True)
+    @patch('SSHclient.sshclient._shell_receive')
+    @patch('SSHclient.sshclient.connect')
+    def test__shell_execute_Should_PassReceiveOptions_When_Called(self, connect, shell_receive, *patches):
+        ssh_mock = Mock()
+        shell_mock = Mock()
+        ssh_mock.invoke_shell.return_value = shell_mock
+        connect.return_value = ssh_mock
+
+        client = SSHclient('hostname', 'user', 'password')
+        client.shell_execute('command', send_inputs=['YES'], timeout=5, quiet_period=.1, prompt='# $')
+
+        self.assertEqual(shell_receive.mock_calls[0], call(shell_mock, [], timeout=5, quiet_period=.1, prompt='# $'))
+        self.assertEqual(shell_receive.mock_calls[-1], call(shell_mock, [], timeout=5, quiet_period=.1, prompt='# $', wait=False))
+
+    @patch('SSHclient.sshclient.check_success_responses', return_value=True)
+    @patch('SSHclient.sshclient._shell_receive')
+    @patch('SSHclient.sshclient.connect')
+    def test__shell_execute_Should_WaitForInputPromptBeforeInputs_When_InputPromptSpecified(self, connect, shell_receive, *patches):
+        client = SSHclient('hostname', 'user', 'password')
+        client.shell_execute('reload', send_inputs=['yes'], prompt='# $', input_prompt='\\? $')
+
+        self.assertEqual([mock_call[2]['prompt'] for mock_call in shell_receive.mock_calls], ['# $', '\\? $', '# $', '# $'])
+
+    @patch('SSHclient.sshclient.ShellSession')
+    @patch('SSHclient.sshclient.connect')
+    def test__shell_execute_Should_RunInShellSession_When_Persistent(self, connect, shell_session, *patches):
+        client = SSHclient('hostname', 'user', 'password')
+        client.shell_execute('command1', send_inputs=['YES'], prompt='# $', persistent=True, input_prompt='\\? $')
+        client.shell_execute('command2', send_inputs=[], persistent=True)
+
+        self.assertEqual(shell_session.call_count, 1)
+        self.assertEqual(shell_session.mock_calls[0][2]['prompt'], '# $')
+        session_mock = shell_session.return_value
+        self.assertEqual(session_mock.run.mock_calls[0], call('command1', send_inputs=['YES'], success_responses=None, input_prompt='\\? $'))
+        client.close()
+        self.assertTrue(session_mock.close.called)
+
+    @patch('SSHclient.sshclient.shell_expect')
+    @patch('SSHclient.sshclient._shell_receive')
+    @patch('SSHclient.sshclient.connect')
+    def test__shell_execute_Should_ExpectPromptBeforeSendingInput_When_InputIsTuple(self, connect, shell_receive, shell_expect, *patches):
+        ssh_mock = Mock()
+        shell_mock = Mock()
+        ssh_mock.invoke_shell.return_value = shell_mock
+        connect.return_value = ssh_mock
+
+        client = SSHclient('hostname', 'user', 'password')
+        client.shell_execute('passwd', send_inputs=[('{regex}[Pp]assword: ?$', 'secret'), ('Retype', 'secret')], timeout=5)
+
+        self.assertEqual(shell_expect.mock_calls, [
+            call(shell_mock, [], '{regex}[Pp]assword: ?$', timeout=5),
+            call(shell_mock, [], 'Retype', timeout=5)])
+        self.assertEqual(shell_mock.send.mock_calls, [call('passwd\n'), call('secret\n'), call('secret\n')])
+
+    @patch('SSHclient.sshclient.shell_expect')
+    @patch('SSHclient.sshclient._shell_receive')
+    @patch('SSHclient.sshclient.connect')
+    def test__shell_execute_Should_CloseShell_When_PromptNotReceived(self, connect, shell_receive, shell_expect, *patches):
+        ssh_mock = Mock()
+        shell_mock = Mock()
+        ssh_mock.invoke_shell.return_value = shell_mock
+        connect.return_value = ssh_mock
+        shell_expect.side_effect = ExecuteError('prompt not received')
+
+        client = SSHclient('hostname', 'user', 'password')
+        with self.assertRaises(ExecuteError):
+            client.shell_execute('passwd', send_inputs=[('Password:', 'secret')])
+        self.assertTrue(shell_mock.close.called)
+
     @patch('SSHclient.sshclient.check_success_responses', return_value=True)
     @patch('SSHclient.sshclient._shell_receive')
     @patch('SSHclient.sshclient.connect')
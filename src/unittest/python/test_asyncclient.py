@@ -0,0 +1,250 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient import AsyncSSHclient
+from SSHclient import Future
+from SSHclient import ExecuteError
+from SSHclient import TimeOutError
+from SSHclient.asyncclient import CommandHandler
+from SSHclient.asyncclient import get_reactor
+
+import os
+import threading
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class FakeChannel(object):
+    """ channel whose fileno is readable while it has data or eof like a paramiko channel
+    """
+    def __init__(self, exit_code=0, exit_status_after_eof=False):
+        self.read_fd, self.write_fd = os.pipe()
+        self.lock = threading.Lock()
+        self.stdout = []
+        self.stderr = []
+        self.eof_received = False
+        self.exit_code = exit_code
+        self.exit_status = threading.Event()
+        self.exit_status_waited = threading.Event()
+        if not exit_status_after_eof:
+            self.exit_status.set()
+        self.closed = False
+        self.transport = Mock()
+        self.transport.is_active.return_value = True
+
+    def fileno(self):
+        return self.read_fd
+
+    def get_transport(self):
+        return self.transport
+
+    def drop(self):
+        """ lose the connection - like paramiko the channel stays readable without further output
+        """
+        with self.lock:
+            self.transport.is_active.return_value = False
+            self.closed = True
+            os.write(self.write_fd, 'x')
+
+    def feed(self, stdout='', stderr='', eof=False):
+        with self.lock:
+            if stdout:
+                self.stdout.append(stdout)
+            if stderr:
+                self.stderr.append(stderr)
+            self.eof_received = self.eof_received or eof
+            os.write(self.write_fd, 'x')
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv(self, size):
+        with self.lock:
+            if not self.eof_received:
+                # like paramiko the channel stays readable once eof is received
+                os.read(self.read_fd, 1)
+            return self.stdout.pop(0)
+
+    def recv_stderr(self, size):
+        with self.lock:
+            return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        return self.eof_received and self.exit_status.is_set()
+
+    def recv_exit_status(self):
+        self.exit_status_waited.set()
+        self.exit_status.wait()
+        return self.exit_code
+
+    def close(self):
+        self.closed = True
+
+
+def run_channel(channel, chunks, **kwargs):
+    future = Future()
+    get_reactor().register(channel, CommandHandler(future, channel, **kwargs))
+    for chunk in chunks:
+        channel.feed(**chunk)
+    return future
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__Future_Should_ReturnResultAndCallCallbacks_When_ResultSet(self, *patches):
+        future = Future()
+        done = []
+        future.add_done_callback(done.append)
+        self.assertFalse(future.done())
+        future.set_result('result')
+        future.set_exception(ExecuteError('ignored'))
+        self.assertEqual(future.result(), 'result')
+        self.assertEqual(done, [future])
+        future.add_done_callback(done.append)
+        self.assertEqual(done, [future, future])
+
+    def test__Future_Should_RaiseException_When_ExceptionSet(self, *patches):
+        future = Future()
+        future.set_exception(ExecuteError('error'))
+        with self.assertRaises(ExecuteError):
+            future.result()
+
+    def test__Future_Should_RaiseTimeOutError_When_NotDoneWithinTimeout(self, *patches):
+        with self.assertRaises(TimeOutError):
+            Future().result(timeout=.01)
+
+    def test__execute_Should_ReturnStdoutLines_When_CommandCompletes(self, *patches):
+        channel = FakeChannel()
+        future = run_channel(channel, [{'stdout': 'line1\nli'}, {'stdout': 'ne2\n', 'eof': True}])
+        self.assertEqual(future.result(timeout=5), ['line1\n', 'line2\n'])
+        self.assertTrue(channel.closed)
+
+    def test__execute_Should_DecodeLinesLikeSSHclient_When_CommandCompletes(self, *patches):
+        channel = FakeChannel()
+        future = run_channel(channel, [{'stdout': 'caf\xc3\xa9\rdone\r\n', 'eof': True}])
+        self.assertEqual(future.result(timeout=5), [u'caf\xe9\rdone\r\n'])
+
+    def test__execute_Should_RaiseConnectionError_When_ConnectionDropsDuringCommand(self, *patches):
+        channel = FakeChannel()
+        future = run_channel(channel, [{'stdout': 'line1\n'}])
+        channel.drop()
+        with self.assertRaises(EOFError):
+            future.result(timeout=5)
+
+    def test__execute_Should_ReturnStdoutLines_When_ExitStatusArrivesAfterEof(self, *patches):
+        channel = FakeChannel(exit_status_after_eof=True)
+        future = run_channel(channel, [{'stdout': 'line1\n', 'eof': True}])
+        self.assertTrue(channel.exit_status_waited.wait(5))
+        channel.exit_status.set()
+        self.assertEqual(future.result(timeout=5), ['line1\n'])
+
+    def test__execute_Should_RaiseExecuteError_When_ExitStatusAfterEofNotExpected(self, *patches):
+        channel = FakeChannel(exit_code=3, exit_status_after_eof=True)
+        future = run_channel(channel, [{'stderr': 'failed\n', 'eof': True}])
+        self.assertTrue(channel.exit_status_waited.wait(5))
+        channel.exit_status.set()
+        with self.assertRaisesRegexp(ExecuteError, 'failed\nexit code: 3'):
+            future.result(timeout=5)
+
+    def test__execute_Should_RaiseExecuteError_When_ExitCodeNotExpected(self, *patches):
+        channel = FakeChannel(exit_code=2)
+        future = run_channel(channel, [{'stderr': 'failed\n', 'eof': True}])
+        with self.assertRaisesRegexp(ExecuteError, 'failed\nexit code: 2'):
+            future.result(timeout=5)
+
+    def test__execute_Should_ReturnStdoutLines_When_SuccessResponseFound(self, *patches):
+        channel = FakeChannel(exit_code=1)
+        future = run_channel(channel, [{'stdout': 'installed 3.7.2\n', 'eof': True}], success_responses=['3.7.2'])
+        self.assertEqual(future.result(timeout=5), ['installed 3.7.2\n'])
+
+    def test__execute_Should_RaiseExecuteError_When_SuccessResponseNotFound(self, *patches):
+        channel = FakeChannel()
+        future = run_channel(channel, [{'stdout': 'installed 3.7.1\n', 'eof': True}], success_responses=['3.7.2'])
+        with self.assertRaisesRegexp(ExecuteError, 'success responses not found'):
+            future.result(timeout=5)
+
+    def test__execute_stream_Should_CloseChannel_When_SuccessResponseFound(self, *patches):
+        channel = FakeChannel()
+        lines = []
+        future = run_channel(channel, [{'stdout': 'line1\nready\nline3\n'}], success_responses=['ready'], callback=lines.append)
+        self.assertIsNone(future.result(timeout=5))
+        self.assertEqual(lines, ['line1\n', 'ready\n'])
+        self.assertTrue(channel.closed)
+
+    def test__execute_stream_Should_PassPartialLine_When_EofReceived(self, *patches):
+        channel = FakeChannel()
+        lines = []
+        future = run_channel(channel, [{'stdout': 'line1\nline2'}, {'eof': True}], callback=lines.append)
+        self.assertIsNone(future.result(timeout=5))
+        self.assertEqual(lines, ['line1\n', 'line2'])
+
+    def test__execute_Should_CompleteAllCommands_When_ManyInFlight(self, *patches):
+        channels = [FakeChannel() for _ in range(50)]
+        futures = [run_channel(channel, []) for channel in channels]
+        for index, channel in enumerate(channels):
+            channel.feed(stdout='{}\n'.format(index), eof=True)
+        self.assertEqual([future.result(timeout=5) for future in futures], [['{}\n'.format(index)] for index in range(50)])
+
+    @patch('SSHclient.asyncclient.SSHclient')
+    def test__connect_Should_ResolveToClient_When_Connected(self, ssh_client, *patches):
+        client = AsyncSSHclient('host1', 'username', 'password', port=2222)
+        self.assertIs(client.connect().result(timeout=5), client)
+        ssh_client.assert_called_once_with('host1', 'username', 'password', port=2222)
+
+    @patch('SSHclient.asyncclient.SSHclient')
+    def test__connect_Should_RaiseError_When_ConnectFails(self, ssh_client, *patches):
+        ssh_client.side_effect = TimeOutError('timed out')
+        with self.assertRaises(TimeOutError):
+            AsyncSSHclient('host1', 'username', 'password').connect().result(timeout=5)
+
+    @patch('SSHclient.asyncclient.SSHclient')
+    def test__execute_Should_RaiseError_When_ChannelOpenFails(self, ssh_client, *patches):
+        ssh_client.return_value.ssh.exec_command.side_effect = ExecuteError('no channel')
+        client = AsyncSSHclient('host1', 'username', 'password').connect().result(timeout=5)
+        with self.assertRaisesRegexp(ExecuteError, 'no channel'):
+            client.execute('command').result(timeout=5)
+
+    @patch('SSHclient.asyncclient.SSHclient')
+    def test__execute_Should_SendInputAndRegisterChannel_When_Called(self, ssh_client, *patches):
+        channel = FakeChannel()
+        stdin_mock = Mock()
+        stdout_mock = Mock(channel=channel)
+        ssh_client.return_value.ssh.exec_command.return_value = (stdin_mock, stdout_mock, Mock())
+        client = AsyncSSHclient('host1', 'username', 'password').connect().result(timeout=5)
+        future = client.execute('command', send_input='yes')
+        channel.feed(stdout='output\n', eof=True)
+        self.assertEqual(future.result(timeout=5), ['output\n'])
+        stdin_mock.write.assert_called_once_with('yes\n')
+
+    @patch('SSHclient.asyncclient.SSHclient')
+    def test__shell_execute_Should_RunOnPool_When_Called(self, ssh_client, *patches):
+        ssh_client.return_value.shell_execute.return_value = ['output']
+        client = AsyncSSHclient('host1', 'username', 'password').connect().result(timeout=5)
+        self.assertEqual(client.shell_execute('command', ['input'], prompt='# ').result(timeout=5), ['output'])
+        ssh_client.return_value.shell_execute.assert_called_once_with('command', ['input'], success_responses=None, prompt='# ')
+        client.close()
+        ssh_client.return_value.close.assert_called_once_with()
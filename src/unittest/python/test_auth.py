@@ -0,0 +1,142 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient import SSHclient
+from SSHclient import Credentials
+from SSHclient import NotAuthorizedError
+from SSHclient import ConnectError
+from SSHclient import load_private_key
+from SSHclient import connect
+from SSHclient.auth import parse_private_key
+from SSHclient.auth import clear_keys
+
+from paramiko import RSAKey
+from paramiko.ssh_exception import AuthenticationException
+from paramiko.ssh_exception import PasswordRequiredException
+from paramiko.ssh_exception import SSHException
+
+import os
+import shutil
+import tempfile
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+KEY = RSAKey.generate(1024)
+
+
+class TestAuth(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        self.directory = tempfile.mkdtemp()
+        self.key_filename = os.path.join(self.directory, 'id_rsa')
+        KEY.write_private_key_file(self.key_filename, password='secret')
+
+    def tearDown(self):
+        """
+        """
+        clear_keys()
+        shutil.rmtree(self.directory)
+
+    def test__parse_private_key_Should_ReturnKey_When_PassphraseCorrect(self, *patches):
+        self.assertEqual(parse_private_key(self.key_filename, passphrase='secret'), KEY)
+
+    def test__parse_private_key_Should_RaisePasswordRequired_When_PassphraseMissing(self, *patches):
+        with self.assertRaises(PasswordRequiredException):
+            parse_private_key(self.key_filename)
+
+    def test__parse_private_key_Should_RaiseSSHExceptionWithKeyError_When_PassphraseWrong(self, *patches):
+        with self.assertRaises(SSHException) as context:
+            parse_private_key(self.key_filename, passphrase='wrong')
+        self.assertIn('RSAKey: ', str(context.exception))
+
+    def test__load_private_key_Should_RaiseSSHException_When_KeyFileMissing(self, *patches):
+        with self.assertRaises(SSHException):
+            load_private_key(os.path.join(self.directory, 'missing'))
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_RaiseConnectError_When_KeyFileMissing(self, *patches):
+        credentials = Credentials(key_filename=os.path.join(self.directory, 'missing'))
+        with self.assertRaises(ConnectError):
+            connect('hostname', 'username', credentials, 5)
+
+    @patch('SSHclient.auth.parse_private_key', wraps=parse_private_key)
+    def test__load_private_key_Should_ParseOnce_When_FileUnchanged(self, parse_private_key_patch, *patches):
+        key = load_private_key(self.key_filename, passphrase='secret')
+        self.assertIs(load_private_key(self.key_filename, passphrase='secret'), key)
+        self.assertEqual(parse_private_key_patch.call_count, 1)
+
+        os.utime(self.key_filename, (0, 0))
+        self.assertEqual(load_private_key(self.key_filename, passphrase='secret'), key)
+        self.assertEqual(parse_private_key_patch.call_count, 2)
+
+    @patch('SSHclient.auth.get_agent_keys', return_value=['agent key1', 'agent key2'])
+    @patch('SSHclient.auth.load_private_key', return_value='key')
+    def test__get_methods_Should_ReturnMethodsInAuthOrder_When_Called(self, *patches):
+        credentials = Credentials(password='password', key_filename='id_rsa', allow_agent=True)
+        self.assertEqual(
+            credentials.get_methods(), [('key', 'key'), ('agent', 'agent key1'), ('agent', 'agent key2'), ('password', 'password')])
+
+        credentials = Credentials(password='password', key_filename='id_rsa', auth_order=['password', 'key', 'agent'])
+        self.assertEqual(credentials.get_methods(), [('password', 'password'), ('key', 'key')])
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_PassFirstMethodToConnect_When_CredentialsSpecified(self, ssh_client, *patches):
+        credentials = Credentials(password='password', key_filename=self.key_filename, passphrase='secret')
+        connect('server', 'username', credentials, 5)
+        ssh_client.return_value.connect.assert_called_once_with(
+            'server', port=22, username='username', timeout=5, pkey=KEY, allow_agent=False, look_for_keys=False)
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_TryRemainingMethods_When_FirstMethodFails(self, ssh_client, *patches):
+        ssh_mock = ssh_client.return_value
+        ssh_mock.connect.side_effect = AuthenticationException('key rejected')
+        transport_mock = ssh_mock.get_transport.return_value
+        transport_mock.is_active.return_value = True
+        transport_mock.is_authenticated.return_value = True
+
+        credentials = Credentials(password='password', key_filename=self.key_filename, passphrase='secret')
+        self.assertEqual(connect('server', 'username', credentials, 5), ssh_mock)
+        transport_mock.auth_password.assert_called_once_with('username', 'password')
+        self.assertFalse(ssh_mock.close.called)
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_RaiseNotAuthorizedError_When_AllMethodsFail(self, ssh_client, *patches):
+        ssh_mock = ssh_client.return_value
+        ssh_mock.connect.side_effect = AuthenticationException('password rejected')
+        transport_mock = ssh_mock.get_transport.return_value
+        transport_mock.is_active.return_value = True
+        transport_mock.auth_publickey.side_effect = AuthenticationException('key rejected')
+
+        credentials = Credentials(
+            password='password', key_filename=self.key_filename, passphrase='secret', auth_order=['password', 'key'])
+        with self.assertRaises(NotAuthorizedError):
+            connect('server', 'username', credentials, 5)
+        self.assertEqual(ssh_mock.connect.call_args[1]['password'], 'password')
+        transport_mock.auth_publickey.assert_called_once_with('username', KEY)
+        self.assertTrue(ssh_mock.close.called)
+
+    @patch('SSHclient.sshclient.paramiko.SSHClient')
+    def test__connect_Should_RaiseNotAuthorizedError_When_NoMethodsAvailable(self, ssh_client, *patches):
+        with self.assertRaises(NotAuthorizedError):
+            connect('server', 'username', Credentials(), 5)
+        self.assertFalse(ssh_client.return_value.connect.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__SSHclient_Should_PassCredentials_When_KeyFilenameSpecified(self, connect_patch, *patches):
+        SSHclient('server', 'username', 'password', key_filename='id_rsa', allow_agent=True)
+        credentials = connect_patch.call_args[0][2]
+        self.assertIsInstance(credentials, Credentials)
+        self.assertEqual((credentials.password, credentials.key_filename, credentials.allow_agent), ('password', 'id_rsa', True))
@@ -0,0 +1,254 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient import ResultCache
+from SSHclient import get_default_cache
+from SSHclient import set_default_cache
+from SSHclient import CancelToken
+from SSHclient import CommandTimeoutError
+from SSHclient import CommandCancelledError
+from SSHclient.sshclient import CommandDeadline
+
+import threading
+from time import time
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        set_default_cache(None)
+
+    def test__set_default_cache_Should_SetCache_When_Called(self, *patches):
+        self.assertIsNone(get_default_cache())
+        cache = ResultCache()
+        set_default_cache(cache)
+        self.assertIs(get_default_cache(), cache)
+
+    def test__get_Should_CallFunctionOnce_When_ResultCached(self, *patches):
+        cache = ResultCache()
+        function = Mock(return_value='result')
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result')
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result')
+        self.assertEqual(function.call_count, 1)
+
+    @patch('SSHclient.cache.time')
+    def test__get_Should_CallFunctionAgain_When_ResultExpired(self, time_patch, *patches):
+        cache = ResultCache(ttl=10)
+        function = Mock(side_effect=['result1', 'result2', 'result3'])
+        time_patch.return_value = 100
+        cache.get(('host1', 'user', 'uptime'), function)
+        time_patch.return_value = 109
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result1')
+        time_patch.return_value = 110
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result2')
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function, ttl=0), 'result2')
+
+    @patch('SSHclient.cache.time')
+    def test__get_Should_UseEntryTtl_When_TtlSpecified(self, time_patch, *patches):
+        cache = ResultCache(ttl=10)
+        function = Mock(side_effect=['result1', 'result2'])
+        time_patch.return_value = 100
+        cache.get(('host1', 'user', 'uptime'), function, ttl=60)
+        time_patch.return_value = 159
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result1')
+        time_patch.return_value = 160
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result2')
+
+    def test__get_Should_EvictLeastRecentlyUsed_When_MaxEntriesExceeded(self, *patches):
+        cache = ResultCache(max_entries=2)
+        cache.get(('host1', 'user', 'uptime'), Mock(return_value='result1'))
+        cache.get(('host2', 'user', 'uptime'), Mock(return_value='result2'))
+        cache.get(('host1', 'user', 'uptime'), Mock())
+        cache.get(('host3', 'user', 'uptime'), Mock(return_value='result3'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), Mock()), 'result1')
+        self.assertEqual(cache.get(('host2', 'user', 'uptime'), Mock(return_value='again')), 'again')
+
+    def test__get_Should_NotCache_When_FunctionRaises(self, *patches):
+        cache = ResultCache()
+        with self.assertRaises(ValueError):
+            cache.get(('host1', 'user', 'uptime'), Mock(side_effect=ValueError('failed')))
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), Mock(return_value='result')), 'result')
+
+    def test__get_Should_ShareExecution_When_ConcurrentRequests(self, *patches):
+        cache = ResultCache()
+        started = threading.Event()
+        finish = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            started.set()
+            finish.wait()
+            return 'result'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(('host1', 'user', 'uptime'), function))) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        finish.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 5)
+
+    def test__get_Should_RaiseInEveryWaiter_When_SharedExecutionRaises(self, *patches):
+        cache = ResultCache()
+        started = threading.Event()
+        finish = threading.Event()
+
+        def function():
+            started.set()
+            finish.wait()
+            raise ValueError('failed')
+
+        errors = []
+
+        def get():
+            try:
+                cache.get(('host1', 'user', 'uptime'), function)
+
+            except ValueError as exception:
+                errors.append(exception)
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        finish.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+
+    def test__get_Should_RaiseCommandTimeoutError_When_WaiterDeadlinePasses(self, *patches):
+        cache = ResultCache()
+        started = threading.Event()
+        finish = threading.Event()
+
+        def function():
+            started.set()
+            finish.wait()
+            return 'result'
+
+        leader = threading.Thread(target=cache.get, args=(('host1', 'user', 'uptime'), function))
+        leader.start()
+        started.wait()
+        start = time()
+        try:
+            with self.assertRaises(CommandTimeoutError):
+                cache.get(('host1', 'user', 'uptime'), function, deadline=CommandDeadline('uptime', command_timeout=.2))
+            self.assertLess(time() - start, 1)
+
+        finally:
+            finish.set()
+            leader.join()
+
+    def test__get_Should_RaiseCommandCancelledError_When_WaiterCancelled(self, *patches):
+        cache = ResultCache()
+        started = threading.Event()
+        finish = threading.Event()
+
+        def function():
+            started.set()
+            finish.wait()
+            return 'result'
+
+        leader = threading.Thread(target=cache.get, args=(('host1', 'user', 'uptime'), function))
+        leader.start()
+        started.wait()
+        cancel_token = CancelToken()
+        threading.Timer(.1, cancel_token.cancel).start()
+        try:
+            with self.assertRaises(CommandCancelledError):
+                cache.get(('host1', 'user', 'uptime'), function, deadline=CommandDeadline('uptime', cancel_token=cancel_token))
+
+        finally:
+            finish.set()
+            leader.join()
+
+    def test__get_Should_NotCache_When_NotCacheable(self, *patches):
+        cache = ResultCache()
+        function = Mock(return_value='result')
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function, cacheable=lambda result: False), 'result')
+        self.assertEqual(len(cache), 0)
+
+    def test__get_Should_ExecuteAgainInWaiter_When_SharedExecutionTimedOut(self, *patches):
+        cache = ResultCache()
+        started = threading.Event()
+        waiting = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(threading.current_thread())
+            if len(calls) == 1:
+                started.set()
+                waiting.wait(5)
+                while not leader_deadline.expired():
+                    pass
+                leader_deadline.check()
+            return 'result'
+
+        leader_deadline = CommandDeadline('uptime', command_timeout=.2)
+        errors = []
+
+        def lead():
+            try:
+                cache.get(('host1', 'user', 'uptime'), function, deadline=leader_deadline)
+
+            except CommandTimeoutError as exception:
+                errors.append(exception)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait()
+        waiting.set()
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'result')
+        leader.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test__invalidate_Should_ForgetMatchingResults_When_Called(self, *patches):
+        cache = ResultCache()
+        cache.get(('host1', 'user', 'uptime'), Mock(return_value='result'))
+        cache.get(('host1', 'user', 'puppet -V'), Mock(return_value='result'))
+        cache.get(('host2', 'user', 'uptime'), Mock(return_value='result'))
+        cache.invalidate(hostname='host1', command='uptime')
+        self.assertEqual(len(cache), 2)
+        cache.invalidate(hostname='host1')
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test__invalidate_Should_NotCacheResult_When_InvalidatedWhileExecuting(self, *patches):
+        cache = ResultCache()
+
+        def function():
+            cache.invalidate(hostname='host1')
+            return 'stale'
+
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), function), 'stale')
+        self.assertEqual(cache.get(('host1', 'user', 'uptime'), Mock(return_value='fresh')), 'fresh')
@@ -0,0 +1,54 @@
+import unittest
+from mock import Mock
+
+from SSHclient import CancelToken
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestCancel(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__cancel_Should_CloseRegisteredChannels_When_Called(self, *patches):
+        cancel_token = CancelToken()
+        channel = Mock()
+        cancel_token.register(channel)
+        self.assertFalse(cancel_token.cancelled)
+        cancel_token.cancel()
+        self.assertTrue(cancel_token.cancelled)
+        self.assertTrue(channel.close.called)
+
+    def test__cancel_Should_NotCloseUnregisteredChannels_When_Called(self, *patches):
+        cancel_token = CancelToken()
+        channel = Mock()
+        cancel_token.register(channel)
+        cancel_token.unregister(channel)
+        cancel_token.cancel()
+        self.assertFalse(channel.close.called)
+
+    def test__register_Should_CloseChannelAtOnce_When_AlreadyCancelled(self, *patches):
+        cancel_token = CancelToken()
+        cancel_token.cancel()
+        channel = Mock()
+        cancel_token.register(channel)
+        self.assertTrue(channel.close.called)
+        self.assertEqual(cancel_token.channels, set())
@@ -0,0 +1,108 @@
+import unittest
+from mock import patch
+
+from SSHclient import HostResult
+from SSHclient import Credentials
+from SSHclient.cli import main
+from SSHclient.cli import read_hosts
+
+import json
+import os
+import subprocess
+import tempfile
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__read_hosts_Should_SkipBlankLinesAndComments_When_Called(self, *patches):
+        self.assertEqual(read_hosts(['host1\n', '\n', '# rack 2\n', ' host2  # spare\n']), ['host1', 'host2'])
+
+    @patch('SSHclient.cli.sys.stdout')
+    @patch('SSHclient.fleet.execute_fleet')
+    def test__main_Should_PrintJsonLinePerHostAndReturnZero_When_AllHostsSucceed(self, execute_fleet_patch, stdout_patch, *patches):
+        execute_fleet_patch.return_value = iter([
+            HostResult('host2', 'success', output=['3.7.2\n'], elapsed=1.5),
+            HostResult('host1', 'success', output=['3.7.2\n'], elapsed=2.5)])
+        result = main(['puppet -V', 'host1', 'host2', '-u', 'user', '-p', 'password', '-s', '3.7.2', '-d', '.a.com', '.b.com', '-w', '50'])
+        self.assertEqual(result, 0)
+        args, kwargs = execute_fleet_patch.call_args
+        self.assertEqual(args, (['host1', 'host2'], 'user', 'password', 'puppet -V'))
+        self.assertEqual(kwargs['success_responses'], ['3.7.2'])
+        self.assertEqual(kwargs['domains'], ['.a.com', '.b.com'])
+        self.assertEqual(kwargs['max_workers'], 50)
+        self.assertIsNone(kwargs['governor'])
+        lines = [json.loads(call[0][0]) for call in stdout_patch.write.call_args_list]
+        self.assertEqual(lines[0], {'hostname': 'host2', 'status': 'success', 'output': '3.7.2\n', 'error': None, 'elapsed': 1.5})
+        self.assertEqual(lines[1]['hostname'], 'host1')
+
+    @patch('SSHclient.cli.sys.stdout')
+    @patch('SSHclient.fleet.execute_fleet')
+    def test__main_Should_ReturnOne_When_AnyHostFails(self, execute_fleet_patch, stdout_patch, *patches):
+        execute_fleet_patch.return_value = iter([
+            HostResult('host1', 'success', output=[]), HostResult('host2', 'connect_timeout', error='timed out')])
+        self.assertEqual(main(['uptime', 'host1', 'host2', '-p', 'password']), 1)
+
+    @patch('SSHclient.cli.sys.stdout')
+    @patch('SSHclient.fleet.execute_fleet')
+    def test__main_Should_ReadHostsFile_When_HostsFileSpecified(self, execute_fleet_patch, *patches):
+        execute_fleet_patch.return_value = iter([])
+        with tempfile.NamedTemporaryFile() as hosts_file:
+            hosts_file.write('host2\n# host3\nhost4\n')
+            hosts_file.flush()
+            main(['uptime', 'host1', '-f', hosts_file.name, '-p', 'password'])
+        self.assertEqual(execute_fleet_patch.call_args[0][0], ['host1', 'host2', 'host4'])
+
+    @patch('SSHclient.cli.sys.stdout')
+    @patch('SSHclient.fleet.execute_fleet')
+    def test__main_Should_PassCredentials_When_KeyFilenameSpecified(self, execute_fleet_patch, *patches):
+        execute_fleet_patch.return_value = iter([])
+        main(['uptime', 'host1', '-i', '~/.ssh/id_rsa', '--allow-agent', '--governor'])
+        args, kwargs = execute_fleet_patch.call_args
+        self.assertIsInstance(args[2], Credentials)
+        self.assertEqual(args[2].key_filename, '~/.ssh/id_rsa')
+        self.assertTrue(args[2].allow_agent)
+        self.assertIsNotNone(kwargs['governor'])
+
+    @patch('SSHclient.cli.getpass.getpass', return_value='secret')
+    @patch('SSHclient.cli.sys.stdout')
+    @patch('SSHclient.fleet.execute_fleet')
+    def test__main_Should_PromptForPassword_When_NoPasswordOrKey(self, execute_fleet_patch, stdout_patch, getpass_patch, *patches):
+        execute_fleet_patch.return_value = iter([])
+        with patch.dict('os.environ', clear=True):
+            main(['uptime', 'host1', '-u', 'user'])
+        self.assertEqual(execute_fleet_patch.call_args[0][2], 'secret')
+
+    @patch('SSHclient.cli.argparse.ArgumentParser.exit', side_effect=SystemExit)
+    @patch('SSHclient.cli.sys.stderr')
+    def test__main_Should_Exit_When_NoHosts(self, *patches):
+        with self.assertRaises(SystemExit):
+            main(['uptime'])
+
+    def test__main_Should_NotImportParamiko_When_HelpRequested(self, *patches):
+        import SSHclient
+        path = os.path.dirname(os.path.dirname(os.path.abspath(SSHclient.__file__)))
+        script = 'import sys\nfrom SSHclient.cli import main\ntry:\n    main(["--help"])\nexcept SystemExit:\n    pass\nprint "paramiko" in sys.modules\n'
+        output = subprocess.check_output([sys.executable, '-c', script], env=dict(os.environ, PYTHONPATH=path))
+        self.assertEqual(output.splitlines()[-1], 'False')
@@ -0,0 +1,191 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient import execute_fleet
+from SSHclient import execute_host
+from SSHclient import HostResult
+from SSHclient import ConnectError
+from SSHclient import ExecuteError
+from SSHclient import TimeOutError
+from SSHclient import NotAuthorizedError
+from SSHclient import UnknownHostError
+from SSHclient import CommandTimeoutError
+from SSHclient import CommandCancelledError
+from SSHclient import CancelToken
+from SSHclient.fleet import get_status
+
+from socket import error as socket_error
+import os
+import threading
+import time
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+def get_host_result(hostname, **kwargs):
+    return HostResult(hostname, 'success', output=[str(os.getpid())])
+
+
+def exit_shard(index, hosts, results, fleet_arguments):
+    if index:
+        os._exit(3)
+    for hostname in hosts:
+        results.put((index, HostResult(hostname, 'success')))
+    results.put((index, None))
+    results.close()
+    results.join_thread()
+
+
+def hang_shard(index, hosts, results, fleet_arguments):
+    time.sleep(60)
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__get_status_Should_ReturnMostSpecificStatus_When_Called(self, *patches):
+        self.assertEqual(get_status(TimeOutError('error')), 'timeout')
+        self.assertEqual(get_status(NotAuthorizedError('error')), 'not_authorized')
+        self.assertEqual(get_status(UnknownHostError('error')), 'unknown_host')
+        self.assertEqual(get_status(ConnectError('error')), 'connect_error')
+        self.assertEqual(get_status(ExecuteError('error')), 'execute_error')
+        self.assertEqual(get_status(CommandTimeoutError('error')), 'command_timeout')
+        self.assertEqual(get_status(CommandCancelledError('error')), 'cancelled')
+        self.assertEqual(get_status(socket_error('error')), 'error')
+
+    @patch('SSHclient.fleet.SSHclient')
+    def test__execute_host_Should_ReturnSuccessResult_When_ExecuteSucceeds(self, ssh_client, *patches):
+        client_mock = Mock()
+        client_mock.execute.return_value = ['output']
+        ssh_client.return_value = client_mock
+
+        result = execute_host('host1', 'username', 'password', 'command', success_responses=['output'], expected_exit_code=1)
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.output, ['output'])
+        client_mock.execute.assert_called_once_with(
+            'command', send_input=None, success_responses=['output'], expected_exit_code=1, command_timeout=None, cancel_token=None)
+        self.assertTrue(client_mock.close.called)
+
+    @patch('SSHclient.fleet.SSHclient')
+    def test__execute_host_Should_ReturnTimeoutResult_When_ConnectTimesOut(self, ssh_client, *patches):
+        ssh_client.side_effect = TimeOutError('timed out')
+
+        result = execute_host('host1', 'username', 'password', 'command')
+        self.assertEqual(result.status, 'timeout')
+        self.assertEqual(result.error, 'timed out')
+        self.assertFalse(result.succeeded)
+
+    @patch('SSHclient.fleet.SSHclient')
+    def test__execute_host_Should_ReturnExecuteErrorResultAndClose_When_ExecuteRaisesExecuteError(self, ssh_client, *patches):
+        client_mock = Mock()
+        client_mock.execute.side_effect = ExecuteError('exit code: 1')
+        ssh_client.return_value = client_mock
+
+        result = execute_host('host1', 'username', 'password', 'command')
+        self.assertEqual(result.status, 'execute_error')
+        self.assertTrue(client_mock.close.called)
+
+    @patch('SSHclient.fleet.execute_host')
+    def test__execute_fleet_Should_YieldResultForEachHost_When_Called(self, execute_host_patch, *patches):
+        execute_host_patch.side_effect = lambda hostname, **kwargs: HostResult(hostname, 'success')
+
+        results = list(execute_fleet(['host{}'.format(index) for index in range(10)], 'username', 'password', 'command', max_workers=3))
+        self.assertEqual(sorted(result.hostname for result in results), sorted('host{}'.format(index) for index in range(10)))
+
+    @patch('SSHclient.fleet.execute_host')
+    def test__execute_fleet_Should_YieldResultsAsTheyComplete_When_Called(self, execute_host_patch, *patches):
+        release_slow = threading.Event()
+
+        def execute_host_side_effect(hostname, **kwargs):
+            if hostname == 'slow':
+                release_slow.wait(5)
+            return HostResult(hostname, 'success')
+
+        execute_host_patch.side_effect = execute_host_side_effect
+        results = execute_fleet(['slow', 'fast'], 'username', 'password', 'command', max_workers=2)
+        self.assertEqual(next(results).hostname, 'fast')
+        release_slow.set()
+        self.assertEqual(next(results).hostname, 'slow')
+
+    @patch('SSHclient.fleet.execute_host')
+    def test__execute_fleet_Should_PassExecuteOptions_When_Called(self, execute_host_patch, *patches):
+        execute_host_patch.return_value = HostResult('host1', 'success')
+
+        list(execute_fleet(['host1'], 'username', 'password', 'command', send_input='YES', success_responses=['done'], domains=['.intel.com']))
+        execute_host_patch.assert_called_once_with(
+            'host1', username='username', password='password', command='command', send_input='YES', success_responses=['done'],
+            expected_exit_code=None, timeout=None, domains=['.intel.com'], set_missing_host_key_policy=True, port=None, profile=None,
+            command_timeout=None, cancel_token=None, governor=None)
+
+    @patch('SSHclient.fleet.execute_host', side_effect=get_host_result)
+    def test__execute_fleet_Should_ShardHostsAcrossProcesses_When_ProcessesSpecified(self, *patches):
+        hosts = ['host{}'.format(index) for index in range(10)]
+        results = list(execute_fleet(hosts, 'username', 'password', 'command', max_workers=2, processes=3))
+        self.assertEqual(sorted(result.hostname for result in results), sorted(hosts))
+        pids = set(result.output[0] for result in results)
+        self.assertEqual(len(pids), 3)
+        self.assertNotIn(str(os.getpid()), pids)
+
+    @patch('SSHclient.fleet.WORKER_POLL_INTERVAL', .05)
+    @patch('SSHclient.fleet.execute_shard', side_effect=exit_shard)
+    def test__execute_fleet_Should_YieldErrorResults_When_WorkerProcessDies(self, *patches):
+        results = list(execute_fleet(['host1', 'host2', 'host3', 'host4'], 'username', 'password', 'command', processes=2))
+        statuses = dict((result.hostname, result.status) for result in results)
+        self.assertEqual(statuses, {'host1': 'success', 'host3': 'success', 'host2': 'error', 'host4': 'error'})
+        self.assertIn('exited with 3', [result.error for result in results if result.hostname == 'host2'][0])
+
+    @patch('SSHclient.fleet.SSHclient')
+    def test__execute_host_Should_NotConnect_When_Cancelled(self, ssh_client, *patches):
+        cancel_token = CancelToken()
+        cancel_token.cancel()
+        result = execute_host('host1', 'username', 'password', 'command', cancel_token=cancel_token)
+        self.assertEqual(result.status, 'cancelled')
+        self.assertFalse(ssh_client.called)
+
+    @patch('SSHclient.fleet.SSHclient')
+    def test__execute_host_Should_ConnectThroughGovernor_When_GovernorSpecified(self, ssh_client, *patches):
+        governor = Mock()
+        result = execute_host('host1', 'username', 'password', 'command', domains=['.intel.com'], governor=governor)
+        self.assertTrue(result.succeeded)
+        self.assertEqual(ssh_client.call_args[1]['governor'], governor)
+        self.assertEqual(ssh_client.call_args[1]['domains'], ['.intel.com'])
+
+    @patch('SSHclient.fleet.WORKER_POLL_INTERVAL', .05)
+    @patch('SSHclient.fleet.execute_shard', side_effect=hang_shard)
+    def test__execute_fleet_Should_TerminateWorkersAndYieldCancelled_When_CancelledWhileSharded(self, *patches):
+        cancel_token = CancelToken()
+        threading.Timer(.2, cancel_token.cancel).start()
+        start = time.time()
+        results = list(execute_fleet(['host1', 'host2'], 'username', 'password', 'command', processes=2, cancel_token=cancel_token))
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(sorted((result.hostname, result.status) for result in results), [('host1', 'cancelled'), ('host2', 'cancelled')])
+
+    @patch('SSHclient.fleet.execute_sharded')
+    def test__execute_fleet_Should_PassFleetArguments_When_ProcessesSpecified(self, execute_sharded_patch, *patches):
+        execute_sharded_patch.return_value = iter([HostResult('host1', 'success')])
+        list(execute_fleet(['host1'], 'username', 'password', 'command', timeout=5, processes=4))
+        execute_sharded_patch.assert_called_once_with(['host1'], 4, {
+            'username': 'username', 'password': 'password', 'command': 'command', 'send_input': None,
+            'success_responses': None, 'expected_exit_code': None, 'timeout': 5, 'domains': None,
+            'set_missing_host_key_policy': True, 'max_workers': 32, 'port': None, 'profile': None, 'command_timeout': None,
+            'governor': None}, cancel_token=None)
@@ -0,0 +1,152 @@
+import unittest
+from mock import patch
+
+from SSHclient import ConcurrencyGovernor
+from SSHclient import TimeOutError
+from SSHclient import NotAuthorizedError
+from SSHclient import UnknownHostError
+from SSHclient import ExecuteError
+from SSHclient import ConnectError
+from SSHclient import connect
+from SSHclient.governor import get_key
+from SSHclient.governor import is_congestion
+
+import socket
+import threading
+from time import sleep
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestGovernor(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__get_key_Should_ReturnSubnet_When_Address(self, *patches):
+        self.assertEqual(get_key('10.1.2.3'), '10.1.2.0/24')
+
+    def test__get_key_Should_ReturnDomainSuffix_When_Hostname(self, *patches):
+        self.assertEqual(get_key('host1.site1.company.com'), 'site1.company.com')
+        self.assertEqual(get_key('host1'), '')
+
+    def test__is_congestion_Should_ReturnTrue_When_ConnectFailedUnderLoad(self, *patches):
+        self.assertTrue(is_congestion(TimeOutError('error')))
+        self.assertTrue(is_congestion(NotAuthorizedError('error')))
+        self.assertFalse(is_congestion(UnknownHostError('error')))
+        self.assertFalse(is_congestion(ExecuteError('error')))
+
+    @patch('SSHclient.governor.time', return_value=100)
+    def test__release_Should_DoubleLimitPerRound_When_SlowStart(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=2)
+        for _ in range(2):
+            key, start = governor.acquire('host.site.com')
+            governor.release(key, start)
+        self.assertEqual(governor.get_limit('site.com'), 4)
+
+    def test__release_Should_HalveLimitOncePerRound_When_ConnectsTimeOut(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=8)
+        slots = [governor.acquire('host.site.com') for _ in range(8)]
+        for key, start in slots:
+            governor.release(key, start, TimeOutError('timed out'))
+        self.assertEqual(governor.get_limit('site.com'), 4)
+
+    @patch('SSHclient.governor.time', return_value=100)
+    def test__release_Should_GrowLimitAdditively_When_AfterCongestion(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=8)
+        key, start = governor.acquire('host.site.com')
+        governor.release(key, start, TimeOutError('timed out'))
+        # each success adds 1 / limit so a round of about limit successes adds one
+        for _ in range(5):
+            key, start = governor.acquire('host.site.com')
+            governor.release(key, start)
+        self.assertEqual(governor.get_limit('site.com'), 5)
+
+    def test__release_Should_NotReduceBelowMinLimit_When_RepeatedCongestion(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=2, min_limit=1)
+        for _ in range(5):
+            key, start = governor.acquire('host.site.com')
+            sleep(.001)
+            governor.release(key, start, NotAuthorizedError('throttled'))
+        self.assertEqual(governor.get_limit('site.com'), 1)
+
+    def test__run_Should_HalveLimit_When_ConnectRefused(self, *patches):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        # the port is closed so connecting to it is refused
+        listener.close()
+        governor = ConcurrencyGovernor(initial_limit=4)
+        with self.assertRaises(ConnectError):
+            governor.run('127.0.0.1', lambda: connect('127.0.0.1', 'username', 'password', 5, port=port))
+        self.assertEqual(governor.get_limit('127.0.0.0/24'), 2)
+
+    def test__release_Should_KeepLimit_When_UnknownHost(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=4)
+        key, start = governor.acquire('host.site.com')
+        governor.release(key, start, UnknownHostError('unknown'))
+        self.assertEqual(governor.get_limit('site.com'), 4)
+
+    @patch('SSHclient.governor.time')
+    def test__release_Should_NotGrowLimit_When_ConnectSlow(self, time_patch, *patches):
+        governor = ConcurrencyGovernor(initial_limit=4)
+        for elapsed in [1, 10]:
+            time_patch.return_value = 0
+            key, start = governor.acquire('host.site.com')
+            time_patch.return_value = elapsed
+            governor.release(key, start)
+        self.assertEqual(governor.get_limit('site.com'), 5)
+
+    def test__acquire_Should_KeepLimitsPerKey_When_Called(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=2)
+        key, start = governor.acquire('10.0.0.1')
+        governor.release(key, start, TimeOutError('timed out'))
+        self.assertEqual(governor.get_limit('10.0.0.0/24'), 1)
+        self.assertEqual(governor.get_limit('10.0.1.0/24'), 2)
+
+    def test__run_Should_LimitConnectsInFlight_When_Called(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=2, max_limit=2)
+        lock = threading.Lock()
+        counts = {'active': 0, 'peak': 0}
+
+        def connect():
+            with lock:
+                counts['active'] += 1
+                counts['peak'] = max(counts['peak'], counts['active'])
+            sleep(.01)
+            with lock:
+                counts['active'] -= 1
+
+        threads = [threading.Thread(target=governor.run, args=('host.site.com', connect)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counts['peak'], 2)
+
+    def test__run_Should_RecordFailureAndRaise_When_ConnectFails(self, *patches):
+        governor = ConcurrencyGovernor(initial_limit=4)
+
+        def connect():
+            raise TimeOutError('timed out')
+
+        with self.assertRaises(TimeOutError):
+            governor.run('host.site.com', connect)
+        self.assertEqual(governor.get_limit('site.com'), 2)
@@ -0,0 +1,94 @@
+import unittest
+from mock import patch
+
+from SSHclient import LatencyCollector
+from SSHclient import PhaseEvent
+from SSHclient import add_listener
+from SSHclient import remove_listener
+from SSHclient.instrument import emit
+from SSHclient.instrument import get_percentile
+
+import json
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    @patch('SSHclient.instrument.time', return_value=12.5)
+    def test__emit_Should_PassPhaseEventToListeners_When_ListenerAttached(self, *patches):
+        events = []
+        add_listener(events.append)
+        try:
+            emit('host1', 'handshake', 10, command='uptime')
+
+        finally:
+            remove_listener(events.append)
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0].hostname, events[0].phase, events[0].start, events[0].elapsed, events[0].command), ('host1', 'handshake', 10, 2.5, 'uptime'))
+
+    @patch('SSHclient.instrument.PhaseEvent')
+    def test__emit_Should_DoNothing_When_NoListenerAttached(self, phase_event, *patches):
+        emit('host1', 'handshake', 10)
+        self.assertFalse(phase_event.called)
+
+    def test__emit_Should_CallRemainingListeners_When_ListenerRaises(self, *patches):
+        def failing_listener(event):
+            raise ValueError('listener error')
+
+        events = []
+        add_listener(failing_listener)
+        add_listener(events.append)
+        try:
+            emit('host1', 'dns', 0)
+
+        finally:
+            remove_listener(failing_listener)
+            remove_listener(events.append)
+        self.assertEqual(len(events), 1)
+
+    def test__get_percentile_Should_ReturnNearestRank_When_Called(self, *patches):
+        samples = range(1, 101)
+        self.assertEqual(get_percentile(samples, 50), 50)
+        self.assertEqual(get_percentile(samples, 95), 95)
+        self.assertEqual(get_percentile(samples, 99), 99)
+        self.assertEqual(get_percentile([7], 99), 7)
+        self.assertIsNone(get_percentile([], 50))
+
+    def test__LatencyCollector_Should_SummarizePhases_When_EventsCollected(self, *patches):
+        collector = LatencyCollector()
+        for elapsed in range(1, 101):
+            collector(PhaseEvent('host1', 'handshake', 0, elapsed / 100.0))
+        collector(PhaseEvent('host1', 'dns', 0, .5))
+
+        summary = collector.summary()
+        self.assertEqual(sorted(summary), ['dns', 'handshake'])
+        self.assertEqual(summary['handshake']['count'], 100)
+        self.assertEqual(summary['handshake']['p50'], .5)
+        self.assertEqual(summary['handshake']['p95'], .95)
+        self.assertEqual(summary['handshake']['max'], 1.0)
+        self.assertEqual(summary['dns']['p99'], .5)
+        self.assertEqual(json.loads(collector.to_json()), summary)
+
+        collector.reset()
+        self.assertEqual(collector.summary(), {})
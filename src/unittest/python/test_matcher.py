@@ -0,0 +1,105 @@
+import unittest
+from mock import patch
+
+from SSHclient.matcher import compile_success_responses
+from SSHclient.matcher import compile_literals
+from SSHclient.matcher import split_success_responses
+from SSHclient.matcher import SuccessMatcher
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestMatcher(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__split_success_responses_Should_ReturnLiteralsAndRegexes_When_Called(self, *patches):
+        result = split_success_responses(['3.7.2', 14.04, '{regex}.*check=[0-9]*.*'])
+        self.assertEqual(result, (['3.7.2', '14.04'], ['.*check=[0-9]*.*']))
+
+    def test__compile_literals_Should_MatchEveryLiteral_When_LiteralsSharePrefixes(self, *patches):
+        literals = ['3.7.2', '3.7.20', '3.8', '4.8.4', 'a.b', 'a']
+        regex = compile_literals(literals)
+        for literal in literals:
+            self.assertEqual(regex.search('version {} installed'.format(literal)).group(), literal)
+        self.assertIsNone(regex.search('version 4.8.5 is current'))
+
+    def test__compile_literals_Should_MatchLongLiterals_When_LongerThanRecursionLimit(self, *patches):
+        block = ''.join('interface eth{}\n mtu 9000\n'.format(index) for index in range(100))
+        regex = compile_literals(['x' * 1500, block, 'short'])
+        self.assertTrue(regex.search('y' + 'x' * 2000))
+        self.assertTrue(regex.search('config\n' + block + 'end\n'))
+        self.assertTrue(regex.search('a short one'))
+        self.assertFalse(regex.search('x' * 1499))
+        self.assertTrue(compile_success_responses(['x' * 1500]).check('x' * 2000))
+
+    def test__compile_literals_Should_EscapeRegexCharacters_When_Called(self, *patches):
+        regex = compile_literals(['[yes/no]', 'a.c'])
+        self.assertIsNone(regex.search('y abc'))
+        self.assertTrue(regex.search('continue? [yes/no]'))
+
+    def test__check_Should_ReturnTrue_When_LiteralFound(self, *patches):
+        matcher = SuccessMatcher(['emilio', 'reyes', 'some contents'])
+        self.assertTrue(matcher.check('this is some contents'))
+        self.assertFalse(matcher.check('this is other stuff'))
+
+    def test__check_Should_MatchRegexFromStartOfContents_When_Regex(self, *patches):
+        matcher = SuccessMatcher(['{regex}items=[1-9]', '{regex}.*cached=[1-9]'])
+        self.assertFalse(SuccessMatcher(['{regex}items=[1-9]']).check('some items=1'))
+        self.assertTrue(matcher.check('some\nitems=0 cached=2'))
+
+    def test__stream_Should_FindLiteral_When_SplitAcrossChunks(self, *patches):
+        stream = SuccessMatcher(['[yes/no]']).stream()
+        self.assertFalse(stream.feed('Are you sure? [ye'))
+        self.assertTrue(stream.feed('s/no]: '))
+
+    def test__stream_Should_OnlyKeepPossiblePartialLiteral_When_LiteralNotFound(self, *patches):
+        stream = SuccessMatcher(['Password:', 'ok']).stream()
+        stream.feed('x' * 10000)
+        self.assertEqual(stream.tail, 'x' * (len('Password:') - 1))
+
+    def test__stream_Should_MatchRegexAgainstEachLine_When_Regex(self, *patches):
+        stream = SuccessMatcher(['{regex}.*items=[1-9][0-9]* cached=[1-9][0-9]*']).stream()
+        self.assertFalse(stream.feed('items=0 cached=0\nitems=1'))
+        self.assertEqual(stream.line, 'items=1')
+        self.assertTrue(stream.feed('2 cached=12\n'))
+
+    def test__stream_Should_BoundUnterminatedLine_When_Regex(self, *patches):
+        stream = SuccessMatcher(['{regex}never']).stream()
+        stream.feed('x' * 100000)
+        self.assertLessEqual(len(stream.line), 4096)
+
+    def test__compile_success_responses_Should_ReturnCachedMatcher_When_SameSuccessResponses(self, *patches):
+        first = compile_success_responses(['3.7.2', '4.8.4'])
+        second = compile_success_responses(['3.7.2', '4.8.4'])
+        self.assertIs(first, second)
+        self.assertIsNot(first, compile_success_responses(['3.7.2']))
+
+    @patch('SSHclient.matcher.CACHE_SIZE', 2)
+    def test__compile_success_responses_Should_EvictLeastRecentlyUsed_When_CacheFull(self, *patches):
+        from SSHclient.matcher import _cache
+        _cache.clear()
+        first = compile_success_responses(['lru1'])
+        compile_success_responses(['lru2'])
+        compile_success_responses(['lru1'])
+        compile_success_responses(['lru3'])
+        self.assertIs(compile_success_responses(['lru1']), first)
+        self.assertNotIn(('lru2',), _cache)
@@ -0,0 +1,97 @@
+import unittest
+from mock import patch
+
+from SSHclient import OutputSink
+from SSHclient import CapturedOutput
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+def get_sink_output(threshold, chunks):
+    sink = OutputSink(threshold=threshold)
+    for chunk in chunks:
+        sink.write(chunk)
+    return sink, sink.result()
+
+
+class TestOutput(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__write_Should_KeepInMemory_When_BelowThreshold(self, *patches):
+        sink, output = get_sink_output(100, ['line1\n', 'line2\n'])
+        self.assertIsNone(sink.file)
+        self.assertEqual(output.buffer, 'line1\nline2\n')
+
+    def test__write_Should_SpillToFile_When_ThresholdExceeded(self, *patches):
+        sink, output = get_sink_output(8, ['line1\n', 'line2\n', 'line3'])
+        self.assertIsNotNone(sink.file)
+        self.assertEqual(sink.chunks, [])
+        self.assertEqual(output.read(), 'line1\nline2\nline3')
+        output.close()
+
+    def test__write_Should_EncodeUnicode_When_UnicodeWritten(self, *patches):
+        sink, output = get_sink_output(100, [u'caf\xe9\n'])
+        self.assertEqual(output.read(), 'caf\xc3\xa9\n')
+
+    def test__result_Should_ReturnEmptyOutput_When_NothingWritten(self, *patches):
+        sink, output = get_sink_output(100, [])
+        self.assertEqual(len(output), 0)
+        self.assertEqual(list(output), [])
+
+    def test__CapturedOutput_Should_IndexLines_When_Accessed(self, *patches):
+        for threshold in [1000, 1]:
+            sink, output = get_sink_output(threshold, ['line1\nli', 'ne2\n', 'line3'])
+            self.assertEqual(len(output), 3)
+            self.assertEqual(output[0], 'line1\n')
+            self.assertEqual(output[1], 'line2\n')
+            self.assertEqual(output[-1], 'line3')
+            self.assertEqual(list(output), ['line1\n', 'line2\n', 'line3'])
+            with self.assertRaises(IndexError):
+                output[3]
+            output.close()
+
+    def test__CapturedOutput_Should_NotIndexLines_When_Iterated(self, *patches):
+        output = CapturedOutput('line1\nline2\n')
+        self.assertEqual([line for line in output], ['line1\n', 'line2\n'])
+        self.assertIsNone(output._offsets)
+
+    def test__CapturedOutput_Should_SearchBuffer_When_Spilled(self, *patches):
+        sink, output = get_sink_output(4, ['puppet version ', '3.7.2\n', 'items=12\n'])
+        with output:
+            self.assertEqual(output.find('3.7.2'), len('puppet version '))
+            self.assertEqual(output.search('items=([0-9]+)').group(1), '12')
+            self.assertTrue(output.check_success_responses(['4.8.4', '3.7.2']))
+            self.assertTrue(output.check_success_responses(['{regex}.*items=[1-9]']))
+            self.assertFalse(output.check_success_responses(['4.8.4']))
+        self.assertIsNone(output.file)
+
+    @patch('SSHclient.output.DECODE_BLOCK_SIZE', 8)
+    def test__decode_lines_Should_DecodeLinesAcrossBlocks_When_Called(self, *patches):
+        data = u'caf\xe9\nna\xefve\r\n' + u'x' * 20 + u'\n\u2603 end'
+        expected_result = [u'caf\xe9\n', u'na\xefve\r\n', u'x' * 20 + u'\n', u'\u2603 end']
+        self.assertEqual(CapturedOutput(data.encode('utf-8')).decode_lines(), expected_result)
+        sink, output = get_sink_output(4, [data[:10].encode('utf-8'), data[10:].encode('utf-8')])
+        with output:
+            self.assertEqual(output.decode_lines(), expected_result)
+
+    def test__decode_lines_Should_ReturnEmptyList_When_OutputEmpty(self, *patches):
+        self.assertEqual(CapturedOutput('').decode_lines(), [])
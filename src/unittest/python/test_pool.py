@@ -0,0 +1,166 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient import ConnectionPool
+from SSHclient import ConnectError
+from SSHclient import get_default_pool
+from SSHclient import set_default_pool
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+def get_ssh_mock(active=True, channels=0):
+    ssh_mock = Mock()
+    ssh_mock.get_transport.return_value.is_active.return_value = active
+    ssh_mock.get_transport.return_value._channels = [Mock()] * channels
+    return ssh_mock
+
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        set_default_pool(None)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_Connect_When_NotPooled(self, connect, *patches):
+        ssh_mock = get_ssh_mock()
+        connect.return_value = ssh_mock
+        pool = ConnectionPool()
+        result = pool.acquire('host1', 'username', 'password', 5, port=2222)
+        self.assertEqual(result, ssh_mock)
+        connect.assert_called_once_with('host1', 'username', 'password', 5, set_missing_host_key_policy=False, port=2222, profile=None)
+        self.assertIn(('host1', 'username', 2222), pool.connections)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_ReuseConnection_When_PooledAndAlive(self, connect, *patches):
+        connect.return_value = get_ssh_mock()
+        pool = ConnectionPool()
+        first = pool.acquire('host1', 'username', 'password', 5)
+        pool.release(first)
+        second = pool.acquire('host1', 'username', 'password', 5)
+        self.assertIs(first, second)
+        self.assertEqual(connect.call_count, 1)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_KeyOnUsernameAndPort_When_Called(self, connect, *patches):
+        connect.side_effect = lambda *args, **kwargs: get_ssh_mock()
+        pool = ConnectionPool()
+        pool.acquire('host1', 'username', 'password', 5)
+        pool.acquire('host1', 'other', 'password', 5)
+        pool.acquire('host1', 'username', 'password', 5, port=2222)
+        self.assertEqual(connect.call_count, 3)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_Reconnect_When_PooledConnectionDead(self, connect, *patches):
+        dead_mock = get_ssh_mock(active=False)
+        alive_mock = get_ssh_mock()
+        connect.side_effect = [dead_mock, alive_mock]
+        pool = ConnectionPool()
+        pool.release(pool.acquire('host1', 'username', 'password', 5))
+        result = pool.acquire('host1', 'username', 'password', 5)
+        self.assertIs(result, alive_mock)
+        self.assertTrue(dead_mock.close.called)
+
+    @patch('SSHclient.pool.time')
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_EvictIdleConnections_When_IdleTimeoutExceeded(self, connect, time_patch, *patches):
+        idle_mock = get_ssh_mock()
+        connect.side_effect = [idle_mock, get_ssh_mock()]
+        time_patch.return_value = 100
+        pool = ConnectionPool(idle_timeout=60)
+        pool.release(pool.acquire('host1', 'username', 'password', 5))
+        time_patch.return_value = 161
+        pool.acquire('host2', 'username', 'password', 5)
+        self.assertTrue(idle_mock.close.called)
+        self.assertNotIn(('host1', 'username', 22), pool.connections)
+
+    @patch('SSHclient.pool.time')
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_EvictIdleConnections_When_NeverReleased(self, connect, time_patch, *patches):
+        idle_mock = get_ssh_mock()
+        connect.side_effect = [idle_mock, get_ssh_mock()]
+        time_patch.return_value = 100
+        pool = ConnectionPool(idle_timeout=60)
+        pool.acquire('host1', 'username', 'password', 5)
+        time_patch.return_value = 161
+        pool.acquire('host2', 'username', 'password', 5)
+        self.assertTrue(idle_mock.close.called)
+
+    @patch('SSHclient.pool.time')
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_NotEvictIdleConnections_When_ChannelsOpen(self, connect, time_patch, *patches):
+        ssh_mock = get_ssh_mock(channels=1)
+        connect.side_effect = [ssh_mock, get_ssh_mock()]
+        time_patch.return_value = 100
+        pool = ConnectionPool(idle_timeout=60)
+        pool.acquire('host1', 'username', 'password', 5)
+        time_patch.return_value = 161
+        pool.acquire('host2', 'username', 'password', 5)
+        self.assertFalse(ssh_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_EvictLeastRecentlyUsed_When_MaxSizeReached(self, connect, *patches):
+        host1_mock = get_ssh_mock()
+        host2_mock = get_ssh_mock()
+        connect.side_effect = [host1_mock, host2_mock, get_ssh_mock()]
+        pool = ConnectionPool(max_size=2)
+        pool.acquire('host1', 'username', 'password', 5)
+        pool.acquire('host2', 'username', 'password', 5)
+        pool.acquire('host1', 'username', 'password', 5)
+        pool.acquire('host3', 'username', 'password', 5)
+        self.assertFalse(host1_mock.close.called)
+        self.assertTrue(host2_mock.close.called)
+        self.assertEqual(list(pool.connections), [('host1', 'username', 22), ('host3', 'username', 22)])
+
+    @patch('SSHclient.sshclient.connect')
+    def test__acquire_Should_ReturnUnpooledConnection_When_MaxSizeReachedAndAllChannelsOpen(self, connect, *patches):
+        overflow_mock = get_ssh_mock()
+        connect.side_effect = [get_ssh_mock(channels=1), overflow_mock]
+        pool = ConnectionPool(max_size=1)
+        pool.acquire('host1', 'username', 'password', 5)
+        self.assertIs(pool.acquire('host2', 'username', 'password', 5), overflow_mock)
+        self.assertEqual(list(pool.connections), [('host1', 'username', 22)])
+        self.assertFalse(overflow_mock.close.called)
+        pool.release(overflow_mock)
+        self.assertTrue(overflow_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__release_Should_CloseConnection_When_NotPooled(self, connect, *patches):
+        ssh_mock = get_ssh_mock()
+        pool = ConnectionPool()
+        pool.release(ssh_mock)
+        self.assertTrue(ssh_mock.close.called)
+
+    @patch('SSHclient.sshclient.connect')
+    def test__close_Should_CloseAllConnections_When_Called(self, connect, *patches):
+        ssh_mocks = [get_ssh_mock(), get_ssh_mock()]
+        connect.side_effect = ssh_mocks
+        pool = ConnectionPool()
+        pool.acquire('host1', 'username', 'password', 5)
+        pool.acquire('host2', 'username', 'password', 5)
+        pool.close()
+        self.assertTrue(all(ssh_mock.close.called for ssh_mock in ssh_mocks))
+        self.assertEqual(len(pool.connections), 0)
+
+    def test__set_default_pool_Should_SetDefaultPool_When_Called(self, *patches):
+        pool = ConnectionPool()
+        set_default_pool(pool)
+        self.assertIs(get_default_pool(), pool)
@@ -0,0 +1,80 @@
+import unittest
+from mock import Mock
+
+from SSHclient import TransportProfile
+from SSHclient import get_profile
+from SSHclient.profiles import PROFILES
+
+import paramiko
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestProfiles(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__get_disabled_algorithms_Should_DisableAlgorithmsNotInProfile_When_Called(self, *patches):
+        profile = TransportProfile('test', ciphers=['aes128-ctr'], macs=['hmac-sha2-512'])
+        disabled = profile.get_disabled_algorithms()
+        self.assertEqual(
+            set(paramiko.Transport._preferred_ciphers) - set(disabled['ciphers']), set(['aes128-ctr']))
+        self.assertEqual(
+            set(paramiko.Transport._preferred_macs) - set(disabled['macs']), set(['hmac-sha2-512']))
+
+    def test__get_disabled_algorithms_Should_ReturnEmpty_When_NoAlgorithms(self, *patches):
+        self.assertEqual(TransportProfile('test').get_disabled_algorithms(), {})
+
+    def test__get_connect_arguments_Should_ReturnCompressAndDisabledAlgorithms_When_Called(self, *patches):
+        profile = TransportProfile('test', compress=True)
+        self.assertEqual(profile.get_connect_arguments(), {'compress': True, 'disabled_algorithms': {}})
+
+    def test__apply_Should_SetWindowAndPacketSize_When_Specified(self, *patches):
+        transport = Mock(default_window_size=2097152, default_max_packet_size=32768)
+        TransportProfile('test', window_size=16777216, max_packet_size=262144).apply(transport)
+        self.assertEqual(transport.default_window_size, 16777216)
+        self.assertEqual(transport.default_max_packet_size, 262144)
+
+    def test__apply_Should_KeepTransportDefaults_When_NotSpecified(self, *patches):
+        transport = Mock(default_window_size=2097152, default_max_packet_size=32768)
+        TransportProfile('test').apply(transport)
+        self.assertEqual(transport.default_window_size, 2097152)
+        self.assertEqual(transport.default_max_packet_size, 32768)
+
+    def test__get_profile_Should_ReturnProfile_When_Name(self, *patches):
+        self.assertIs(get_profile('low-cpu'), PROFILES['low-cpu'])
+
+    def test__get_profile_Should_ReturnProfile_When_Profile(self, *patches):
+        profile = TransportProfile('test')
+        self.assertIs(get_profile(profile), profile)
+
+    def test__get_profile_Should_ReturnNone_When_None(self, *patches):
+        self.assertIsNone(get_profile(None))
+
+    def test__get_profile_Should_RaiseValueError_When_UnknownName(self, *patches):
+        with self.assertRaises(ValueError):
+            get_profile('unknown')
+
+    def test__PROFILES_Should_OfferSupportedAlgorithms_When_Defined(self, *patches):
+        for profile in PROFILES.values():
+            disabled = profile.get_disabled_algorithms()
+            self.assertTrue(set(paramiko.Transport._preferred_ciphers) - set(disabled['ciphers']))
+            self.assertTrue(set(paramiko.Transport._preferred_macs) - set(disabled['macs']))
@@ -0,0 +1,119 @@
+import unittest
+from mock import patch
+from mock import Mock
+
+from SSHclient.reader import ChannelReader
+from SSHclient.reader import STDOUT
+from SSHclient.reader import STDERR
+from SSHclient.output import OutputSink
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class FakeChannel(object):
+    """ channel receiving (stream, data) arrivals one per readiness wait followed by eof
+    """
+    def __init__(self, arrivals):
+        self.arrivals = list(arrivals)
+        self.buffers = {STDOUT: [], STDERR: []}
+        self.eof_received = False
+        self.closed = False
+
+    def arrive(self):
+        if not self.arrivals:
+            self.eof_received = True
+            return
+        stream, data = self.arrivals.pop(0)
+        self.buffers[stream].append(data)
+
+    def recv_ready(self):
+        return bool(self.buffers[STDOUT])
+
+    def recv(self, nbytes):
+        return self.buffers[STDOUT].pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.buffers[STDERR])
+
+    def recv_stderr(self, nbytes):
+        return self.buffers[STDERR].pop(0)
+
+
+class TestReader(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    @patch('SSHclient.reader.select.select')
+    def test__read_Should_DrainBothStreams_When_OutputInterleaved(self, select_patch, *patches):
+        channel = FakeChannel([(STDERR, 'e1\n'), (STDOUT, 'o1\n'), (STDERR, 'e2\n'), (STDOUT, 'o2\n')])
+        select_patch.side_effect = lambda *args: channel.arrive()
+        reader = ChannelReader(channel)
+        reader.read()
+        self.assertEqual(reader.get_lines(STDOUT), ['o1\n', 'o2\n'])
+        self.assertEqual(reader.get_lines(STDERR), ['e1\n', 'e2\n'])
+        self.assertEqual(select_patch.call_count, 5)
+
+    @patch('SSHclient.reader.select.select')
+    def test__iter_lines_Should_YieldStdoutLinesAndDrainStderr_When_OutputInterleaved(self, select_patch, *patches):
+        channel = FakeChannel([(STDOUT, 'o1\no'), (STDERR, 'e1\n'), (STDOUT, '2\n'), (STDERR, 'e2\n'), (STDOUT, 'o3')])
+        select_patch.side_effect = lambda *args: channel.arrive()
+        reader = ChannelReader(channel)
+        self.assertEqual(list(reader.iter_lines()), ['o1\n', 'o2\n', 'o3'])
+        self.assertEqual(reader.get_lines(STDERR), ['e1\n', 'e2\n'])
+
+    @patch('SSHclient.reader.select.select')
+    def test__read_Should_KeepArrivalOrder_When_Merged(self, select_patch, *patches):
+        channel = FakeChannel([(STDOUT, 'o1\n'), (STDERR, 'e1\n'), (STDOUT, 'o2\n')])
+        select_patch.side_effect = lambda *args: channel.arrive()
+        reader = ChannelReader(channel, merged=True)
+        reader.read()
+        self.assertEqual(reader.merged, [(STDOUT, 'o1\n'), (STDERR, 'e1\n'), (STDOUT, 'o2\n')])
+        self.assertEqual(reader.get_merged(), 'o1\ne1\no2\n')
+
+    @patch('SSHclient.reader.select.select')
+    def test__read_Should_ReadBufferedOutput_When_EofAlreadyReceived(self, select_patch, *patches):
+        channel = FakeChannel([])
+        channel.buffers[STDOUT] = ['a', 'b']
+        channel.eof_received = True
+        reader = ChannelReader(channel)
+        reader.read()
+        self.assertEqual(reader.get_data(STDOUT), 'ab')
+        self.assertFalse(select_patch.called)
+
+    @patch('SSHclient.reader.select.select')
+    def test__read_Should_Return_When_ChannelClosed(self, select_patch, *patches):
+        channel = FakeChannel([])
+        select_patch.side_effect = lambda *args: setattr(channel, 'closed', True)
+        reader = ChannelReader(channel)
+        reader.read()
+        self.assertEqual(reader.get_data(STDOUT), '')
+        self.assertEqual(select_patch.call_count, 1)
+
+    def test__read_Should_WriteToSinks_When_SinksSpecified(self, *patches):
+        channel = FakeChannel([])
+        channel.buffers[STDOUT] = ['x' * 10, 'y' * 10]
+        channel.eof_received = True
+        reader = ChannelReader(channel, stdout=OutputSink(threshold=16))
+        reader.read()
+        output = reader.stdout.result()
+        self.assertIsNotNone(output.file)
+        self.assertEqual(output.read(), 'x' * 10 + 'y' * 10)
+        output.close()
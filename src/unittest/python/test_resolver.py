@@ -0,0 +1,94 @@
+import unittest
+from mock import patch
+
+from SSHclient import Resolver
+from SSHclient import get_default_resolver
+from SSHclient import set_default_resolver
+from SSHclient.sshclient import open_socket
+
+from socket import error as socket_error
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+class TestResolver(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        set_default_resolver(None)
+
+    def test__set_default_resolver_Should_SetResolver_When_Called(self, *patches):
+        self.assertIsNone(get_default_resolver())
+        resolver = Resolver()
+        set_default_resolver(resolver)
+        self.assertIs(get_default_resolver(), resolver)
+
+    def test__order_domains_Should_PutCachedDomainFirst_When_DomainSet(self, *patches):
+        resolver = Resolver()
+        self.assertEqual(resolver.order_domains('host1', ['.a.com', '.b.com', '.c.com']), ['.a.com', '.b.com', '.c.com'])
+        resolver.set_domain('host1', '.c.com')
+        self.assertEqual(resolver.order_domains('host1', ['.a.com', '.b.com', '.c.com']), ['.c.com', '.a.com', '.b.com'])
+        self.assertEqual(resolver.order_domains('host1', ['.a.com', '.b.com']), ['.a.com', '.b.com'])
+        self.assertEqual(resolver.order_domains('host2', ['.a.com', '.c.com']), ['.a.com', '.c.com'])
+
+    @patch('SSHclient.resolver.time')
+    def test__get_domain_Should_ReturnNone_When_DomainExpired(self, time_patch, *patches):
+        resolver = Resolver(domain_ttl=10)
+        time_patch.return_value = 100
+        resolver.set_domain('host1', '.a.com')
+        time_patch.return_value = 109
+        self.assertEqual(resolver.get_domain('host1'), '.a.com')
+        time_patch.return_value = 110
+        self.assertIsNone(resolver.get_domain('host1'))
+
+    def test__invalidate_domain_Should_ForgetDomain_When_DomainIsCached(self, *patches):
+        resolver = Resolver()
+        resolver.set_domain('host1', '.a.com')
+        resolver.invalidate_domain('host1', '.b.com')
+        self.assertEqual(resolver.get_domain('host1'), '.a.com')
+        resolver.invalidate_domain('host1', '.a.com')
+        self.assertIsNone(resolver.get_domain('host1'))
+
+    @patch('SSHclient.resolver.time')
+    @patch('SSHclient.resolver.socket.getaddrinfo')
+    def test__getaddrinfo_Should_ReuseAddresses_When_NotExpired(self, getaddrinfo, time_patch, *patches):
+        getaddrinfo.return_value = [(2, 1, 6, '', ('10.0.0.1', 22))]
+        resolver = Resolver(address_ttl=10)
+        time_patch.return_value = 100
+        self.assertEqual(resolver.getaddrinfo('host1', 22), [(2, 1, 6, '', ('10.0.0.1', 22))])
+        resolver.getaddrinfo('host1', 22)
+        self.assertEqual(getaddrinfo.call_count, 1)
+        resolver.getaddrinfo('host1', 2222)
+        self.assertEqual(getaddrinfo.call_count, 2)
+        time_patch.return_value = 110
+        resolver.getaddrinfo('host1', 22)
+        self.assertEqual(getaddrinfo.call_count, 3)
+        resolver.invalidate_addresses('host1')
+        resolver.getaddrinfo('host1', 22)
+        self.assertEqual(getaddrinfo.call_count, 4)
+
+    @patch('SSHclient.sshclient.socket.socket')
+    @patch('SSHclient.resolver.socket.getaddrinfo')
+    def test__open_socket_Should_InvalidateAddresses_When_NoAddressConnects(self, getaddrinfo, socket_patch, *patches):
+        getaddrinfo.return_value = [(2, 1, 6, '', ('10.0.0.1', 22))]
+        socket_patch.return_value.connect.side_effect = socket_error('connection refused')
+        resolver = Resolver()
+        with self.assertRaises(socket_error):
+            open_socket('host1', 22, 5, resolver=resolver)
+        self.assertEqual(resolver.addresses, {})
@@ -0,0 +1,248 @@
+import unittest
+from mock import patch
+from mock import call
+from mock import Mock
+
+from SSHclient import ShellSession
+from SSHclient import ExecuteError
+from SSHclient.shell import detect_prompt
+from SSHclient.shell import shell_expect
+
+from socket import timeout
+
+import sys
+import logging
+logger = logging.getLogger(__name__)
+
+consoleHandler = logging.StreamHandler(sys.stdout)
+logFormatter = logging.Formatter(
+    "%(asctime)s %(threadName)s %(name)s [%(funcName)s] %(levelname)s %(message)s")
+consoleHandler.setFormatter(logFormatter)
+rootLogger = logging.getLogger()
+rootLogger.addHandler(consoleHandler)
+rootLogger.setLevel(logging.DEBUG)
+
+
+def get_ssh_mock():
+    ssh_mock = Mock()
+    ssh_mock.get_transport.return_value.is_active.return_value = True
+    shell_mock = ssh_mock.invoke_shell.return_value
+    shell_mock.closed = False
+    shell_mock.exit_status_ready.return_value = False
+    shell_mock.recv_ready.return_value = False
+    return ssh_mock
+
+
+class TestShell(unittest.TestCase):
+
+    def setUp(self):
+        """
+        """
+        pass
+
+    def tearDown(self):
+        """
+        """
+        pass
+
+    def test__detect_prompt_Should_ReturnEscapedLastLine_When_DataEndsWithPrompt(self, *patches):
+        self.assertEqual(detect_prompt('Welcome\r\nswitch(config)# '), 'switch\\(config\\)\\#\\s*$')
+
+    def test__detect_prompt_Should_ReturnNone_When_DataEndsWithNewline(self, *patches):
+        self.assertIsNone(detect_prompt('Welcome\r\n'))
+
+    def test__detect_prompt_Should_ReturnNone_When_DataEndsMidLine(self, *patches):
+        self.assertIsNone(detect_prompt('Welcome\r\nAuthorized use only'))
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='Welcome\r\nhost# ')
+    def test__open_Should_DetectPrompt_When_PromptNotSpecified(self, shell_receive, *patches):
+        session = ShellSession(get_ssh_mock())
+        session.open()
+        self.assertEqual(session.banner, 'Welcome\r\nhost# ')
+        self.assertEqual(session.prompt, 'host\\#\\s*$')
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='Welcome\r\nhost# ')
+    def test__open_Should_WaitForPrompt_When_PromptSpecified(self, shell_receive, *patches):
+        ssh_mock = get_ssh_mock()
+        session = ShellSession(ssh_mock, prompt='# $', timeout=5)
+        session.open()
+        shell_receive.assert_called_once_with(ssh_mock.invoke_shell.return_value, [], timeout=5, quiet_period=None, prompt='# $')
+        self.assertEqual(session.prompt, '# $')
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='host# ')
+    def test__run_Should_OpenShellOnce_When_CalledRepeatedly(self, *patches):
+        ssh_mock = get_ssh_mock()
+        session = ShellSession(ssh_mock, prompt='# $')
+        session.run('command1')
+        session.run('command2')
+        self.assertEqual(ssh_mock.invoke_shell.call_count, 1)
+        shell_mock = ssh_mock.invoke_shell.return_value
+        self.assertEqual(shell_mock.send.mock_calls, [call('command1\n'), call('command2\n')])
+        self.assertFalse(shell_mock.close.called)
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='host# ')
+    def test__run_Should_WaitForInputPromptThenShellPrompt_When_InputsSpecified(self, shell_receive, *patches):
+        ssh_mock = get_ssh_mock()
+        session = ShellSession(ssh_mock, prompt='# $')
+        session.run('reload', send_inputs=['yes'], input_prompt='\\? $')
+        shell_mock = ssh_mock.invoke_shell.return_value
+        self.assertEqual(shell_receive.mock_calls[1][2]['prompt'], '\\? $')
+        self.assertEqual(shell_receive.mock_calls[2][2]['prompt'], '# $')
+        self.assertEqual(shell_mock.send.mock_calls, [call('reload\n'), call('yes\n')])
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='host# ')
+    def test__run_Should_ReopenShell_When_ShellDied(self, *patches):
+        ssh_mock = get_ssh_mock()
+        dead_shell_mock = Mock()
+        dead_shell_mock.closed = False
+        dead_shell_mock.exit_status_ready.return_value = False
+        dead_shell_mock.recv_ready.return_value = False
+        ssh_mock.invoke_shell.side_effect = [dead_shell_mock, get_ssh_mock().invoke_shell.return_value]
+        session = ShellSession(ssh_mock, prompt='# $')
+        session.run('command1')
+        dead_shell_mock.exit_status_ready.return_value = True
+        session.run('command2')
+        self.assertEqual(ssh_mock.invoke_shell.call_count, 2)
+        self.assertTrue(dead_shell_mock.close.called)
+
+    @patch('SSHclient.sshclient._shell_receive', return_value='host# ')
+    def test__run_Should_DiscardLeftoverOutput_When_RecvReady(self, shell_receive, *patches):
+        ssh_mock = get_ssh_mock()
+        session = ShellSession(ssh_mock, prompt='# $')
+        session.open()
+        session.shell.recv_ready.return_value = True
+        session.run('command')
+        self.assertEqual(shell_receive.mock_calls[1], call(session.shell, [], quiet_period=None, wait=False))
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_RaiseExecuteError_When_SuccessResponsesNotFound(self, shell_receive, *patches):
+        def shell_receive_side_effect(shell, lines, **kwargs):
+            lines.append('failed')
+            return 'failed\r\nhost# '
+
+        shell_receive.side_effect = shell_receive_side_effect
+        session = ShellSession(get_ssh_mock(), prompt='# $')
+        with self.assertRaises(ExecuteError):
+            session.run('command', success_responses=['succeeded'])
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_DetectChangedPrompt_When_PromptDetected(self, shell_receive, *patches):
+        shell_receive.side_effect = [
+            'Welcome\r\nswitch# ',
+            'configure terminal\r\nswitch(config)# ',
+            'show running-config\r\nswitch(config)# '
+        ]
+        session = ShellSession(get_ssh_mock())
+        session.run('configure terminal')
+        self.assertEqual(shell_receive.mock_calls[1][2]['prompt'], 'switch\\#\\s*$')
+        self.assertIsNotNone(shell_receive.mock_calls[1][2]['fallback_prompt'])
+        self.assertEqual(session.prompt, 'switch\\(config\\)\\#\\s*$')
+        session.run('show running-config')
+        self.assertEqual(shell_receive.mock_calls[2][2]['prompt'], 'switch\\(config\\)\\#\\s*$')
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_NotFallBackToAnyPrompt_When_PromptSpecified(self, shell_receive, *patches):
+        shell_receive.return_value = 'host# '
+        session = ShellSession(get_ssh_mock(), prompt='# $')
+        session.run('command')
+        self.assertIsNone(shell_receive.mock_calls[1][2]['fallback_prompt'])
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_RaiseExecuteError_When_PromptNotReceived(self, shell_receive, *patches):
+        shell_receive.side_effect = ['host# ', 'partial output']
+        session = ShellSession(get_ssh_mock(), prompt='# $')
+        with self.assertRaises(ExecuteError):
+            session.run('command')
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_RaiseExecuteError_When_DetectedPromptNotReceived(self, shell_receive, *patches):
+        shell_receive.side_effect = ['Welcome\r\nhost# ', 'partial output']
+        session = ShellSession(get_ssh_mock())
+        with self.assertRaises(ExecuteError):
+            session.run('command')
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_ReturnOutput_When_ShellClosedBeforePrompt(self, shell_receive, *patches):
+        def shell_receive_side_effect(shell, lines, **kwargs):
+            if not shell.send.called:
+                return 'host# '
+            shell.exit_status_ready.return_value = True
+            lines.extend(['exit', 'logout'])
+            return 'exit\r\nlogout'
+
+        shell_receive.side_effect = shell_receive_side_effect
+        session = ShellSession(get_ssh_mock(), prompt='# $')
+        self.assertEqual(session.run('exit'), ['exit', 'logout'])
+
+    @patch('SSHclient.sshclient._shell_receive')
+    def test__run_Should_CompleteOnQuietPeriod_When_NoPromptDetected(self, shell_receive, *patches):
+        def shell_receive_side_effect(shell, lines, **kwargs):
+            lines.append('output')
+            return 'Welcome\r\nAuthorized use only' if len(shell_receive.mock_calls) == 1 else 'output\r\n'
+
+        shell_receive.side_effect = shell_receive_side_effect
+        session = ShellSession(get_ssh_mock())
+        self.assertEqual(session.run('command'), ['output'])
+        self.assertIsNone(shell_receive.mock_calls[1][2]['prompt'])
+
+    @patch('SSHclient.shell.shell_expect')
+    @patch('SSHclient.sshclient._shell_receive', return_value='host# ')
+    def test__run_Should_ExpectPromptBeforeSendingInput_When_InputIsTuple(self, shell_receive, shell_expect_patch, *patches):
+        ssh_mock = get_ssh_mock()
+        session = ShellSession(ssh_mock, prompt='# $', timeout=5)
+        session.run('reload', send_inputs=[('Proceed?', 'yes'), 'now'])
+        shell_mock = ssh_mock.invoke_shell.return_value
+        shell_expect_patch.assert_called_once_with(shell_mock, [], 'Proceed?', timeout=5)
+        self.assertEqual(shell_mock.send.mock_calls, [call('reload\n'), call('yes\n'), call('now\n')])
+
+    def test__shell_expect_Should_MatchRegexPromptAgainstCurrentLine_When_Regex(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
+            'Password: accepted\r\nenter new pass',
+            'word: ',
+            AssertionError('recv called after prompt')
+        ]
+        result = shell_expect(shell_mock, [], '{regex}.*[Pp]assword: ?$')
+        self.assertEqual(result, 'Password: accepted\r\nenter new password: ')
+
+    def test__shell_expect_Should_ReturnDataAndAddLines_When_PromptReceived(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [
+            'reload\r\nProceed',
+            timeout('timeout'),
+            '? ',
+            AssertionError('recv called after prompt')
+        ]
+        lines = []
+        result = shell_expect(shell_mock, lines, 'Proceed?')
+        self.assertEqual(result, 'reload\r\nProceed? ')
+        self.assertEqual(lines, ['reload', 'Proceed? '])
+
+    def test__shell_expect_Should_RaiseExecuteError_When_ShellClosed(self, *patches):
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = ['output', '']
+        with self.assertRaises(ExecuteError):
+            shell_expect(shell_mock, [], 'Proceed?')
+
+    @patch('SSHclient.shell.time')
+    def test__shell_expect_Should_RaiseExecuteError_When_PromptNotReceivedBeforeTimeout(self, time_patch, *patches):
+        time_patch.side_effect = [100, 100, 106]
+        shell_mock = Mock()
+        shell_mock.recv.side_effect = [timeout('timeout')]
+        with self.assertRaises(ExecuteError):
+            shell_expect(shell_mock, [], 'Proceed?', timeout=5)
+
+    def test__is_alive_Should_ReturnFalse_When_ShellNotOpenOrClosed(self, *patches):
+        session = ShellSession(get_ssh_mock())
+        self.assertFalse(session.is_alive())
+        session.shell = Mock()
+        session.shell.closed = True
+        self.assertFalse(session.is_alive())
+
+    def test__close_Should_CloseShell_When_Open(self, *patches):
+        session = ShellSession(get_ssh_mock())
+        shell_mock = Mock()
+        session.shell = shell_mock
+        session.close()
+        self.assertTrue(shell_mock.close.called)
+        self.assertIsNone(session.shell)